@@ -1,11 +1,13 @@
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 
+import numpy as np
+
 class StockPredictor:
     def __init__(self):
-        self.model = LinearRegression()
+        # pandas/scikit-learn cost ~2s to import and only the single-product path
+        # below uses them, so they are loaded on first use
+        self.model = None
 
     def predict_future_demand(self, sales_history, days_to_predict=7):
         """
@@ -18,6 +20,11 @@ class StockPredictor:
         if not sales_history or len(sales_history) < 2:
             return 0  # Not enough data for regression
 
+        import pandas as pd
+        from sklearn.linear_model import LinearRegression
+        if self.model is None:
+            self.model = LinearRegression()
+
         # Convert to DataFrame
         df = pd.DataFrame(sales_history)
         df['date'] = pd.to_datetime(df['date'])
@@ -47,6 +54,203 @@ class StockPredictor:
         
         return int(round(total_predicted_demand))
 
+    def forecast_batch(self, product_ids, dates, quantities, days_to_predict=7, model="linear",
+                       history_days=30, end_date=None):
+        """
+        Forecasts many products with one of the pluggable FORECASTERS.
+
+        Sales are laid out on a zero-filled daily grid of `history_days` ending at
+        `end_date`, so days without sales count as zero demand instead of being
+        skipped.
+
+        :param model: Key into FORECASTERS
+        :param end_date: Last day of history (default: latest sale date)
+        :return: Dict mapping product_id to integer prediction of total units needed
+        """
+        if len(product_ids) == 0:
+            return {}
+        unique_ids, series, first_day = daily_matrix(product_ids, dates, quantities, history_days, end_date)
+        totals = get_forecaster(model).forecast(series, days_to_predict, first_day)
+        return dict(zip(unique_ids.tolist(), np.rint(totals).astype(int).tolist()))
+
+
+def daily_matrix(product_ids, dates, quantities, history_days, end_date=None):
+    """
+    Zero-filled daily demand per product.
+
+    :return: (unique product ids, array of shape (products, history_days), date of column 0)
+    """
+    # Factorize through a dict: np.unique on a large string array sorts every row
+    codes = {}
+    rows = np.fromiter((codes.setdefault(pid, len(codes)) for pid in map(str, product_ids)),
+                       dtype=np.int64, count=len(product_ids))
+    keys = np.array(list(codes), dtype=str)
+    days = np.asarray(dates, dtype="datetime64[D]")
+    quantities = np.asarray(quantities, dtype=np.float64)
+    end_day = days.max() if end_date is None else np.datetime64(end_date, "D")
+    first_day = end_day - (history_days - 1)
+
+    keep = (days >= first_day) & (days <= end_day)
+    present, rows = np.unique(rows[keep], return_inverse=True)
+    # Rows come back sorted by product id, as callers binary-search them
+    order = np.argsort(keys[present], kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    unique_ids = keys[present][order]
+    series = np.zeros((len(unique_ids), history_days))
+    np.add.at(series, (rank[rows.ravel()], (days[keep] - first_day).astype(np.int64)), quantities[keep])
+    return unique_ids, series, first_day
+
+
+def _line_totals(x, y, weights, future_x):
+    """Per-row weighted least-squares line, summed over `future_x` and clipped at zero."""
+    n = weights.sum(axis=1)
+    sum_x = (weights * x).sum(axis=1)
+    sum_y = (weights * y).sum(axis=1)
+    sum_xx = (weights * x * x).sum(axis=1)
+    sum_xy = (weights * x * y).sum(axis=1)
+
+    fitted = n >= 2
+    denominator = n * sum_xx - sum_x * sum_x
+    slope = np.zeros(len(y))
+    np.divide(n * sum_xy - sum_x * sum_y, denominator, out=slope, where=fitted & (denominator != 0))
+    intercept = np.zeros(len(y))
+    np.divide(sum_y - slope * sum_x, n, out=intercept, where=fitted)
+
+    predictions = intercept[:, None] + slope[:, None] * future_x
+    return np.where(fitted, np.clip(predictions, 0, None).sum(axis=1), 0.0)
+
+
+class Forecaster(ABC):
+    """
+    Base class for demand models. `forecast` receives a (products, days) matrix
+    of zero-filled daily sales and returns each product's total demand over the
+    next `horizon` days; implementations work on all rows at once.
+    """
+
+    name = None
+
+    @abstractmethod
+    def forecast(self, series, horizon, first_day):
+        ...
+
+
+class LinearForecaster(Forecaster):
+    """Straight-line trend over the zero-filled history."""
+
+    name = "linear"
+
+    def forecast(self, series, horizon, first_day):
+        days = series.shape[1]
+        x = np.arange(days, dtype=np.float64)[None, :]
+        future_x = np.arange(days, days + horizon, dtype=np.float64)[None, :]
+        return _line_totals(x, series, np.ones_like(series), future_x)
+
+
+class SparseLinearForecaster(Forecaster):
+    """
+    The original model: a trend fitted only through days that had sales,
+    extrapolated from the last sale day. Kept as a backtesting baseline.
+    """
+
+    name = "linear-sparse"
+
+    def forecast(self, series, horizon, first_day):
+        days = series.shape[1]
+        x = np.broadcast_to(np.arange(days, dtype=np.float64), series.shape)
+        weights = (series != 0).astype(np.float64)
+        last_sale = np.where(weights.any(axis=1), days - 1 - np.argmax(weights[:, ::-1], axis=1), 0)
+        future_x = last_sale[:, None] + np.arange(1, horizon + 1)
+        return _line_totals(x, series, weights, future_x)
+
+
+class MovingAverageForecaster(Forecaster):
+    """Average of the last `window` days, carried forward."""
+
+    name = "moving-average"
+
+    def __init__(self, window=7):
+        self.window = window
+
+    def forecast(self, series, horizon, first_day):
+        return series[:, -self.window:].mean(axis=1) * horizon
+
+
+class DayOfWeekForecaster(Forecaster):
+    """
+    Weekly profile (average sales per weekday over the history) scaled by how
+    the last week compares with the history as a whole.
+    """
+
+    name = "day-of-week"
+
+    def forecast(self, series, horizon, first_day):
+        days = series.shape[1]
+        weekday = (first_day.astype("datetime64[D]").astype(np.int64) + np.arange(days + horizon) + 3) % 7
+        profile = np.zeros((len(series), 7))
+        for dow in range(7):
+            columns = weekday[:days] == dow
+            if columns.any():
+                profile[:, dow] = series[:, columns].mean(axis=1)
+
+        overall = series.mean(axis=1)
+        recent = series[:, -7:].mean(axis=1)
+        scale = np.ones(len(series))
+        np.divide(recent, overall, out=scale, where=overall > 0)
+        return (profile[:, weekday[days:]] * scale[:, None]).sum(axis=1)
+
+
+class HoltWintersForecaster(Forecaster):
+    """
+    Additive Holt-Winters (level, trend and weekly season), smoothed over time
+    for every product in parallel.
+
+    :param alpha: Level smoothing
+    :param beta: Trend smoothing
+    :param gamma: Seasonal smoothing
+    """
+
+    name = "holt-winters"
+
+    def __init__(self, alpha=0.3, beta=0.05, gamma=0.2, season=7):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season = season
+
+    def forecast(self, series, horizon, first_day):
+        m = self.season
+        days = series.shape[1]
+        if days < 2 * m:
+            return MovingAverageForecaster(min(days, m)).forecast(series, horizon, first_day)
+
+        level = series[:, :m].mean(axis=1)
+        trend = (series[:, m:2 * m].mean(axis=1) - level) / m
+        seasonal = series[:, :m] - level[:, None]
+        for t in range(m, days):
+            previous_seasonal = seasonal[:, t % m]
+            new_level = self.alpha * (series[:, t] - previous_seasonal) + (1 - self.alpha) * (level + trend)
+            trend = self.beta * (new_level - level) + (1 - self.beta) * trend
+            seasonal[:, t % m] = self.gamma * (series[:, t] - new_level) + (1 - self.gamma) * previous_seasonal
+            level = new_level
+
+        steps = np.arange(1, horizon + 1)
+        predictions = level[:, None] + trend[:, None] * steps + seasonal[:, (days + steps - 1) % m]
+        return np.clip(predictions, 0, None).sum(axis=1)
+
+
+FORECASTERS = {
+    forecaster.name: forecaster
+    for forecaster in (LinearForecaster(), SparseLinearForecaster(), MovingAverageForecaster(),
+                       DayOfWeekForecaster(), HoltWintersForecaster())
+}
+
+
+def get_forecaster(name):
+    if name not in FORECASTERS:
+        raise ValueError(f"Unknown forecast model '{name}', expected one of: {', '.join(FORECASTERS)}")
+    return FORECASTERS[name]
+
 # Simple test
 if __name__ == "__main__":
     predictor = StockPredictor()
@@ -59,3 +263,8 @@ if __name__ == "__main__":
         {'date': datetime(2023, 10, 5), 'quantity': 10},
     ]
     print(f"Predicted need: {predictor.predict_future_demand(data)}")
+    for name in FORECASTERS:
+        forecast = predictor.forecast_batch(
+            ["demo"] * len(data), [d['date'] for d in data], [d['quantity'] for d in data], model=name, history_days=14
+        )
+        print(f"Predicted need ({name}, zero-filled 14 days): {forecast['demo']}")
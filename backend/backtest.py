@@ -0,0 +1,132 @@
+"""
+Backtests the demand models in ai_engine.FORECASTERS against historical sales.
+
+Rolling origin: at each cutoff every model sees the --history days before it
+and predicts total demand for the next --horizon days, which is compared with
+what was actually sold. Reports MAPE (over product windows with sales), WAPE,
+bias and fit time per model, and recommends the most accurate model whose fit
+stays within --budget-ms for the whole catalog.
+
+Usage:
+    python backtest.py                              # replay raw `sales` from the live database
+    python backtest.py --synthetic 5000             # generated catalog, no MongoDB needed
+    python backtest.py --models linear holt-winters --cutoffs 12 --step 3
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from ai_engine import FORECASTERS, daily_matrix, get_forecaster
+from forecasting import HISTORY_DAYS
+
+
+def synthetic_sales(n_products, days=120, seed=7):
+    """Trend + weekly seasonality + Poisson noise, with some slow movers that skip days."""
+    rng = np.random.default_rng(seed)
+    level = rng.lognormal(1.0, 0.8, n_products)
+    trend = rng.normal(0, 0.01, n_products)
+    weekly = 1 + rng.uniform(0, 0.6, n_products)[:, None] * np.sin(2 * np.pi * (np.arange(days) % 7) / 7)
+    t = np.arange(days)
+    mean = np.clip(level[:, None] * (1 + trend[:, None] * t) * weekly, 0, None)
+    quantities = rng.poisson(mean)
+
+    first_day = np.datetime64(datetime.utcnow().date()) - days
+    rows, cols = np.nonzero(quantities)
+    return [str(i) for i in rows], (first_day + cols).astype(str).tolist(), quantities[rows, cols].tolist()
+
+
+async def load_sales(days):
+    from database import db
+    import sales_rollup
+
+    since = (datetime.utcnow() - timedelta(days=days)).strftime(sales_rollup.DAY_FORMAT)
+    rows = await sales_rollup.aggregate_raw(db, since)
+    return [r["product_id"] for r in rows], [r["day"] for r in rows], [r["qty"] for r in rows]
+
+
+def backtest(product_ids, dates, quantities, models, history, horizon, cutoffs, step):
+    """
+    :return: (per-model result dicts, number of cutoffs), or None if the history is too short
+    """
+    days = np.asarray(dates, dtype="datetime64[D]")
+    span = int((days.max() - days.min()).astype(np.int64)) + 1
+    _, series, first_day = daily_matrix(product_ids, dates, quantities, span)
+
+    last_cutoff = span - horizon
+    origins = [c for c in (last_cutoff - k * step for k in range(cutoffs)) if c >= history]
+    if not origins:
+        return None
+
+    results = []
+    for name in models:
+        forecaster = get_forecaster(name)
+        errors, actuals, predictions, fit_seconds = [], [], [], []
+        for origin in origins:
+            train = series[:, origin - history:origin]
+            active = train.sum(axis=1) > 0
+            start = time.perf_counter()
+            predicted = np.rint(forecaster.forecast(train[active], horizon, first_day + (origin - history)))
+            fit_seconds.append(time.perf_counter() - start)
+            actual = series[active, origin:origin + horizon].sum(axis=1)
+            errors.append(np.abs(predicted - actual))
+            actuals.append(actual)
+            predictions.append(predicted)
+
+        errors, actuals, predictions = np.concatenate(errors), np.concatenate(actuals), np.concatenate(predictions)
+        sold = actuals > 0
+        results.append({
+            "model": name,
+            "windows": len(actuals),
+            "mape": float(np.mean(errors[sold] / actuals[sold]) * 100) if sold.any() else float("nan"),
+            "wape": float(errors.sum() / actuals.sum() * 100) if actuals.sum() else float("nan"),
+            "bias": float((predictions.sum() - actuals.sum()) / actuals.sum() * 100) if actuals.sum() else float("nan"),
+            "fit_ms": float(np.mean(fit_seconds) * 1000),
+            "products": int(series.shape[0]),
+        })
+    return results, len(origins)
+
+
+def report(results, origins, budget_ms):
+    print(f"{results[0]['products']} products, {origins} cutoffs, {results[0]['windows']} product windows per model")
+    print(f"{'model':<16} {'MAPE %':>8} {'WAPE %':>8} {'bias %':>8} {'fit ms':>8}")
+    for r in sorted(results, key=lambda r: r["mape"]):
+        over = "  (over budget)" if r["fit_ms"] > budget_ms else ""
+        print(f"{r['model']:<16} {r['mape']:>8.1f} {r['wape']:>8.1f} {r['bias']:>+8.1f} {r['fit_ms']:>8.1f}{over}")
+    within = [r for r in results if r["fit_ms"] <= budget_ms]
+    if within:
+        best = min(within, key=lambda r: r["mape"])
+        print(f"Recommended: FORECAST_MODEL={best['model']} (lowest MAPE within {budget_ms:.0f}ms)")
+    else:
+        print(f"No model fits within {budget_ms:.0f}ms")
+
+
+async def main(args):
+    if args.synthetic:
+        product_ids, dates, quantities = synthetic_sales(args.synthetic, args.days)
+    else:
+        product_ids, dates, quantities = await load_sales(args.days)
+    if not product_ids:
+        print("No sales to backtest.")
+        return
+
+    outcome = backtest(product_ids, dates, quantities, args.models, args.history, args.horizon, args.cutoffs, args.step)
+    if outcome is None:
+        print(f"Not enough history: need at least {args.history + args.horizon} days of sales.")
+        return
+    report(*outcome, args.budget_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=list(FORECASTERS), default=list(FORECASTERS))
+    parser.add_argument("--days", type=int, default=120, help="Days of sales history to replay")
+    parser.add_argument("--history", type=int, default=HISTORY_DAYS, help="Training window per forecast")
+    parser.add_argument("--horizon", type=int, default=7)
+    parser.add_argument("--cutoffs", type=int, default=8)
+    parser.add_argument("--step", type=int, default=7, help="Days between cutoffs")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="Fit time budget for the whole catalog")
+    parser.add_argument("--synthetic", type=int, metavar="PRODUCTS", help="Backtest generated sales instead")
+    asyncio.run(main(parser.parse_args()))
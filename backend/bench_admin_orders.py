@@ -0,0 +1,126 @@
+"""
+Benchmark for GET /admin/orders: the legacy per-order enrichment (one products
+and one users find_one per legacy row) vs. paginated listing with batched
+enrichment, before and after running the legacy order migration.
+
+Usage:
+    python bench_admin_orders.py [--orders 100000] [--legacy-ratio 0.2]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import orders
+from bench_prediction import BENCH_DATABASE_NAME, RoundTripCounter
+from database import connected
+
+
+async def legacy_list_admin_orders(database):
+    """The pre-batching implementation of GET /admin/orders, kept for comparison."""
+    result = await database["sales"].find().sort("timestamp", -1).to_list(1000)
+    for order in result:
+        order["_id"] = str(order["_id"])
+        if ("product_name" not in order or not order["product_name"]) and order.get("product_id"):
+            pid = order["product_id"]
+            if ObjectId.is_valid(pid):
+                product = await database["products"].find_one({"_id": ObjectId(pid)})
+                if product:
+                    order["product_name"] = product["name"]
+                    if "unit_price" not in order: order["unit_price"] = product["price"]
+                    if "total_price" not in order: order["total_price"] = product["price"] * order.get("quantity_sold", 0)
+        if ("user_name" not in order or not order["user_name"]) and order.get("user_id"):
+            uid = order["user_id"]
+            if ObjectId.is_valid(uid):
+                user = await database["users"].find_one({"_id": ObjectId(uid)})
+                if user:
+                    order["user_name"] = user["username"]
+        if "status" not in order:
+            order["status"] = "pending"
+    return result
+
+
+async def seed(database, n_orders, legacy_ratio, n_products=2000, n_users=200, batch_size=10000):
+    for name in ("products", "users", "sales"):
+        await database[name].delete_many({})
+    rng = random.Random(7)
+    products = [{"_id": ObjectId(), "name": f"Product {i}", "category": "Bench", "price": round(rng.uniform(1, 100), 2),
+                 "current_stock": 100, "low_stock_threshold": 10} for i in range(n_products)]
+    users = [{"_id": ObjectId(), "username": f"user{i}", "email": f"user{i}@bench.local", "role": "staff",
+              "hashed_password": "x"} for i in range(n_users)]
+    await database["products"].insert_many(products)
+    await database["users"].insert_many(users)
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(n_orders):
+        product, user = rng.choice(products), rng.choice(users)
+        quantity = rng.randint(1, 5)
+        order = {
+            "product_id": str(product["_id"]),
+            "user_id": str(user["_id"]),
+            "quantity_sold": quantity,
+            "status": rng.choice(["pending", "approved"]),
+            "timestamp": now - timedelta(minutes=n_orders - i),
+        }
+        if rng.random() >= legacy_ratio:
+            order.update(product_name=product["name"], unit_price=product["price"],
+                         total_price=product["price"] * quantity, user_name=user["username"])
+        batch.append(order)
+        if len(batch) == batch_size:
+            await database["sales"].insert_many(batch)
+            batch = []
+    if batch:
+        await database["sales"].insert_many(batch)
+    await database["sales"].create_index([("timestamp", -1), ("_id", -1)])
+    await database["sales"].create_index([("status", 1), ("timestamp", -1), ("_id", -1)])
+
+
+async def measure(counter, label, coro_factory):
+    counter.count = 0
+    start = time.perf_counter()
+    rows = await coro_factory()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {len(rows):>6} {elapsed:>10.3f} {counter.count:>12}")
+
+
+async def bench(n_orders, legacy_ratio):
+    counter = RoundTripCounter()
+    async with connected(event_listeners=[counter], database_name=BENCH_DATABASE_NAME) as database:
+        try:
+            await seed(database, n_orders, legacy_ratio)
+            print(f"{n_orders} orders, {legacy_ratio:.0%} legacy")
+            print(f"{'scenario':<42} {'rows':>6} {'latency(s)':>10} {'round trips':>12}")
+
+            async def page(limit, status=None):
+                query = {"status": status} if status else {}
+                return (await orders.list_orders(database, query, limit))[0]
+
+            await measure(counter, "legacy N+1 (1000 rows)", lambda: legacy_list_admin_orders(database))
+            await measure(counter, "batched, page of 1000", lambda: page(1000))
+            await measure(counter, "batched, page of 100", lambda: page(100))
+            await measure(counter, "batched, pending only, page of 100", lambda: page(100, "pending"))
+
+            counter.count = 0
+            start = time.perf_counter()
+            updated = await orders.backfill(database)
+            print(f"migration: {updated} orders backfilled in {time.perf_counter() - start:.2f}s "
+                  f"({counter.count} round trips)")
+
+            await measure(counter, "legacy N+1 after migration (1000 rows)", lambda: legacy_list_admin_orders(database))
+            await measure(counter, "batched after migration, page of 1000", lambda: page(1000))
+        finally:
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--legacy-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(bench(args.orders, args.legacy_ratio))
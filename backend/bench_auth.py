@@ -0,0 +1,85 @@
+"""
+Microbenchmark of authenticated requests/sec on GET /orders/me, run in-process
+against the ASGI app (no HTTP server) and the MongoDB configured by MONGODB_URL.
+
+Scenarios:
+    lookup  - user cache disabled, one users.find_one per request (previous behaviour)
+    cached  - in-process user cache enabled
+    claims  - AUTH_TOKEN_CLAIMS tokens, no user lookup at all
+
+Usage:
+    python bench_auth.py [--requests 5000] [--concurrency 50]
+
+A temporary bench user is created and removed again.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+import httpx
+
+import main
+from database import db
+
+BENCH_EMAIL = "bench-auth@shopmanager.local"
+
+
+async def run_scenario(client, token, total, concurrency):
+    headers = {"Authorization": f"Bearer {token}"}
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get("/orders/me", headers=headers)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def bench(total, concurrency):
+    await db["users"].delete_many({"email": BENCH_EMAIL})
+    inserted = await db["users"].insert_one({
+        "username": "bench", "email": BENCH_EMAIL, "role": "staff", "hashed_password": "x"
+    })
+    expires = timedelta(minutes=5)
+    plain_token = main.create_access_token({"sub": BENCH_EMAIL}, expires)
+    claims_token = main.create_access_token(
+        {"sub": BENCH_EMAIL, "uid": str(inserted.inserted_id), "role": "staff", "name": "bench"}, expires
+    )
+    default_ttl = main.user_cache.ttl
+
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = {}
+            for label, token, ttl, claims in [
+                ("lookup", plain_token, 0, False),
+                ("cached", plain_token, default_ttl or 60, False),
+                ("claims", claims_token, default_ttl or 60, True),
+            ]:
+                main.user_cache.clear()
+                main.user_cache.ttl = ttl
+                main.AUTH_TOKEN_CLAIMS = claims
+                await run_scenario(client, token, min(200, total), concurrency)  # warm-up
+                results[label] = await run_scenario(client, token, total, concurrency)
+
+        print(f"{'scenario':>8} {'req/s':>10} {'vs lookup':>10}")
+        for label, rps in results.items():
+            print(f"{label:>8} {rps:>10.0f} {rps / results['lookup']:>9.2f}x")
+    finally:
+        main.user_cache.ttl = default_ttl
+        await db["users"].delete_many({"email": BENCH_EMAIL})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.concurrency))
@@ -0,0 +1,150 @@
+"""
+Benchmark for the /ai/chat proxy against a local stub standing in for OpenRouter:
+time-to-first-token and throughput of the old per-request client (wait for the
+full body) vs. the pooled streaming ChatProxy, plus repeated prompts served
+from its cache.
+
+Usage:
+    python bench_chat.py [--requests 200] [--concurrency 50] [--tokens 40] [--token-delay 0.01]
+
+The stub can also back a real server for manual testing:
+    python bench_chat.py stub --port 8090
+    OPENROUTER_BASE_URL=http://127.0.0.1:8090 OPENROUTER_API_KEY=stub python main.py
+
+The stub speaks plain HTTP on loopback, so the TLS handshakes the pooled client
+saves against the real API are not part of these numbers.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import uvicorn
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from bench_login_storm import percentile
+from cache import TTLCache
+from chat import ChatProxy
+
+
+def stub_app(tokens, first_token_delay, token_delay, prefill_per_1k=0.0):
+    """
+    OpenAI-compatible /chat/completions that emits `tokens` words with fixed delays.
+
+    :param prefill_per_1k: Extra first-token delay per 1000 prompt tokens (~4 chars each)
+    """
+    app = FastAPI()
+    app.state.connections = set()
+
+    @app.post("/chat/completions")
+    async def completions(request: Request, payload: dict = Body(...)):
+        app.state.connections.add((request.client.host, request.client.port))
+        words = [f"word{i} " for i in range(tokens)]
+        prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+        delay = first_token_delay + prefill_per_1k * prompt_chars / 4000
+        if not payload.get("stream"):
+            await asyncio.sleep(delay + token_delay * tokens)
+            return {"choices": [{"message": {"role": "assistant", "content": "".join(words)}}]}
+
+        async def events():
+            yield ": OPENROUTER PROCESSING\n\n"
+            await asyncio.sleep(delay)
+            for word in words:
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': word}}]})}\n\n"
+                await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+async def start_stub(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def legacy_request(base_url, message):
+    """The old proxy: a fresh client per request, returning once the whole body arrived."""
+    start = time.perf_counter()
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{base_url}/chat/completions", timeout=60.0, json={
+            "model": "stub", "messages": [{"role": "user", "content": message}],
+        })
+        response.raise_for_status()
+        response.json()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def proxy_request(proxy, message, context=None):
+    start = time.perf_counter()
+    first = None
+    chunks, _ = await proxy.stream(message, context)
+    async for _ in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def run(label, make_request, prompts, concurrency):
+    limiter = asyncio.Semaphore(concurrency)
+
+    async def one(prompt):
+        async with limiter:
+            return await make_request(prompt)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(p) for p in prompts))
+    elapsed = time.perf_counter() - start
+    ttft = [r[0] * 1000 for r in results]
+    total = [r[1] * 1000 for r in results]
+    print(f"{label:<16} {len(prompts) / elapsed:>8.1f} {percentile(ttft, 50):>9.0f} {percentile(ttft, 99):>9.0f} "
+          f"{percentile(total, 50):>10.0f}", end="")
+
+
+async def bench(args):
+    app = stub_app(args.tokens, args.first_token_delay, args.token_delay)
+    server, task = await start_stub(app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    proxy = ChatProxy(base_url, "stub", "stub", max_concurrency=args.concurrency,
+                      max_queue=args.requests, cache=TTLCache(maxsize=args.requests, ttl=3600))
+    await proxy.start()
+    try:
+        print(f"{args.requests} requests, {args.concurrency} concurrent, {args.tokens} tokens each")
+        print(f"{'path':<16} {'req/s':>8} {'ttft p50':>9} {'ttft p99':>9} {'total p50':>10} {'connections':>12}")
+        prompts = [f"question {i}" for i in range(args.requests)]
+        for label, make_request in [
+            ("per-request", lambda p: legacy_request(base_url, p)),
+            ("pooled stream", lambda p: proxy_request(proxy, p)),
+            ("cached repeat", lambda p: proxy_request(proxy, p)),
+        ]:
+            app.state.connections.clear()
+            await run(label, make_request, prompts, args.concurrency)
+            print(f" {len(app.state.connections):>12}")
+        print(f"cache: {proxy.cache.stats()['hits']} hits, {proxy.cache.stats()['misses']} misses")
+    finally:
+        await proxy.close()
+        server.should_exit = True
+        await task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", choices=["bench", "stub"], default="bench")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    if args.mode == "stub":
+        uvicorn.run(stub_app(args.tokens, args.first_token_delay, args.token_delay), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(bench(args))
@@ -0,0 +1,140 @@
+"""
+Benchmark for inventory-grounded chat prompts: prompt size and end-to-end
+latency (through ChatProxy and a stub model whose first-token delay grows with
+prompt length) for no context, the whole catalog pasted into the prompt, and
+the retrieved InventoryContext. Also times a cold context load vs. a warm
+incremental refresh after a few product writes.
+
+Usage:
+    python bench_chat_context.py [--products 5000] [--prefill-per-1k 0.2]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import sales_rollup
+from bench_chat import proxy_request, start_stub, stub_app
+from bench_prediction import BENCH_DATABASE_NAME
+from chat import ChatProxy
+from database import connected
+from inventory_context import PRODUCT_PROJECTION, InventoryContext, estimate_tokens
+
+
+CATEGORIES = {
+    "Dairy": ["Milk", "Cheese", "Yogurt", "Butter", "Cream"],
+    "Bakery": ["Bread", "Bagels", "Croissant", "Muffins", "Rolls"],
+    "Beverages": ["Coffee Beans", "Tea", "Orange Juice", "Sparkling Water", "Cola"],
+    "Produce": ["Apples", "Bananas", "Tomatoes", "Onions", "Potatoes"],
+    "Stationery": ["Pens", "Notebooks", "Envelopes", "Stapler", "Printer Paper"],
+}
+BRANDS = ["Acme", "Golden", "Farmhouse", "Sunrise", "Northside", "Valley", "Urban", "Classic"]
+QUESTIONS = [
+    "How much milk do we have left?",
+    "Which dairy products are running low?",
+    "Should I reorder coffee beans this week?",
+    "What are our best sellers right now?",
+    "Do we have enough printer paper?",
+    "How many orders are waiting for approval?",
+]
+
+
+async def seed(database, n_products, days=30, seed=5):
+    rng = random.Random(seed)
+    for name in ("products", "sales", sales_rollup.ROLLUP_COLLECTION):
+        await database[name].delete_many({})
+    products = []
+    for i in range(n_products):
+        category = rng.choice(list(CATEGORIES))
+        products.append({
+            "_id": ObjectId(), "name": f"{rng.choice(BRANDS)} {rng.choice(CATEGORIES[category])} #{i}",
+            "category": category, "price": round(rng.uniform(1, 50), 2),
+            "current_stock": rng.randint(0, 200), "low_stock_threshold": 10,
+        })
+    await database["products"].insert_many(products)
+
+    now = datetime.utcnow()
+    sales = [
+        {"product_id": str(p["_id"]), "quantity_sold": rng.randint(1, 10), "status": rng.choice(["approved", "pending"]),
+         "timestamp": now - timedelta(days=rng.randrange(days))}
+        for p in products for _ in range(rng.randint(0, 4))
+    ]
+    if sales:
+        await database["sales"].insert_many(sales)
+    await sales_rollup.backfill(database)
+    return products
+
+
+def full_catalog_context(products):
+    """The naive alternative: every product row in every prompt."""
+    return "\n".join(f"{p['name']} | {p['category']} | {p['current_stock']} | {p['low_stock_threshold']} | {p['price']}"
+                     for p in products)
+
+
+async def bench(args):
+    async with connected(database_name=BENCH_DATABASE_NAME) as database:
+        server, task = await start_stub(stub_app(args.tokens, args.first_token_delay, args.token_delay,
+                                                 args.prefill_per_1k), args.port)
+        proxy = ChatProxy(f"http://127.0.0.1:{args.port}", "stub", "stub")
+        await proxy.start()
+        try:
+            products = await seed(database, args.products)
+            context = InventoryContext()
+
+            start = time.perf_counter()
+            await context.refresh(database)
+            cold = time.perf_counter() - start
+            touched = random.Random(1).sample(products, min(10, len(products)))
+            for product in touched:
+                await database["products"].update_one({"_id": product["_id"]}, {"$inc": {"current_stock": -1}})
+            context.mark_products(*(p["_id"] for p in touched))
+            start = time.perf_counter()
+            await context.refresh(database)
+            warm = time.perf_counter() - start
+            print(f"{args.products} products: cold context load {cold * 1000:.0f}ms, "
+                  f"refresh after {len(touched)} writes {warm * 1000:.1f}ms")
+
+            catalog = full_catalog_context(await database["products"].find({}, PRODUCT_PROJECTION).to_list(None))
+            print(f"{'prompt':<10} {'tokens avg':>11} {'tokens max':>11} {'build ms':>9} {'ttft ms':>8} {'total ms':>9}")
+            for label in ("none", "full", "retrieved"):
+                tokens, build_ms, ttft_ms, total_ms = [], [], [], []
+                for question in QUESTIONS:
+                    start = time.perf_counter()
+                    if label == "retrieved":
+                        text = await context.build(database, question)
+                    else:
+                        text = catalog if label == "full" else None
+                    build_ms.append((time.perf_counter() - start) * 1000)
+                    tokens.append(sum(estimate_tokens(m["content"]) for m in proxy.messages(question, text)))
+                    first, total = await proxy_request(proxy, question, text)
+                    ttft_ms.append(first * 1000 + build_ms[-1])
+                    total_ms.append(total * 1000 + build_ms[-1])
+                print(f"{label:<10} {statistics.mean(tokens):>11.0f} {max(tokens):>11} {statistics.mean(build_ms):>9.1f} "
+                      f"{statistics.mean(ttft_ms):>8.0f} {statistics.mean(total_ms):>9.0f}")
+
+            if args.show:
+                print()
+                print(await context.build(database, QUESTIONS[0]))
+        finally:
+            await proxy.close()
+            server.should_exit = True
+            await task
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--prefill-per-1k", type=float, default=0.2, help="Stub seconds per 1000 prompt tokens")
+    parser.add_argument("--show", action="store_true", help="Print a sample rendered context")
+    asyncio.run(bench(parser.parse_args()))
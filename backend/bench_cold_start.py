@@ -0,0 +1,94 @@
+"""
+Cold-start benchmark: import cost of the API and model modules, then for a
+freshly launched server (with and without model pool warm-up) the time until
+it accepts requests and the latency of the first and second GET /prediction.
+
+Usage (needs MongoDB and an existing user, like the server itself):
+    python bench_cold_start.py --email admin@shopmanager.com --password admin123
+
+Track the numbers across releases to catch cold-start regressions.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+IMPORTS = [
+    ("main (API process)", "import main"),
+    ("ai_engine (workers)", "import ai_engine"),
+    ("pandas + sklearn (legacy path)", "import pandas, sklearn.linear_model"),
+]
+
+
+def import_seconds(statement):
+    """Import time in a fresh interpreter, so nothing is already cached in sys.modules."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_until_ready(url, process, timeout):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/openapi.json", timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+def timed_get(client, path, headers):
+    start = time.perf_counter()
+    response = client.get(path, headers=headers)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_server(args, warm):
+    url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "MODEL_POOL_WARMUP": "true" if warm else "false",
+           "FORECAST_INTERVAL_SECONDS": "0"}  # keep the scheduler out of the way (startup run only)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    try:
+        startup = wait_until_ready(url, process, args.timeout)
+        with httpx.Client(base_url=url, timeout=120) as client:
+            token = client.post("/token", data={"username": args.email, "password": args.password}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            first = timed_get(client, "/prediction?fresh=true", headers)
+            second = timed_get(client, "/prediction?fresh=true", headers)
+        return startup, first, second
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main(args):
+    print(f"{'import':<32} {'seconds':>8}")
+    for label, statement in IMPORTS:
+        print(f"{label:<32} {import_seconds(statement):>8.2f}")
+
+    print()
+    print(f"{'server':<12} {'startup s':>10} {'1st /prediction ms':>19} {'2nd /prediction ms':>19}")
+    for warm in (False, True):
+        startup, first, second = run_server(args, warm)
+        print(f"{'warm-up' if warm else 'lazy':<12} {startup:>10.2f} {first * 1000:>19.0f} {second * 1000:>19.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--email", default="admin@shopmanager.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    main(parser.parse_args())
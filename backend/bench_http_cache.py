@@ -0,0 +1,175 @@
+"""
+Bandwidth and server CPU saved by ETags (304 Not Modified) and compression,
+measured with a browsing script modelled on the dashboard (`frontend/script.js`):
+dashboard, products, marketplace, sales form, a sale, predictions, back to the
+dashboard. Every few sessions an admin approves an order, which changes stock
+and so the catalog version.
+
+Each mode runs the same sessions against one server:
+    plain          no conditional requests, no compression
+    gzip           compression only
+    etag           conditional requests only
+    etag+gzip      both (and etag+br when brotli is installed)
+
+Usage (after `python generate_data.py --drop`):
+    python bench_http_cache.py [--sessions 40] [--rounds 3] [--write-every 5]
+
+Server CPU is read from /proc for the single worker process (Linux only);
+bytes include response headers, so a 304 isn't free.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from bench_scaling import login, start_server, stop_server
+from compression import brotli
+from generate_data import LOADTEST_PASSWORD, user_email
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def server_cpu_seconds(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return float("nan")
+    # utime and stime, fields 14 and 15 of stat(5)
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class Browser:
+    """Just enough of a browser HTTP cache: stores tagged responses, revalidates them."""
+
+    def __init__(self, client, headers, conditional, accept_encoding):
+        self.client = client
+        self.headers = {**headers, "Accept-Encoding": accept_encoding}
+        self.conditional = conditional
+        self.cache = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes = 0
+
+    def _count(self, response):
+        self.requests += 1
+        self.bytes += response.num_bytes_downloaded + sum(len(k) + len(v) + 4 for k, v in response.headers.raw)
+
+    async def get(self, path, params=None):
+        key = (path, tuple(sorted((params or {}).items())))
+        headers = dict(self.headers)
+        cached = self.cache.get(key)
+        if self.conditional and cached is not None:
+            headers["If-None-Match"] = cached[0]
+        response = await self.client.get(path, params=params, headers=headers)
+        self._count(response)
+        if response.status_code == 304:
+            self.not_modified += 1
+            return cached[1], cached[2]
+        response.raise_for_status()
+        if self.conditional and "etag" in response.headers:
+            self.cache[key] = (response.headers["etag"], response.json(), response.headers.get(NEXT_CURSOR_HEADER))
+        return response.json(), response.headers.get(NEXT_CURSOR_HEADER)
+
+    async def post(self, path, **kwargs):
+        response = await self.client.post(path, headers=self.headers, **kwargs)
+        self._count(response)
+        return response
+
+    async def all_products(self, **params):
+        products, cursor = [], None
+        while True:
+            page_params = {"limit": 1000, **params, **({"cursor": cursor} if cursor else {})}
+            page, cursor = await self.get("/products", page_params)
+            products.extend(page)
+            if not cursor:
+                return products
+
+
+async def session(browser, rounds):
+    table_fields = "name,category,price,current_stock,low_stock_threshold"
+    products = []
+    for _ in range(rounds):
+        await browser.get("/users/me")
+        products = await browser.all_products(fields="name,current_stock,low_stock_threshold")  # dashboard
+        await browser.get("/products", {"limit": 100, "fields": table_fields})  # products tab
+        await browser.get("/products", {"limit": 100, "fields": table_fields})  # marketplace
+        await browser.all_products(fields="name,current_stock", sort="name")  # sales form
+        await browser.get("/prediction")
+    if products:
+        await browser.post("/sales", json={"product_id": products[len(products) // 2]["_id"], "quantity_sold": 1})
+
+
+async def approve_one(client, admin_headers):
+    response = await client.get("/admin/orders", params={"status": "pending", "limit": 1}, headers=admin_headers)
+    if response.status_code == 200 and response.json():
+        await client.post(f"/admin/orders/{response.json()[0]['_id']}/approve", headers=admin_headers)
+
+
+async def run_mode(url, pid, user_headers, admin_headers, conditional, encoding, args):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        browsers = [Browser(client, headers, conditional, encoding) for headers in user_headers]
+        cpu_start, start = server_cpu_seconds(pid), time.perf_counter()
+        for i in range(args.sessions):
+            if args.write_every and i and i % args.write_every == 0:
+                await approve_one(client, admin_headers)
+            await session(browsers[i % len(browsers)], args.rounds)
+        elapsed = time.perf_counter() - start
+        cpu = server_cpu_seconds(pid) - cpu_start
+    requests = sum(b.requests for b in browsers)
+    return {
+        "requests": requests,
+        "not_modified": sum(b.not_modified for b in browsers),
+        "kb": sum(b.bytes for b in browsers) / 1024,
+        "cpu_ms": cpu * 1000,
+        "seconds": elapsed,
+    }
+
+
+async def login_users(url, n):
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        headers = []
+        for i in range(n):
+            response = await client.post("/token", data={"username": user_email(i), "password": LOADTEST_PASSWORD})
+            response.raise_for_status()
+            headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+        return headers
+
+
+def main(args):
+    modes = {"plain": (False, "identity"), "gzip": (False, "gzip"), "etag": (True, "identity"),
+             "etag+gzip": (True, "gzip")}
+    if brotli is not None:
+        modes["etag+br"] = (True, "br")
+    process, url = start_server(1, args.port, None)
+    try:
+        admin_headers = login(url)
+        user_headers = asyncio.run(login_users(url, args.users))
+        # Warm the server's caches so the first mode isn't penalised
+        asyncio.run(run_mode(url, process.pid, user_headers, admin_headers, False, "identity",
+                             argparse.Namespace(sessions=1, rounds=1, write_every=0)))
+        print(f"{args.sessions} sessions x {args.rounds} rounds, an approval every {args.write_every} sessions")
+        print(f"{'mode':<10} {'requests':>8} {'304s':>6} {'KB':>9} {'KB/req':>7} {'cpu ms':>8} {'cpu/req':>8} "
+              f"{'bytes saved':>11} {'cpu saved':>9}")
+        baseline = None
+        for name, (conditional, encoding) in modes.items():
+            r = asyncio.run(run_mode(url, process.pid, user_headers, admin_headers, conditional, encoding, args))
+            baseline = baseline or r
+            print(f"{name:<10} {r['requests']:>8} {r['not_modified']:>6} {r['kb']:>9.0f} {r['kb'] / r['requests']:>7.1f} "
+                  f"{r['cpu_ms']:>8.0f} {r['cpu_ms'] / r['requests']:>8.2f} {1 - r['kb'] / baseline['kb']:>11.0%} "
+                  f"{1 - r['cpu_ms'] / baseline['cpu_ms']:>9.0%}")
+    finally:
+        stop_server(process)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the views per session")
+    parser.add_argument("--write-every", type=int, default=5, help="Sessions between order approvals (0: never)")
+    parser.add_argument("--users", type=int, default=10, help="Distinct browsers (each with its own cache)")
+    parser.add_argument("--port", type=int, default=8098)
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""
+Login-storm benchmark: fires a burst of concurrent POST /token requests and
+samples the latency of unrelated GET /products calls before and during the burst.
+
+Run against a live server (python main.py):
+    python bench_login_storm.py --url http://localhost:8080 \
+        --email admin@shopmanager.com --password admin123 --logins 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def sample_products(client, headers, stop):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/products", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def login(client, email, password):
+    start = time.perf_counter()
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def bench(url, email, password, logins, baseline_seconds):
+    limits = httpx.Limits(max_connections=logins + 10)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        token = (await client.post("/token", data={"username": email, "password": password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_products(client, headers, stop))
+        await asyncio.sleep(baseline_seconds)
+        stop.set()
+        baseline = await sampler
+
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_products(client, headers, stop))
+        start = time.perf_counter()
+        login_latencies = await asyncio.gather(*(login(client, email, password) for _ in range(logins)))
+        storm_seconds = time.perf_counter() - start
+        stop.set()
+        during = await sampler
+
+    print(f"{logins} concurrent logins finished in {storm_seconds:.2f}s "
+          f"(login p50 {statistics.median(login_latencies):.0f}ms, p99 {percentile(login_latencies, 99):.0f}ms)")
+    print(f"{'GET /products':>16} {'samples':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, samples in [("baseline", baseline), ("during storm", during)]:
+        print(f"{label:>16} {len(samples):>8} {percentile(samples, 50):>8.1f} {percentile(samples, 99):>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--email", default="admin@shopmanager.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.email, args.password, args.logins, args.baseline_seconds))
@@ -0,0 +1,87 @@
+"""
+Benchmark of throughput vs. MONGO_MAX_POOL_SIZE: N coroutines run the same mix
+of indexed point reads and a small aggregation for a fixed time against each
+pool size; reports operations/s, p50/p99 latency and the peak number of
+operations waiting for a connection.
+
+Usage:
+    python bench_pool.py [--concurrency 200] [--sizes 1 2 5 10 25 50 100] [--seconds 10]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards. The
+other MONGO_* settings (timeouts, compressors) come from the environment as in
+the API, so they can be compared the same way.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import database
+import metrics
+from bench_login_storm import percentile
+from bench_prediction import BENCH_DATABASE_NAME
+
+
+async def seed(db, n_products):
+    await db["products"].delete_many({})
+    rng = random.Random(3)
+    await db["products"].insert_many([
+        {"_id": i, "name": f"Product {i}", "category": f"Category {i % 20}", "price": round(rng.uniform(1, 100), 2),
+         "current_stock": rng.randint(0, 500)}
+        for i in range(n_products)
+    ])
+
+
+async def worker(db, n_products, deadline, latencies, rng):
+    products = db["products"]
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        if rng.random() < 0.9:
+            await products.find_one({"_id": rng.randrange(n_products)})
+        else:
+            category = f"Category {rng.randrange(20)}"
+            await products.aggregate([
+                {"$match": {"category": category}},
+                {"$group": {"_id": None, "stock": {"$sum": "$current_stock"}}},
+            ]).to_list(None)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(pool_size, args):
+    listener = metrics.MongoPoolListener()
+    db = database.connect(event_listeners=[listener], database_name=BENCH_DATABASE_NAME,
+                          mongo_max_pool_size=pool_size, mongo_min_pool_size=0)
+    try:
+        await db.command("ping")
+        latencies = []
+        deadline = time.perf_counter() + args.seconds
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(db, args.products, deadline, latencies, random.Random(i))
+                               for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        print(f"{pool_size:>9} {len(latencies) / elapsed:>9.0f} {percentile(latencies, 50):>8.2f} "
+              f"{percentile(latencies, 99):>8.2f} {listener.max_waiting:>11} {listener.timeouts:>8}")
+    finally:
+        database.close()
+
+
+async def main(args):
+    async with database.connected(database_name=BENCH_DATABASE_NAME) as db:
+        await seed(db, args.products)
+    try:
+        print(f"{args.concurrency} concurrent coroutines, {args.seconds:.0f}s per pool size")
+        print(f"{'pool size':>9} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max waiting':>11} {'timeouts':>8}")
+        for size in args.sizes:
+            await run(size, args)
+    finally:
+        async with database.connected() as db:
+            await db.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 5, 10, 25, 50, 100])
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration per pool size")
+    parser.add_argument("--products", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,167 @@
+"""
+Benchmark for GET /prediction: legacy per-product aggregation + per-product
+LinearRegression fit vs. one read of the `sales_daily` rollup + batched NumPy fit.
+
+Usage:
+    python bench_prediction.py                      # seeds a bench database on MONGODB_URL
+    python bench_prediction.py --sizes 1000 10000   # custom catalog sizes
+    python bench_prediction.py --compute-only       # model fitting only, no MongoDB needed
+
+The Mongo benchmark writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import monitoring
+
+from ai_engine import StockPredictor
+from database import connected
+from forecasting import build_predictions, forecast_cache
+import sales_rollup
+
+BENCH_DATABASE_NAME = "small_shop_bench"
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def legacy_predictions(database):
+    """The pre-batching implementation of GET /prediction, kept for comparison."""
+    predictor = StockPredictor()
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    products = await database["products"].find().to_list(None)
+    predictions = []
+    for product in products:
+        product_id = str(product["_id"])
+        pipeline = [
+            {"$match": {"product_id": product_id, "timestamp": {"$gte": thirty_days_ago}}},
+            {"$project": {"date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, "quantity_sold": 1}},
+            {"$group": {"_id": "$date", "daily_total": {"$sum": "$quantity_sold"}}},
+            {"$sort": {"_id": 1}},
+        ]
+        daily_sales_cursor = await database["sales"].aggregate(pipeline).to_list(1000)
+        sales_history = [
+            {'date': datetime.strptime(d["_id"], "%Y-%m-%d"), 'quantity': d["daily_total"]}
+            for d in daily_sales_cursor
+        ]
+        predicted_need = predictor.predict_future_demand(sales_history, days_to_predict=7)
+        predictions.append({
+            "product_name": product["name"],
+            "current_stock": product["current_stock"],
+            "predicted_need": predicted_need,
+            "status": "Shortage Dept" if product["current_stock"] < predicted_need else "Stocked"
+        })
+    return predictions
+
+
+def synthetic_history(n_products, days=30, sale_probability=0.5, seed=42):
+    """Daily sales rows for `n_products` products, roughly half of the days having sales."""
+    rng = random.Random(seed)
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    rows = []
+    for p in range(n_products):
+        product_id = str(ObjectId())
+        base, trend = rng.uniform(1, 20), rng.uniform(-0.3, 0.3)
+        for day in range(days):
+            if rng.random() < sale_probability:
+                quantity = max(1, int(base + trend * (days - day) + rng.gauss(0, 2)))
+                rows.append({"product_id": product_id, "date": today - timedelta(days=day), "quantity": quantity})
+    return rows
+
+
+def bench_compute(sizes):
+    predictor = StockPredictor()
+    print(f"{'products':>10} {'legacy fit (s)':>15} {'batch fit (s)':>14} {'speedup':>8} {'mismatches':>11}")
+    for n in sizes:
+        rows = synthetic_history(n)
+        by_product = {}
+        for r in rows:
+            by_product.setdefault(r["product_id"], []).append(r)
+
+        start = time.perf_counter()
+        legacy = {pid: predictor.predict_future_demand(history) for pid, history in by_product.items()}
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # The sparse model fits the same line as the legacy path, through sale days only
+        batch = predictor.forecast_batch(
+            [r["product_id"] for r in rows], [r["date"] for r in rows], [r["quantity"] for r in rows],
+            model="linear-sparse", history_days=30,
+        )
+        batch_time = time.perf_counter() - start
+
+        # Off-by-one differences can appear where a total lands exactly on .5
+        mismatches = sum(1 for pid, value in legacy.items() if abs(batch.get(pid, 0) - value) > 1)
+        print(f"{n:>10} {legacy_time:>15.3f} {batch_time:>14.3f} {legacy_time / batch_time:>7.1f}x {mismatches:>11}")
+
+
+async def seed(database, n_products, batch_size=10000):
+    await database["products"].delete_many({})
+    await database["sales"].delete_many({})
+    rows = synthetic_history(n_products)
+    product_ids = sorted({r["product_id"] for r in rows})
+    products = [
+        {"_id": ObjectId(pid), "name": f"Product {i}", "category": "Bench", "price": 10.0,
+         "current_stock": random.randint(0, 200), "low_stock_threshold": 10}
+        for i, pid in enumerate(product_ids)
+    ]
+    for i in range(0, len(products), batch_size):
+        await database["products"].insert_many(products[i:i + batch_size])
+    sales = [
+        {"product_id": r["product_id"], "quantity_sold": r["quantity"], "timestamp": r["date"], "status": "approved"}
+        for r in rows
+    ]
+    for i in range(0, len(sales), batch_size):
+        await database["sales"].insert_many(sales[i:i + batch_size])
+    await sales_rollup.backfill(database)
+    return len(products), len(sales)
+
+
+async def bench_mongo(sizes, skip_legacy_above):
+    counter = RoundTripCounter()
+    async with connected(event_listeners=[counter], database_name=BENCH_DATABASE_NAME) as database:
+        print(f"{'products':>10} {'sales':>9} {'path':>7} {'latency (s)':>12} {'round trips':>12}")
+        try:
+            for n in sizes:
+                n_products, n_sales = await seed(database, n)
+                paths = [("batched", build_predictions)]
+                if n <= skip_legacy_above:
+                    paths.insert(0, ("legacy", legacy_predictions))
+                for label, func in paths:
+                    forecast_cache.clear()
+                    counter.count = 0
+                    start = time.perf_counter()
+                    await func(database)
+                    elapsed = time.perf_counter() - start
+                    print(f"{n_products:>10} {n_sales:>9} {label:>7} {elapsed:>12.3f} {counter.count:>12}")
+        finally:
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--compute-only", action="store_true", help="Benchmark model fitting without MongoDB")
+    parser.add_argument("--skip-legacy-above", type=int, default=50000,
+                        help="Skip the legacy path for catalogs larger than this")
+    args = parser.parse_args()
+
+    if args.compute_only:
+        bench_compute(args.sizes)
+    else:
+        asyncio.run(bench_mongo(args.sizes, args.skip_legacy_above))
@@ -0,0 +1,77 @@
+"""
+Benchmark for the reorder engine on a generated catalog (no MongoDB needed):
+time to compute demand statistics from loaded sales history, the vectorized
+plan itself, turning it into response rows and rendering the CSV export.
+
+Usage:
+    python bench_reorder.py [--products 50000] [--days 30] [--repeat 5]
+
+The target is the whole plan (statistics + plan + rows) for 50k SKUs in under a second.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+
+import reorder
+from backtest import synthetic_sales
+from forecasting import FORECAST_MODEL, HISTORY_DAYS
+
+
+def catalog(n_products, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            "_id": ObjectId(), "name": f"Product {i}", "category": rng.choice(["Dairy", "Bakery", "Produce"]),
+            "current_stock": rng.randint(0, 300),
+            "lead_time_days": rng.choice([None, 2, 5, 14]),
+            "service_level": rng.choice([None, 0.9, 0.95, 0.99]),
+        }
+        for i in range(n_products)
+    ]
+
+
+def timed(func, *args, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times) * 1000
+
+
+def main(args):
+    products = catalog(args.products)
+    sale_ids, dates, quantities = synthetic_sales(args.products, args.days)
+    # synthetic_sales numbers products 0..n-1; map them onto the catalog's ObjectIds
+    ids = np.array([str(p["_id"]) for p in products])[np.asarray(sale_ids, dtype=np.int64)].tolist()
+    print(f"{args.products} products, {len(ids)} product-day sales rows, model '{FORECAST_MODEL}'")
+
+    today = datetime.utcnow().date()
+    stats, stats_ms = timed(reorder.demand_stats, ids, dates, quantities, FORECAST_MODEL, HISTORY_DAYS, today,
+                            repeat=args.repeat)
+    columns, plan_ms = timed(reorder.plan, products, stats, repeat=args.repeat)
+    rows, rows_ms = timed(reorder.to_rows, products, columns, repeat=args.repeat)
+    _, csv_ms = timed(lambda: sum(len(chunk) for chunk in reorder.iter_csv(rows)), repeat=args.repeat)
+
+    print(f"{'step':<20} {'ms':>8}")
+    print(f"{'demand statistics':<20} {stats_ms:>8.1f}")
+    print(f"{'vectorized plan':<20} {plan_ms:>8.1f}")
+    print(f"{'response rows':<20} {rows_ms:>8.1f}")
+    print(f"{'csv export':<20} {csv_ms:>8.1f}")
+    total = stats_ms + plan_ms + rows_ms
+    print(f"{'total (json)':<20} {total:>8.1f}  {'OK' if total < 1000 else 'over'} vs 1000ms target")
+    print(f"{int(columns['needs_reorder'].sum())} products need reordering, "
+          f"{int(columns['order_quantity'].sum())} units suggested")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS, help="Days of generated sales history")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
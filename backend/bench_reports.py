@@ -0,0 +1,118 @@
+"""
+Benchmark for GET /reports/sales on a year of synthetic orders: cube backfill
+time, then report latency and size from the cubes vs. the raw `$group`
+fallback for every group-by and period, plus the cost of keeping the cubes
+current on approval.
+
+Usage:
+    python bench_reports.py [--orders 1000000] [--products 2000] [--users 200]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import reports
+from bench_prediction import BENCH_DATABASE_NAME
+from database import connected
+
+CATEGORIES = ["Dairy", "Bakery", "Beverages", "Produce", "Stationery", "Frozen", "Household", "Snacks"]
+
+
+async def seed(database, n_orders, n_products, n_users, days=365, batch_size=10000, seed=11):
+    rng = random.Random(seed)
+    for name in ("products", "sales", reports.SALES_CUBES, reports.CUBES_STATE):
+        await database[name].delete_many({})
+    products = [{"_id": ObjectId(), "name": f"Product {i}", "category": rng.choice(CATEGORIES),
+                 "price": round(rng.uniform(1, 50), 2), "current_stock": 1000, "low_stock_threshold": 10}
+                for i in range(n_products)]
+    await database["products"].insert_many(products)
+    users = [(str(ObjectId()), f"user{i}") for i in range(n_users)]
+
+    start = datetime.utcnow() - timedelta(days=days)
+    batch = []
+    for _ in range(n_orders):
+        product = rng.choice(products)
+        user_id, user_name = rng.choice(users)
+        quantity = rng.randint(1, 5)
+        batch.append({
+            "product_id": str(product["_id"]), "product_name": product["name"],
+            "user_id": user_id, "user_name": user_name, "quantity_sold": quantity,
+            "unit_price": product["price"], "total_price": product["price"] * quantity,
+            "status": "approved" if rng.random() < 0.9 else "pending",
+            "timestamp": start + timedelta(seconds=rng.randrange(days * 86400)),
+        })
+        if len(batch) == batch_size:
+            await database["sales"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await database["sales"].insert_many(batch, ordered=False)
+    return products, users
+
+
+async def timed_report(database, dim, grain, start, end, source, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        report = await reports.sales_report(database, dim, grain, start, end, source)
+        times.append(time.perf_counter() - t)
+    return report, statistics.median(times) * 1000
+
+
+async def bench(args):
+    async with connected(database_name=BENCH_DATABASE_NAME) as database:
+        try:
+            t = time.perf_counter()
+            products, users = await seed(database, args.orders, args.products, args.users)
+            print(f"Seeded {args.orders} orders over 365 days in {time.perf_counter() - t:.1f}s")
+
+            t = time.perf_counter()
+            cells = await reports.backfill(database)
+            print(f"Cube backfill: {cells} cells in {time.perf_counter() - t:.1f}s")
+
+            end = datetime.utcnow().date()
+            ranges = {"year": end - timedelta(days=364), "30 days": end - timedelta(days=29)}
+            print(f"{'group_by':<9} {'period':<6} {'range':<8} {'rows':>6} {'KB':>7} {'cubes ms':>9} {'sales ms':>9} {'speedup':>8}")
+            for label, start in ranges.items():
+                for dim in reports.DIMENSIONS:
+                    for grain in reports.GRAINS:
+                        cubes, cubes_ms = await timed_report(database, dim, grain, start, end, "cubes", args.repeat)
+                        raw, raw_ms = await timed_report(database, dim, grain, start, end, "sales", 1)
+                        for field in ("qty", "orders"):
+                            assert cubes["totals"][field] == raw["totals"][field], (dim, grain, field)
+                        size = len(json.dumps(cubes, separators=(",", ":"))) / 1024
+                        print(f"{dim:<9} {grain:<6} {label:<8} {len(cubes['rows']):>6} {size:>7.0f} "
+                              f"{cubes_ms:>9.1f} {raw_ms:>9.0f} {raw_ms / cubes_ms:>7.0f}x")
+
+            # Per-approval maintenance: the nine upserts in one bulk write
+            rng = random.Random(2)
+            times = []
+            for _ in range(args.approvals):
+                product = rng.choice(products)
+                user_id, user_name = rng.choice(users)
+                order = {"product_id": str(product["_id"]), "product_name": product["name"], "user_id": user_id,
+                         "user_name": user_name, "quantity_sold": 1, "total_price": product["price"],
+                         "timestamp": datetime.utcnow()}
+                t = time.perf_counter()
+                await reports.record_sale(database, order, product["category"])
+                times.append(time.perf_counter() - t)
+            print(f"Cube update per approval: median {statistics.median(times) * 1000:.2f}ms over {args.approvals}")
+        finally:
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5, help="Cube report runs per cell (median)")
+    parser.add_argument("--approvals", type=int, default=500)
+    asyncio.run(bench(parser.parse_args()))
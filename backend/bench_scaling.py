@@ -0,0 +1,145 @@
+"""
+Throughput of GET /products as the number of API workers grows: starts
+`serve.py --workers N` for each N, drives it at saturation from separate load
+generator processes and reports requests/s, p50/p99 latency and the speedup
+over one worker.
+
+Usage (after `python generate_data.py --drop`):
+    python bench_scaling.py [--workers 1 2 4 8] [--seconds 15] [--connections 64]
+
+On Linux the server and the load generators are pinned to disjoint cores
+(--server-cores, default half of them) so they don't compete; worker counts
+above the server's cores are skipped. Scaling stays near linear while MongoDB
+has headroom: run it on a separate host (MONGODB_URL) for the cleanest curve.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench_login_storm import percentile
+from generate_data import ADMIN_EMAIL, LOADTEST_PASSWORD
+from serve import usable_cores
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_server(workers, port, cpus):
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    preexec = (lambda: os.sched_setaffinity(0, cpus)) if cpus and hasattr(os, "sched_setaffinity") else None
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+        cwd=HERE, env=env, preexec_fn=preexec,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"serve.py exited with {process.returncode}")
+        try:
+            if httpx.get(url + "/openapi.json", timeout=1).status_code == 200:
+                # Every worker has to be up, not just the first one to accept
+                time.sleep(2 + workers * 0.5)
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("serve.py did not become ready")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def drive(url, headers, connections, seconds, limit):
+    latencies = []
+    failures = 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def loop():
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get("/products", params={"limit": limit})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    failures += 1
+
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return latencies, failures
+
+
+def load_process(url, headers, connections, seconds, limit, cpus):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    return asyncio.run(drive(url, headers, connections, seconds, limit))
+
+
+def login(url):
+    response = httpx.post(url + "/token", data={"username": ADMIN_EMAIL, "password": LOADTEST_PASSWORD}, timeout=30)
+    if response.status_code != 200:
+        raise SystemExit("Login failed: run generate_data.py first")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def main(args):
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    server_count = args.server_cores or max(1, usable_cores() // 2)
+    server_cpus = set(cores[:server_count]) if cores else None
+    client_cpus = (set(cores[server_count:]) or None) if cores else None
+    clients = args.clients or len(client_cpus or ()) or 2
+
+    print(f"GET /products?limit={args.limit}: {clients} load processes x {args.connections} connections, "
+          f"{args.seconds:.0f}s per run, server on {server_count} cores")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'failed':>7} {'speedup':>8} {'efficiency':>10}")
+    baseline = None
+    context = multiprocessing.get_context("spawn")
+    for workers in args.workers:
+        if server_cpus and workers > len(server_cpus):
+            print(f"{workers:>7} skipped: only {len(server_cpus)} server cores")
+            continue
+        process, url = start_server(workers, args.port, server_cpus)
+        try:
+            headers = login(url)
+            with context.Pool(clients) as pool:
+                results = pool.starmap(load_process, [
+                    (url, headers, args.connections, args.seconds, args.limit, client_cpus) for _ in range(clients)
+                ])
+        finally:
+            stop_server(process)
+        latencies = [ms for samples, _ in results for ms in samples]
+        failures = sum(f for _, f in results)
+        throughput = len(latencies) / args.seconds
+        baseline = baseline or throughput / workers
+        speedup = throughput / baseline
+        print(f"{workers:>7} {throughput:>9.0f} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} "
+              f"{failures:>7} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--connections", type=int, default=64, help="Concurrent connections per load process")
+    parser.add_argument("--clients", type=int, default=0, help="Load generator processes (default: one per client core)")
+    parser.add_argument("--server-cores", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=20, help="Products per page")
+    parser.add_argument("--port", type=int, default=8099)
+    main(parser.parse_args())
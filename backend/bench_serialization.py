@@ -0,0 +1,91 @@
+"""
+Benchmark of JSON serialization for a page of products as read from MongoDB
+(ObjectId ids, datetime stamps): the FastAPI paths a handler can take vs.
+`responses.db_response`. Reports CPU time per response and payload throughput.
+
+Usage:
+    python bench_serialization.py [--products 10000] [--repeat 20]
+
+Runs in-process; no database needed.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from models import ProductModel
+from responses import db_response
+
+ADAPTER = TypeAdapter(List[ProductModel])
+
+
+def make_documents(n, seed=5):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(), "name": f"Product {i}", "category": f"Category {i % 20}",
+            "price": round(rng.uniform(1, 100), 2), "current_stock": rng.randint(0, 500), "low_stock_threshold": 10,
+            "updated_at": start + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        }
+        for i in range(n)
+    ]
+
+
+def validated_jsonable(documents):
+    """response_model on FastAPI before its dump_json fast path: validate, jsonable_encoder, json.dumps."""
+    return JSONResponse(jsonable_encoder(ADAPTER.validate_python(documents), by_alias=True)).body
+
+
+def validated_dump_json(documents):
+    """response_model on current FastAPI: validate, then Pydantic's dump_json."""
+    return ADAPTER.dump_json(ADAPTER.validate_python(documents), by_alias=True)
+
+
+def plain_jsonable(documents):
+    """A handler returning dicts: jsonable_encoder over every value, then json.dumps."""
+    return JSONResponse(jsonable_encoder(documents, custom_encoder={ObjectId: str})).body
+
+
+def orjson_direct(documents):
+    return db_response(documents).body
+
+
+STRATEGIES = {
+    "response_model + jsonable_encoder": validated_jsonable,
+    "response_model + dump_json": validated_dump_json,
+    "jsonable_encoder + json.dumps": plain_jsonable,
+    "db_response (orjson)": orjson_direct,
+}
+
+
+def main(args):
+    documents = make_documents(args.products)
+    print(f"{args.products} products, best of {args.repeat}")
+    print(f"{'strategy':<34} {'cpu ms':>8} {'MB/s':>8} {'KB':>8} {'speedup':>8}")
+    baseline = None
+    for name, serialize in STRATEGIES.items():
+        serialize(documents)  # warm up
+        best = float("inf")
+        for _ in range(args.repeat):
+            # Each strategy gets its own copy, as each request would
+            batch = [dict(d) for d in documents]
+            start = time.process_time()
+            body = serialize(batch)
+            best = min(best, time.process_time() - start)
+        baseline = baseline or best
+        print(f"{name:<34} {best * 1000:>8.1f} {len(body) / best / 1e6:>8.1f} {len(body) / 1024:>8.0f} "
+              f"{baseline / best:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""
+Benchmark for bulk stock ingest: a generated CSV manifest streamed through
+stock_ingest.ingest vs. the per-line POST /stock logic (insert + find_one + update/insert).
+
+Usage:
+    python bench_stock_bulk.py [--lines 50000] [--products 5000] [--legacy-lines 2000]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+import stock_ingest
+from bench_prediction import BENCH_DATABASE_NAME, RoundTripCounter
+from database import connected
+from indexes import ensure_indexes
+
+
+def manifest_lines(n_lines, n_products, seed=3):
+    rng = random.Random(seed)
+    yield "product_name,category,quantity,price"
+    for _ in range(n_lines):
+        p = rng.randrange(n_products)
+        yield f"Item {p},Category {p % 25},{rng.randint(1, 50)},{rng.uniform(1, 100):.2f}"
+
+
+async def manifest_chunks(n_lines, n_products, chunk_size=64 * 1024):
+    buffer = []
+    size = 0
+    for line in manifest_lines(n_lines, n_products):
+        buffer.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "\n".join(buffer).encode()
+
+
+async def legacy_upload(database, n_lines, n_products):
+    """The per-line POST /stock logic: three round trips per manifest line."""
+    lines = manifest_lines(n_lines, n_products)
+    next(lines)
+    for line in lines:
+        name, category, quantity, price = line.split(",")
+        quantity, price = int(quantity), float(price)
+        await database["stock"].insert_one({"product_name": name, "category": category,
+                                            "quantity": quantity, "price": price})
+        product = await database["products"].find_one({"name": name})
+        if product:
+            await database["products"].update_one({"_id": product["_id"]},
+                                                   {"$inc": {"current_stock": quantity}, "$set": {"price": price}})
+        else:
+            await database["products"].insert_one({"name": name, "category": category, "price": price,
+                                                   "current_stock": quantity, "low_stock_threshold": 10})
+
+
+async def reset(database):
+    await database["stock"].delete_many({})
+    await database["products"].delete_many({})
+
+
+async def bench(n_lines, n_products, legacy_lines):
+    counter = RoundTripCounter()
+    async with connected(event_listeners=[counter], database_name=BENCH_DATABASE_NAME) as database:
+        try:
+            await ensure_indexes(database, ["products"])
+            print(f"{'path':<10} {'lines':>7} {'seconds':>8} {'lines/s':>9} {'round trips':>12} {'peak MiB':>9}")
+
+            if legacy_lines:
+                await reset(database)
+                counter.count = 0
+                start = time.perf_counter()
+                await legacy_upload(database, legacy_lines, n_products)
+                elapsed = time.perf_counter() - start
+                print(f"{'per-line':<10} {legacy_lines:>7} {elapsed:>8.2f} {legacy_lines / elapsed:>9.0f} "
+                      f"{counter.count:>12} {'-':>9}")
+
+            await reset(database)
+            counter.count = 0
+            tracemalloc.start()
+            start = time.perf_counter()
+            summary = await stock_ingest.ingest(database, manifest_chunks(n_lines, n_products), "csv")
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{'bulk':<10} {summary['applied']:>7} {elapsed:>8.2f} {summary['applied'] / elapsed:>9.0f} "
+                  f"{counter.count:>12} {peak / 2**20:>9.1f}")
+            if summary["error_count"]:
+                print(f"{summary['error_count']} rows rejected")
+        finally:
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--legacy-lines", type=int, default=2000, help="0 skips the per-line comparison")
+    args = parser.parse_args()
+    asyncio.run(bench(args.lines, args.products, args.legacy_lines))
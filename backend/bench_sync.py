@@ -0,0 +1,115 @@
+"""
+Delta-sync load test: simulated dashboard clients refreshing products and
+orders, either by re-downloading the full paginated lists (GET /products +
+GET /admin/orders) or by polling GET /sync with their last cursor. Between
+refresh rounds a few products are touched so each round has real changes.
+
+Run against a live server (python main.py):
+    python bench_sync.py --url http://localhost:8080 \
+        --email admin@shopmanager.com --password admin123 --clients 500 --rounds 5
+
+Touched products are re-saved with their current low_stock_threshold, so the
+only lasting change is their updated_at stamp.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from bench_login_storm import percentile
+from pagination import NEXT_CURSOR_HEADER
+
+
+async def fetch_all(client, headers, path):
+    """Walks a cursor-paginated list endpoint; returns body bytes transferred."""
+    total = 0
+    params = {"limit": 1000}
+    while True:
+        response = await client.get(path, headers=headers, params=params)
+        response.raise_for_status()
+        total += len(response.content)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return total
+        params["cursor"] = cursor
+
+
+async def full_refresh(client, headers, state):
+    return await fetch_all(client, headers, "/products") + await fetch_all(client, headers, "/admin/orders")
+
+
+async def sync_refresh(client, headers, state):
+    total = 0
+    while True:
+        params = {"limit": 1000}
+        if state.get("cursor"):
+            params["since"] = state["cursor"]
+        response = await client.get("/sync", headers=headers, params=params)
+        response.raise_for_status()
+        total += len(response.content)
+        body = response.json()
+        if body["reset"]:
+            # A reset transfers nothing, so counting it would flatter /sync
+            raise SystemExit("/sync answered reset: true mid-refresh; the byte comparison would be meaningless")
+        state["cursor"] = body["cursor"]
+        if not body["has_more"]:
+            return total
+
+
+async def touch_products(client, headers, products):
+    for product in products:
+        response = await client.put(f"/products/{product['_id']}", headers=headers,
+                                    json={"low_stock_threshold": product["low_stock_threshold"]})
+        response.raise_for_status()
+
+
+async def run(client, headers, refresh, clients, rounds, touched):
+    states = [{} for _ in range(clients)]
+    per_round = []
+    latencies = []
+
+    async def timed(state):
+        start = time.perf_counter()
+        size = await refresh(client, headers, state)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return size
+
+    for i in range(rounds + 1):
+        if i:
+            await touch_products(client, headers, touched)
+        per_round.append(sum(await asyncio.gather(*(timed(state) for state in states))))
+    return per_round, latencies
+
+
+async def bench(url, email, password, clients, rounds, changes):
+    limits = httpx.Limits(max_connections=min(clients, 200))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+        token = (await client.post("/token", data={"username": email, "password": password})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        products = (await client.get("/products", headers=headers, params={
+            "limit": changes, "fields": "low_stock_threshold"})).json()
+
+        print(f"{clients} clients, {rounds} refresh rounds, {len(products)} products changed per round")
+        print(f"{'mode':<6} {'initial MiB':>12} {'per round MiB':>14} {'total MiB':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        results = {}
+        for label, refresh in [("full", full_refresh), ("sync", sync_refresh)]:
+            per_round, latencies = await run(client, headers, refresh, clients, rounds, products)
+            results[label] = sum(per_round)
+            steady = sum(per_round[1:]) / max(rounds, 1)
+            print(f"{label:<6} {per_round[0] / 2**20:>12.2f} {steady / 2**20:>14.3f} {sum(per_round) / 2**20:>10.2f} "
+                  f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f}")
+        if results["sync"]:
+            print(f"full lists transferred {results['full'] / results['sync']:.1f}x the bytes of /sync")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--email", default="admin@shopmanager.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=10, help="Products touched between rounds")
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.email, args.password, args.clients, args.rounds, args.changes))
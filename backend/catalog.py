@@ -0,0 +1,36 @@
+"""
+Catalog version: one counter document bumped after every product or stock
+write, by the API (`products_changed`) and by scripts that edit products.
+
+GET /products tags each page with the version plus its query string, so a
+revalidating client gets 304 Not Modified without the catalog being queried
+or serialized. Read the version before the products: a page is then never
+labelled with a version newer than its data. The random epoch keeps tags
+unique if the counter document is ever removed.
+"""
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+VERSIONS_COLLECTION = "versions"
+CATALOG = "catalog"
+
+
+def _tag(document):
+    return f"{document['epoch']}.{document['n']}"
+
+
+async def bump(database):
+    document = await database[VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": CATALOG},
+        {"$inc": {"n": 1}, "$setOnInsert": {"epoch": str(ObjectId())}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return _tag(document)
+
+
+async def version(database):
+    document = await database[VERSIONS_COLLECTION].find_one({"_id": CATALOG})
+    if document is None:
+        return await bump(database)
+    return _tag(document)
@@ -0,0 +1,204 @@
+"""
+Proxy for the AI chat assistant (OpenRouter's OpenAI-compatible API).
+
+One pooled `httpx.AsyncClient` lives for the whole app, so requests reuse
+keep-alive connections (HTTP/2 when the optional `h2` package is installed).
+Completions are streamed through to the browser token by token, concurrent
+upstream calls are capped with a bounded waiting queue, and finished answers
+to identical prompts are served from an LRU cache.
+"""
+import asyncio
+import json
+import logging
+
+import httpx
+from fastapi import HTTPException
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - only needed to enable HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant for ShopManager, a software for small business inventory and sales management. "
+    "Provide direct, helpful answers. Avoid technical jargon or showing your internal thought process."
+)
+CONTEXT_PROMPT = (
+    "Current data from this shop follows. Use it for questions about stock, sales or orders; "
+    "if it doesn't cover the question, say so instead of guessing figures.\n"
+)
+
+
+async def _replay(text):
+    yield text
+
+
+class ChatProxy:
+    """
+    :param base_url: OpenAI-compatible API root, e.g. a local stub server in tests
+    :param max_concurrency: Upstream completions allowed at once
+    :param max_queue: Requests allowed to wait for a slot before new ones get 503
+    :param cache: TTLCache for finished answers keyed by prompt (None disables it)
+    """
+
+    def __init__(self, base_url, api_key, model, max_concurrency=8, max_queue=64, cache=None, timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.cache = cache if cache is not None else TTLCache(maxsize=0)
+        self.timeout = timeout
+        self._client = None
+        self._semaphore = None
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.upstream_errors = 0
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "HTTP-Referer": "http://localhost:8080",
+                "X-Title": "ShopManager AI",
+            },
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _acquire(self):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="AI service is busy, please try again shortly")
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def messages(self, message, context=None):
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        if context:
+            messages.append({"role": "system", "content": CONTEXT_PROMPT + context})
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    async def stream(self, message, context=None):
+        """
+        Starts a completion and returns (async iterator of text deltas, cached).
+        Upstream errors are raised here, before any bytes reach the browser.
+
+        :param context: Inventory facts for the system prompt; part of the cache key,
+                        so answers are not reused once the data behind them changes
+        """
+        key = (context, message.strip())
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _replay(cached), True
+
+        chunks = self._relay(message, context, key)
+        # Runs up to the upstream status check, so errors surface as HTTP errors
+        await chunks.__anext__()
+        return chunks, False
+
+    async def _relay(self, message, context, key):
+        """
+        Holds a concurrency slot for the whole upstream call and relays content
+        deltas from its SSE stream; caches complete answers. The slot is taken
+        inside the generator, so a stream that is never consumed (the browser
+        went away before the first chunk) still gives it back when closed.
+        Yields one empty string once upstream has accepted the request.
+        """
+        await self._acquire()
+        parts = []
+        complete = False
+        try:
+            try:
+                request = self._client.build_request("POST", "/chat/completions", json={
+                    "model": self.model,
+                    "messages": self.messages(message, context),
+                    "stream": True,
+                })
+                response = await self._client.send(request, stream=True)
+            except httpx.HTTPError as e:
+                self.upstream_errors += 1
+                logger.warning("AI service unreachable", extra={"error": repr(e)})
+                raise HTTPException(status_code=502, detail="Could not reach AI service")
+
+            try:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    self.upstream_errors += 1
+                    logger.warning("AI service error", extra={"status": response.status_code, "body": body.decode(errors="replace")})
+                    raise HTTPException(status_code=response.status_code, detail="Error from AI service")
+                yield ""
+
+                async for line in response.aiter_lines():
+                    # Skip blank separators and ": OPENROUTER PROCESSING" keepalive comments
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        # Keep reading to the end so the connection goes back to the pool
+                        complete = True
+                        continue
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if "error" in chunk:
+                        self.upstream_errors += 1
+                        logger.warning("AI service stream error", extra={"error": chunk["error"]})
+                        break
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await response.aclose()
+                if response.status_code == 200:
+                    self.completed += 1
+        finally:
+            self._release()
+        if complete:
+            self.cache.set(key, "".join(parts))
+
+    async def complete(self, message, context=None):
+        """Non-streaming answer in the OpenAI response shape the old proxy returned."""
+        chunks, _ = await self.stream(message, context)
+        text = "".join([delta async for delta in chunks])
+        return {"model": self.model, "choices": [{"message": {"role": "assistant", "content": text}}]}
+
+    def stats(self):
+        return {
+            "base_url": self.base_url,
+            "http2": HTTP2_AVAILABLE,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "upstream_errors": self.upstream_errors,
+            "cache": self.cache.stats(),
+        }
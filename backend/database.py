@@ -1,14 +1,162 @@
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+"""
+MongoDB connection shared by the API and the maintenance scripts.
+
+Settings come from the environment (or `.env`): MONGODB_URL, DATABASE_NAME and
+the MONGO_* pool, timeout, compression and read preference options below. The
+API connects in its lifespan and closes on shutdown; scripts use
+
+    async with connected() as db:
+        ...
+
+`db` and `read_db` are stable handles that forward to the current connection,
+so modules can keep `from database import db` at import time. `read_db` applies
+MONGO_READ_PREFERENCE and is meant for read-only endpoints that tolerate
+replication lag (predictions, reports, reorder plans, chat context).
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 
+# Also exposes .env to the modules that read os.getenv at import time
 load_dotenv()
 
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = "small_shop_inventory"
+logger = logging.getLogger(__name__)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+class DatabaseSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    mongodb_url: str = "mongodb://localhost:27017"
+    database_name: str = "small_shop_inventory"
+    mongo_app_name: str = "small-shop-api"
+    mongo_max_pool_size: int = Field(100, ge=1)
+    mongo_min_pool_size: int = Field(0, ge=0)
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_connect_timeout_ms: int = 20000
+    mongo_server_selection_timeout_ms: int = 30000
+    mongo_socket_timeout_ms: Optional[int] = None
+    # e.g. "zstd,snappy,zlib"; zstd and snappy need the zstandard / python-snappy packages
+    mongo_compressors: Optional[str] = None
+    mongo_read_preference: str = Field("primary", pattern="^(primary|primaryPreferred|secondary|secondaryPreferred|nearest)$")
+    mongo_read_max_staleness_seconds: int = -1
+
+    def client_options(self):
+        options = {
+            "appname": self.mongo_app_name,
+            "maxPoolSize": self.mongo_max_pool_size,
+            "minPoolSize": self.mongo_min_pool_size,
+            "maxIdleTimeMS": self.mongo_max_idle_time_ms,
+            "waitQueueTimeoutMS": self.mongo_wait_queue_timeout_ms,
+            "connectTimeoutMS": self.mongo_connect_timeout_ms,
+            "serverSelectionTimeoutMS": self.mongo_server_selection_timeout_ms,
+            "socketTimeoutMS": self.mongo_socket_timeout_ms,
+            "compressors": self.mongo_compressors,
+        }
+        return {k: v for k, v in options.items() if v is not None}
+
+    def read_preference(self):
+        mode = READ_PREFERENCES[self.mongo_read_preference]
+        if mode is Primary:
+            return Primary()
+        return mode(max_staleness=self.mongo_read_max_staleness_seconds)
+
+
+settings = DatabaseSettings()
+# Kept for scripts that still read them directly
+MONGODB_URL = settings.mongodb_url
+DATABASE_NAME = settings.database_name
+
+
+class _Connection:
+    client = None
+    database = None
+    read_database = None
+    settings = None
+
+
+_connection = _Connection()
+
+
+def connect(event_listeners=(), **overrides):
+    """
+    Creates the shared client (no I/O happens until the first operation).
+
+    :param event_listeners: PyMongo monitoring listeners, e.g. from `metrics`
+    :param overrides: DatabaseSettings fields to change, e.g. database_name="other"
+    :return: The database handle
+    """
+    if _connection.client is not None:
+        return _connection.database
+    current = settings.model_copy(update=overrides) if overrides else settings
+    client = AsyncIOMotorClient(current.mongodb_url, event_listeners=list(event_listeners), **current.client_options())
+    _connection.client = client
+    _connection.settings = current
+    _connection.database = client[current.database_name]
+    _connection.read_database = _connection.database.with_options(read_preference=current.read_preference())
+    logger.info("mongo client created", extra={
+        "database": current.database_name, "max_pool_size": current.mongo_max_pool_size,
+        "read_preference": current.mongo_read_preference,
+    })
+    return _connection.database
+
+
+def close():
+    if _connection.client is not None:
+        _connection.client.close()
+        _connection.client = _connection.database = _connection.read_database = _connection.settings = None
+
+
+def current_settings():
+    """Settings of the open connection (or the defaults when not connected)."""
+    return _connection.settings or settings
+
+
+@asynccontextmanager
+async def connected(**overrides):
+    """Connection for a script's lifetime."""
+    database = connect(**overrides)
+    try:
+        yield database
+    finally:
+        close()
+
+
+class _DatabaseHandle:
+    """Forwards to the connected database; connects with defaults on first use (scripts)."""
+
+    def __init__(self, read_only=False):
+        self._read_only = read_only
+
+    def _target(self):
+        if _connection.client is None:
+            connect()
+        return _connection.read_database if self._read_only else _connection.database
+
+    def __getitem__(self, name):
+        return self._target()[name]
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+db = _DatabaseHandle()
+read_db = _DatabaseHandle(read_only=True)
 
-client = AsyncIOMotorClient(MONGODB_URL)
-db = client[DATABASE_NAME]
 
 async def get_database():
     return db
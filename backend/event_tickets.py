@@ -0,0 +1,54 @@
+"""
+Short-lived, single-use tickets for GET /events.
+
+EventSource can't send an Authorization header, so the stream used to take the
+access token in its query string, where proxies and access logs kept it. The
+browser now trades its token for a ticket (POST /events/ticket) and opens the
+stream with that instead: a ticket is worthless once redeemed and expires after
+TICKET_SECONDS otherwise. Tickets live in MongoDB so any worker can redeem one
+issued by another, and only their SHA-256 is stored.
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel
+
+TICKETS_COLLECTION = "event_tickets"
+TICKET_SECONDS = int(os.getenv("EVENT_TICKET_SECONDS", "30"))
+# MongoDB removes expired tickets in the background (about once a minute);
+# `redeem` checks the expiry itself
+TICKET_INDEXES = [
+    IndexModel([("expires_at", ASCENDING)], name="expiry", expireAfterSeconds=0),
+]
+
+
+def _digest(ticket):
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+async def issue(database, email):
+    """
+    :param email: Account the ticket stands for
+    :return: Opaque ticket for the `ticket` query parameter of GET /events
+    """
+    ticket = secrets.token_urlsafe(32)
+    await database[TICKETS_COLLECTION].insert_one({
+        "_id": _digest(ticket),
+        "email": email,
+        "expires_at": datetime.utcnow() + timedelta(seconds=TICKET_SECONDS),
+    })
+    return ticket
+
+
+async def redeem(database, ticket):
+    """
+    Consumes a ticket atomically, so it opens at most one stream.
+
+    :return: The email it was issued for, or None if unknown, used or expired
+    """
+    document = await database[TICKETS_COLLECTION].find_one_and_delete(
+        {"_id": _digest(ticket), "expires_at": {"$gt": datetime.utcnow()}}
+    )
+    return document["email"] if document else None
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "events"
+
+
+class InMemoryBackend:
+    """Delivers events to subscribers of this process only (single worker)."""
+
+    shared = False
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, event):
+        self._deliver(event)
+
+    async def stop(self):
+        pass
+
+
+class MongoBackend:
+    """
+    Broadcasts events between workers and hosts through a capped collection.
+
+    Every worker tails the collection with a tailable-await cursor, which works
+    on a standalone mongod (change streams would need a replica set); the
+    publishing worker receives its own events the same way. The capped size
+    only bounds how far a reconnecting worker can fall behind.
+    """
+
+    shared = True
+
+    def __init__(self, database, collection=EVENTS_COLLECTION, size_bytes=16 * 1024 * 1024, retry_seconds=1.0):
+        self.database = database
+        self.collection_name = collection
+        self.size_bytes = size_bytes
+        self.retry_seconds = retry_seconds
+        self._task = None
+        self.reconnects = 0
+
+    async def start(self, deliver):
+        self._deliver = deliver
+        try:
+            await self.database.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Created by another worker
+        # Only events published from now on; the backlog was for earlier processes
+        last = await self.database[self.collection_name].find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        self._task = asyncio.create_task(self._tail(last["_id"] if last else None))
+
+    async def publish(self, event):
+        # insert_one adds an ObjectId _id to its argument; keep the caller's dict clean
+        await self.database[self.collection_name].insert_one(dict(event))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _tail(self, last_id):
+        collection = self.database[self.collection_name]
+        while True:
+            # ObjectIds from different processes only order by the second, so an
+            # event published in the same second as a reconnect can be missed
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=5000)
+            try:
+                while cursor.alive:
+                    async for document in cursor:
+                        last_id = document.pop("_id")
+                        self._deliver(document)
+            except PyMongoError as e:
+                logger.warning("event tail interrupted", extra={"error": repr(e)})
+            self.reconnects += 1
+            # An empty capped collection returns a dead cursor straight away
+            await asyncio.sleep(self.retry_seconds)
+
+
+def backend_from_env(database):
+    """EVENT_BACKEND=memory (default, single worker) or mongo (several workers or hosts)."""
+    kind = os.getenv("EVENT_BACKEND", "memory")
+    if kind == "mongo":
+        return MongoBackend(database, size_bytes=int(os.getenv("EVENT_COLLECTION_BYTES", str(16 * 1024 * 1024))))
+    if kind != "memory":
+        raise ValueError(f"Unknown EVENT_BACKEND '{kind}'")
+    return InMemoryBackend()
+
+
+class Subscription:
+    def __init__(self, bus, predicate, queue_size):
+        self._bus = bus
+        self.predicate = predicate
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event):
+        if not self.predicate(event):
+            return
+        if self.queue.full():
+            # Slow consumer: drop the oldest event rather than block publishers
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self._bus._subscribers.discard(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventBus:
+    """
+    In-process pub/sub fan-out. Publishing goes through a pluggable backend so
+    multi-worker deployments can swap in one that broadcasts between processes;
+    each worker then fans received events out to its own subscribers.
+
+    Event types registered with `on` are internal (e.g. cache invalidations):
+    they go to their handler in every other worker and never to subscribers.
+    """
+
+    def __init__(self, backend=None, queue_size=100):
+        self.backend = backend or InMemoryBackend()
+        self.queue_size = queue_size
+        self.worker_id = uuid.uuid4().hex
+        self._subscribers = set()
+        self._handlers = {}
+        self._pending = set()
+        self.published = 0
+        self.received = 0
+
+    async def start(self):
+        await self.backend.start(self._fan_out)
+
+    async def stop(self):
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.backend.stop()
+
+    def on(self, event_type, handler):
+        """
+        :param handler: Called with the event data when another worker broadcasts `event_type`
+        """
+        self._handlers[event_type] = handler
+
+    def broadcast(self, event_type, data):
+        """
+        Tells the other workers, without waiting; the caller has already applied
+        the change locally. A no-op with the in-memory backend.
+        """
+        if not self.backend.shared:
+            return
+        task = asyncio.create_task(self.publish(event_type, data))
+        self._pending.add(task)
+        task.add_done_callback(self._broadcast_done)
+
+    def _broadcast_done(self, task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("broadcast failed", extra={"error": repr(task.exception())})
+
+    def subscribe(self, predicate=lambda event: True):
+        subscription = Subscription(self, predicate, self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    async def publish(self, event_type, data, user_id=None):
+        """
+        :param user_id: Owner of the affected resource; non-admin subscribers
+                        only receive events for their own user id
+        """
+        self.published += 1
+        await self.backend.publish({
+            "type": event_type,
+            "data": data,
+            "user_id": user_id,
+            "ts": datetime.utcnow().isoformat(),
+            "origin": self.worker_id,
+        })
+
+    def _fan_out(self, event):
+        self.received += 1
+        handler = self._handlers.get(event["type"])
+        if handler is not None:
+            if event.get("origin") != self.worker_id:
+                handler(event["data"])
+            return
+        for subscription in list(self._subscribers):
+            subscription.offer(event)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "worker_id": self.worker_id,
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "received": self.received,
+            "dropped": sum(s.dropped for s in self._subscribers),
+        }
@@ -0,0 +1,220 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import sales_rollup
+from cache import TTLCache
+from workers import fit_forecasts
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 30
+# One of ai_engine.FORECASTERS; pick with `python backtest.py`
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "linear")
+# Bump whenever forecasting logic changes so persisted runs say what produced them
+MODEL_VERSION = 2
+
+FORECASTS_COLLECTION = "forecasts"
+FORECAST_RUNS_COLLECTION = "forecast_runs"
+KEEP_RUNS = 3
+INSERT_BATCH_SIZE = 10000
+
+# Registered in indexes.INDEXES
+FORECAST_INDEXES = [IndexModel([("run_id", ASCENDING), ("product_id", ASCENDING)], name="run_product")]
+FORECAST_RUN_INDEXES = [IndexModel([("status", ASCENDING), ("computed_at", DESCENDING)], name="status_computed_at")]
+
+
+class ForecastCache(TTLCache):
+    """Per-product predicted 7-day demand, refit only for expired or invalidated products."""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.refits = 0
+
+    def stats(self):
+        return {**super().stats(), "refits": self.refits}
+
+
+forecast_cache = ForecastCache(
+    maxsize=int(os.getenv("FORECAST_CACHE_SIZE", "100000")),
+    ttl=float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "900")),
+)
+
+
+def invalidate_forecasts(*product_ids):
+    """Marks products dirty so the next `/prediction` call refits them."""
+    forecast_cache.invalidate_many(str(pid) for pid in product_ids if pid)
+
+
+async def load_daily_sales(database, since, product_ids=None):
+    """
+    Fetches daily sales totals from the `sales_daily` rollup.
+
+    :param database: Motor database handle
+    :param since: Only days on or after this datetime are included
+    :param product_ids: Restrict to these products, or None for the whole catalog
+    :return: List of {'product_id', 'date', 'quantity'} rows, one per product and day
+    """
+    rows = await sales_rollup.load_daily_rows(database, sales_rollup.day_key(since), product_ids)
+    return [{"product_id": r["product_id"], "date": r["day"], "quantity": r["qty"]} for r in rows]
+
+
+async def _fit(database, scope, days_to_predict, pool=None):
+    """
+    Loads the history window and fits it, in `pool` (a workers.ModelPool) when
+    given so the event loop stays free, otherwise inline.
+    """
+    today = datetime.utcnow()
+    daily_sales = await load_daily_sales(database, today - timedelta(days=HISTORY_DAYS - 1), scope)
+    args = (
+        [d["product_id"] for d in daily_sales],
+        [d["date"] for d in daily_sales],
+        [d["quantity"] for d in daily_sales],
+        days_to_predict,
+        FORECAST_MODEL,
+        HISTORY_DAYS,
+        today.date(),
+    )
+    if pool is None:
+        return fit_forecasts(*args)
+    return await pool.run(fit_forecasts, *args)
+
+
+async def _refit(database, dirty, scope, days_to_predict, pool=None):
+    """Fits the dirty products in one batch and caches their predictions."""
+    fitted = await _fit(database, scope, days_to_predict, pool)
+    predicted = {}
+    for product_id in dirty:
+        predicted[product_id] = fitted.get(product_id, 0)
+        forecast_cache.set(product_id, predicted[product_id])
+    forecast_cache.refits += len(dirty)
+    return predicted
+
+
+async def predict_products(database, product_ids, days_to_predict=7, pool=None):
+    """Predicted demand for a handful of products, refitting only uncached ones."""
+    predicted = {}
+    dirty = []
+    for product_id in map(str, product_ids):
+        cached = forecast_cache.get(product_id)
+        if cached is None:
+            dirty.append(product_id)
+        else:
+            predicted[product_id] = cached
+    if dirty:
+        predicted.update(await _refit(database, dirty, dirty, days_to_predict, pool))
+    return predicted
+
+
+def _prediction_row(product, predicted_need):
+    return {
+        "product_name": product["name"],
+        "current_stock": product["current_stock"],
+        "predicted_need": predicted_need,
+        "status": "Shortage Dept" if product["current_stock"] < predicted_need else "Stocked"
+    }
+
+
+async def build_predictions(database, days_to_predict=7, pool=None):
+    """
+    Builds the `/prediction` payload: one products query, then cached predictions
+    for clean products and one batched model fit for the dirty ones.
+    """
+    products = await database["products"].find({}, {"name": 1, "current_stock": 1}).to_list(None)
+
+    predicted = {}
+    dirty = []
+    for product in products:
+        product_id = str(product["_id"])
+        cached = forecast_cache.get(product_id)
+        if cached is None:
+            dirty.append(product_id)
+        else:
+            predicted[product_id] = cached
+
+    if dirty:
+        # Past half the catalog an unfiltered read is cheaper than a huge $in
+        scope = dirty if len(dirty) <= len(products) // 2 else None
+        predicted.update(await _refit(database, dirty, scope, days_to_predict, pool))
+
+    return [_prediction_row(product, predicted[str(product["_id"])]) for product in products]
+
+
+async def compute_run(database, pool=None, days_to_predict=7):
+    """
+    Refits the whole catalog and persists it as a new run: one `forecast_runs`
+    header plus one `forecasts` document per product. The run only becomes
+    visible to readers once every row is written; older runs beyond KEEP_RUNS
+    are pruned.
+    """
+    start = time.perf_counter()
+    computed_at = datetime.utcnow()
+    products = await database["products"].find({}, {"_id": 1}).to_list(None)
+    fitted = await _fit(database, None, days_to_predict, pool)
+
+    run_id = ObjectId()
+    meta = {"model": FORECAST_MODEL, "model_version": MODEL_VERSION, "computed_at": computed_at}
+    await database[FORECAST_RUNS_COLLECTION].insert_one({
+        "_id": run_id, "status": "running", "days_to_predict": days_to_predict,
+        "history_days": HISTORY_DAYS, "products": len(products), **meta,
+    })
+    rows = []
+    for product in products:
+        product_id = str(product["_id"])
+        predicted_need = fitted.get(product_id, 0)
+        forecast_cache.set(product_id, predicted_need)
+        rows.append({"run_id": run_id, "product_id": product_id, "predicted_need": predicted_need, **meta})
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        await database[FORECASTS_COLLECTION].insert_many(rows[i:i + INSERT_BATCH_SIZE], ordered=False)
+
+    duration = time.perf_counter() - start
+    await database[FORECAST_RUNS_COLLECTION].update_one(
+        {"_id": run_id}, {"$set": {"status": "complete", "duration_seconds": duration}}
+    )
+    await _prune_runs(database, computed_at)
+    logger.info("forecast run complete", extra={
+        "run_id": str(run_id), "products": len(rows), "model": FORECAST_MODEL, "seconds": round(duration, 2),
+    })
+    return run_id
+
+
+async def _prune_runs(database, before):
+    """Drops runs (and their rows) older than the newest KEEP_RUNS complete ones."""
+    kept = await database[FORECAST_RUNS_COLLECTION].find({"status": "complete"}, {"_id": 1}).sort(
+        "computed_at", DESCENDING
+    ).limit(KEEP_RUNS).to_list(None)
+    stale = await database[FORECAST_RUNS_COLLECTION].find(
+        {"_id": {"$nin": [r["_id"] for r in kept]}, "computed_at": {"$lte": before}}, {"_id": 1}
+    ).to_list(None)
+    if stale:
+        stale_ids = [r["_id"] for r in stale]
+        await database[FORECASTS_COLLECTION].delete_many({"run_id": {"$in": stale_ids}})
+        await database[FORECAST_RUNS_COLLECTION].delete_many({"_id": {"$in": stale_ids}})
+
+
+async def latest_run(database):
+    return await database[FORECAST_RUNS_COLLECTION].find_one({"status": "complete"}, sort=[("computed_at", DESCENDING)])
+
+
+async def persisted_predictions(database, days_to_predict=7, pool=None):
+    """
+    The `/prediction` payload from the latest complete run, joined with live
+    stock levels. Products created since that run are fitted on the spot.
+
+    :return: (run header, predictions), or None if no matching run exists yet
+    """
+    run = await latest_run(database)
+    if run is None or run.get("days_to_predict") != days_to_predict:
+        return None
+    products = await database["products"].find({}, {"name": 1, "current_stock": 1}).to_list(None)
+    rows = database[FORECASTS_COLLECTION].find({"run_id": run["_id"]}, {"_id": 0, "product_id": 1, "predicted_need": 1})
+    predicted = {r["product_id"]: r["predicted_need"] async for r in rows}
+
+    missing = [str(p["_id"]) for p in products if str(p["_id"]) not in predicted]
+    if missing:
+        predicted.update(await predict_products(database, missing, days_to_predict, pool))
+    return run, [_prediction_row(product, predicted[str(product["_id"])]) for product in products]
@@ -0,0 +1,197 @@
+"""
+Synthetic load data at production scale: a catalog with long-tail popularity,
+staff users with uneven activity and a history of sales following growth, a
+weekly cycle, a December peak and shop opening hours. Everything is written
+with batched `insert_many`, then the derived collections (daily rollup, report
+cubes) are rebuilt.
+
+Usage:
+    python generate_data.py --products 10000 --sales 2000000 --users 200 --drop
+    python generate_data.py --database small_shop_loadtest --sales 500000
+
+All generated users (and an admin, for approvals) share LOADTEST_PASSWORD;
+`load_test.py` logs in with them. --drop clears products, sales, derived
+collections and previously generated users before writing.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+import numpy as np
+from bson import ObjectId
+
+import catalog
+import reports
+import sales_rollup
+from database import DATABASE_NAME, connected
+from passwords import PasswordHasher
+
+LOADTEST_DOMAIN = "loadtest.example"
+LOADTEST_PASSWORD = "loadtest123"
+ADMIN_EMAIL = f"admin@{LOADTEST_DOMAIN}"
+
+CATEGORIES = {
+    "Dairy": ["Milk", "Cheese", "Yogurt", "Butter", "Cream"],
+    "Bakery": ["Bread", "Bagels", "Croissant", "Muffins", "Rolls"],
+    "Beverages": ["Coffee Beans", "Tea", "Orange Juice", "Sparkling Water", "Cola"],
+    "Produce": ["Apples", "Bananas", "Tomatoes", "Onions", "Potatoes"],
+    "Frozen": ["Ice Cream", "Peas", "Pizza", "Fish Fingers", "Berries"],
+    "Household": ["Detergent", "Sponges", "Paper Towels", "Bin Bags", "Soap"],
+    "Stationery": ["Pens", "Notebooks", "Envelopes", "Stapler", "Printer Paper"],
+}
+BRANDS = ["Acme", "Golden", "Farmhouse", "Sunrise", "Northside", "Valley", "Urban", "Classic"]
+
+# Relative demand by weekday (Monday first) and by hour of day (shop opens 08:00-21:00)
+WEEKDAY_PROFILE = np.array([0.9, 0.85, 0.9, 1.0, 1.2, 1.4, 1.1])
+HOUR_PROFILE = np.array([0] * 8 + [3, 5, 6, 7, 9, 8, 6, 6, 7, 9, 10, 8, 5] + [0] * 3, dtype=np.float64)
+
+
+def user_email(i):
+    return f"user{i}@{LOADTEST_DOMAIN}"
+
+
+def zipf_weights(n, exponent, rng):
+    """Long-tail popularity: a few items get most of the activity, in random order."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def make_products(n, offset, rng):
+    categories = list(CATEGORIES)
+    category = rng.integers(len(categories), size=n)
+    item = rng.integers(5, size=n)
+    brand = rng.integers(len(BRANDS), size=n)
+    price = np.round(rng.lognormal(1.8, 0.7, n), 2) + 0.5
+    stock = rng.integers(0, 500, size=n)
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(), "name": f"{BRANDS[b]} {CATEGORIES[categories[c]][it]} #{offset + i}",
+            "category": categories[c], "price": float(p), "current_stock": int(s),
+            "low_stock_threshold": 10, "updated_at": now,
+        }
+        for i, (c, it, b, p, s) in enumerate(zip(category.tolist(), item.tolist(), brand.tolist(),
+                                                  price.tolist(), stock.tolist()))
+    ]
+
+
+def day_weights(days, end_day):
+    """Sales volume per day: 50% growth over the period, weekly cycle, December peak."""
+    day_dates = np.arange(end_day - np.timedelta64(days - 1, "D"), end_day + np.timedelta64(1, "D"))
+    weekday = (day_dates.astype(np.int64) + 3) % 7
+    day_of_year = (day_dates - day_dates.astype("datetime64[Y]")).astype(np.int64)
+    growth = 1 + 0.5 * np.arange(days) / days
+    yearly = 1 + 0.25 * np.cos(2 * np.pi * (day_of_year - 355) / 365)
+    weights = growth * WEEKDAY_PROFILE[weekday] * yearly
+    return day_dates, weights / weights.sum()
+
+
+def make_sales(n, products, product_weights, users, user_weights, day_dates, day_p, rng):
+    product_index = rng.choice(len(products), size=n, p=product_weights)
+    user_index = rng.choice(len(users), size=n, p=user_weights)
+    day = day_dates[rng.choice(len(day_dates), size=n, p=day_p)]
+    hour = rng.choice(24, size=n, p=HOUR_PROFILE / HOUR_PROFILE.sum())
+    seconds = hour * 3600 + rng.integers(3600, size=n)
+    timestamps = (day.astype("datetime64[s]") + seconds.astype("timedelta64[s]")).astype(datetime)
+    quantity = 1 + rng.poisson(0.8, size=n)
+    # Recent orders are still waiting for approval; a few older ones were cancelled
+    recent = day >= day_dates[-1] - np.timedelta64(2, "D")
+    roll = rng.random(n)
+    status = np.where(recent & (roll < 0.5), "pending", np.where(roll > 0.98, "cancelled", "approved"))
+
+    sales = []
+    for p, u, ts, q, st in zip(product_index.tolist(), user_index.tolist(), timestamps.tolist(),
+                                quantity.tolist(), status.tolist()):
+        product = products[p]
+        user = users[u]
+        sale = {
+            "product_id": str(product["_id"]), "product_name": product["name"],
+            "quantity_sold": q, "unit_price": product["price"], "total_price": round(product["price"] * q, 2),
+            "user_id": str(user["_id"]), "user_name": user["username"],
+            "status": st, "timestamp": ts, "updated_at": ts,
+        }
+        if st == "approved":
+            sale["approved_at"] = ts
+        sales.append(sale)
+    return sales
+
+
+async def insert_batched(collection, documents, batch_size):
+    for i in range(0, len(documents), batch_size):
+        await collection.insert_many(documents[i:i + batch_size], ordered=False)
+
+
+async def drop_generated(database):
+    for name in ("products", "sales", sales_rollup.ROLLUP_COLLECTION, reports.SALES_CUBES, reports.CUBES_STATE,
+                 "forecasts", "forecast_runs", "tombstones"):
+        await database[name].delete_many({})
+    await database["users"].delete_many({"email": {"$regex": f"@{LOADTEST_DOMAIN.replace('.', '[.]')}$"}})
+
+
+async def ensure_users(database, n_users):
+    """Creates the admin and user0..n-1 if missing; one bcrypt hash shared by all."""
+    hasher = PasswordHasher()
+    try:
+        hashed = await hasher.hash(LOADTEST_PASSWORD)
+    finally:
+        hasher.shutdown()
+    wanted = [(ADMIN_EMAIL, "Load Admin", "admin")] + [(user_email(i), f"Load User {i}", "staff") for i in range(n_users)]
+    existing = {u["email"] async for u in database["users"].find({"email": {"$in": [w[0] for w in wanted]}}, {"email": 1})}
+    new_users = [{"username": name, "email": email, "role": role, "image_url": "", "hashed_password": hashed}
+                 for email, name, role in wanted if email not in existing]
+    if new_users:
+        await database["users"].insert_many(new_users)
+    staff = await database["users"].find(
+        {"email": {"$in": [user_email(i) for i in range(n_users)]}}, {"username": 1}
+    ).to_list(None)
+    return staff
+
+
+async def main(args):
+    rng = np.random.default_rng(args.seed)
+    async with connected(database_name=args.database) as database:
+        if args.drop:
+            await drop_generated(database)
+
+        start = time.perf_counter()
+        users = await ensure_users(database, args.users)
+        offset = await database["products"].estimated_document_count()
+        products = make_products(args.products, offset, rng)
+        await insert_batched(database["products"], products, args.batch_size)
+        await catalog.bump(database)
+        print(f"{len(users)} users and {len(products)} products in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        product_weights = zipf_weights(len(products), 1.1, rng)
+        user_weights = zipf_weights(len(users), 0.8, rng)
+        day_dates, day_p = day_weights(args.days, np.datetime64(datetime.utcnow().date()))
+        written = 0
+        while written < args.sales:
+            n = min(args.batch_size * 10, args.sales - written)
+            sales = make_sales(n, products, product_weights, users, user_weights, day_dates, day_p, rng)
+            await insert_batched(database["sales"], sales, args.batch_size)
+            written += n
+            elapsed = time.perf_counter() - start
+            print(f"  {written}/{args.sales} sales ({written / elapsed:,.0f}/s)", end="\r", flush=True)
+        print(f"{written} sales over {args.days} days in {time.perf_counter() - start:.1f}s" + " " * 20)
+
+        start = time.perf_counter()
+        rollup_rows = await sales_rollup.backfill(database)
+        cells = await reports.backfill(database)
+        print(f"Rebuilt {rollup_rows} rollup rows and {cells} report cells in {time.perf_counter() - start:.1f}s")
+        print(f"Log in as {ADMIN_EMAIL} or user0..user{args.users - 1}@{LOADTEST_DOMAIN} with '{LOADTEST_PASSWORD}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="Days of sales history, ending today")
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--batch-size", type=int, default=10000, help="Documents per insert_many")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drop", action="store_true", help="Clear existing data (and generated users) first")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+"""
+Declarative index registry, applied idempotently at app startup.
+
+Usage:
+    python indexes.py apply    # create any missing indexes
+    python indexes.py report   # missing/unused indexes ($indexStats) and hot-query explain plans
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from event_tickets import TICKET_INDEXES, TICKETS_COLLECTION
+from forecasting import FORECAST_INDEXES, FORECAST_RUN_INDEXES, FORECAST_RUNS_COLLECTION, FORECASTS_COLLECTION
+from reports import CUBE_INDEXES, SALES_CUBES
+from sales_rollup import ROLLUP_COLLECTION, ROLLUP_INDEXES
+from sync import SYNC_INDEX, TOMBSTONE_INDEXES, TOMBSTONES
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "products": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+        IndexModel([("category", ASCENDING), ("name", ASCENDING), ("_id", ASCENDING)], name="category_name_id"),
+        IndexModel(SYNC_INDEX, name="updated_at_id"),
+    ],
+    "sales": [
+        IndexModel([("product_id", ASCENDING), ("timestamp", ASCENDING)], name="product_timestamp"),
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timestamp"),
+        IndexModel([("status", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="status_timestamp"),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp"),
+        IndexModel(SYNC_INDEX, name="updated_at_id"),
+        IndexModel([("user_id", ASCENDING)] + SYNC_INDEX, name="user_updated_at_id"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    ROLLUP_COLLECTION: ROLLUP_INDEXES,
+    TOMBSTONES: TOMBSTONE_INDEXES,
+    SALES_CUBES: CUBE_INDEXES,
+    FORECASTS_COLLECTION: FORECAST_INDEXES,
+    FORECAST_RUNS_COLLECTION: FORECAST_RUN_INDEXES,
+    TICKETS_COLLECTION: TICKET_INDEXES,
+}
+
+# (collection, description, filter, sort) for the queries the API issues on hot paths
+HOT_QUERIES = [
+    ("sales", "orders/me", {"user_id": "000000000000000000000000"}, [("timestamp", -1), ("_id", -1)]),
+    ("sales", "admin/orders?status=pending", {"status": "pending"}, [("timestamp", -1), ("_id", -1)]),
+    ("sales", "admin/orders", {}, [("timestamp", -1), ("_id", -1)]),
+    ("sales", "rollup check", {"product_id": "000000000000000000000000", "timestamp": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("users", "get_current_user / token", {"email": "someone@example.com"}, None),
+    ("products", "upload_stock by name", {"name": "Milk"}, None),
+    ("products", "products?category=", {"category": "Dairy"}, [("_id", 1)]),
+    ("products", "products?sort=name", {}, [("name", 1), ("_id", 1)]),
+    ("sales", "sync (staff)", {"user_id": "000000000000000000000000"}, [("updated_at", 1), ("_id", 1)]),
+    ("products", "sync", {}, [("updated_at", 1), ("_id", 1)]),
+    (ROLLUP_COLLECTION, "prediction window", {"day": {"$gte": "2000-01-01"}}, None),
+    (SALES_CUBES, "reports/sales", {"grain": "week", "dim": "product", "period": {"$gte": "2000-01-03", "$lte": "2000-12-25"}}, None),
+]
+
+
+async def ensure_indexes(database, collections=None):
+    """
+    Creates every registered index that is missing. Existing indexes are left
+    alone; failures (e.g. duplicate keys blocking a unique index) are reported
+    but never abort startup.
+
+    :return: List of (collection, index name, error) for indexes that could not be built
+    """
+    failures = []
+    for collection, models in INDEXES.items():
+        if collections is not None and collection not in collections:
+            continue
+        for model in models:
+            try:
+                await database[collection].create_indexes([model])
+            except OperationFailure as e:
+                name = model.document["name"]
+                failures.append((collection, name, str(e)))
+                logger.warning("Could not build index %s.%s: %s", collection, name, e)
+    return failures
+
+
+def _plan_summary(plan):
+    """Flattens a winning plan into 'STAGE(index) <- STAGE' form."""
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+async def report(database):
+    print("== Index coverage ==")
+    for collection, models in INDEXES.items():
+        existing = await database[collection].index_information()
+        wanted = {m.document["name"] for m in models}
+        stats = await database[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+        usage = {s["name"]: s["accesses"]["ops"] for s in stats}
+        for name in sorted(wanted - set(existing)):
+            print(f"[MISSING] {collection}.{name}")
+        for name in sorted(existing):
+            ops = usage.get(name, 0)
+            tag = "UNUSED " if ops == 0 and name != "_id_" else "OK     "
+            registered = "" if name in wanted or name == "_id_" else " (not in registry)"
+            print(f"[{tag}] {collection}.{name}: {ops} ops since restart{registered}")
+
+    print("\n== Hot query plans ==")
+    for collection, description, query, sort in HOT_QUERIES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await database.command("explain", command, verbosity="queryPlanner")
+        winning = explain["queryPlanner"]["winningPlan"]
+        # Slot-based execution (MongoDB 7+) nests the classic plan under queryPlan
+        plan = _plan_summary(winning.get("queryPlan", winning))
+        flag = "COLLSCAN" if "COLLSCAN" in plan else "ok"
+        print(f"[{flag:>8}] {description:<32} {collection}: {plan}")
+
+
+async def main(args):
+    from database import db
+
+    if args.command == "apply":
+        failures = await ensure_indexes(db)
+        print("[OK] Indexes applied." if not failures else f"[WARN] {len(failures)} index(es) failed.")
+    elif args.command == "report":
+        await report(db)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("apply", help="Create missing indexes")
+    subparsers.add_parser("report", help="Report missing/unused indexes and hot query plans")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,195 @@
+"""
+Inventory facts injected into AI chat prompts.
+
+`InventoryContext` keeps an in-process snapshot of the catalog (plus pending
+order count and top sellers) that is loaded once and then refreshed
+incrementally: write paths mark the products or orders they touched, and the
+next chat request re-reads only those. A small inverted index over product
+name and category words picks the rows relevant to each question, so the
+prompt carries a few lines instead of the whole catalog.
+"""
+import asyncio
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from forecasting import HISTORY_DAYS, predict_products
+from sales_rollup import ROLLUP_COLLECTION, day_key
+
+PRODUCT_PROJECTION = {"name": 1, "category": 1, "price": 1, "current_stock": 1, "low_stock_threshold": 1}
+CATEGORY_WEIGHT = 0.5
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "do", "does", "for", "have", "how", "i", "in", "is", "it", "many", "much",
+    "of", "on", "or", "our", "the", "there", "to", "we", "what", "which", "with", "you",
+}
+
+
+def tokenize(text):
+    """Lower-cased words with a naive plural strip, so 'Eggs' matches 'egg'."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def estimate_tokens(text):
+    """Rough model token count (~4 characters per token) for prompt size budgeting."""
+    return (len(text) + 3) // 4
+
+
+class InventoryContext:
+    """
+    :param max_rows: Most relevant product rows included per prompt
+    :param low_stock_rows: Low-stock products listed in every prompt
+    :param refresh_seconds: Top sellers are recomputed at most this often
+    :param pool: Optional workers.ModelPool for fitting forecasts off the event loop
+    """
+
+    def __init__(self, max_rows=8, low_stock_rows=10, top_sellers=5, refresh_seconds=60.0, pool=None):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.low_stock_rows = low_stock_rows
+        self.top_seller_count = top_sellers
+        self.refresh_seconds = refresh_seconds
+        self.products = {}
+        self._index = defaultdict(dict)
+        self._low_stock = set()
+        self.pending_orders = 0
+        self.top_sellers = []
+        self._loaded = False
+        self._dirty_products = set()
+        self._orders_dirty = True
+        self._sellers_refreshed_at = None
+        self._lock = asyncio.Lock()
+        self.full_loads = 0
+        self.incremental_refreshes = 0
+
+    def mark_products(self, *product_ids):
+        """Called by write paths; the rows are re-read on the next prompt."""
+        self._dirty_products.update(str(pid) for pid in product_ids if pid)
+
+    def mark_orders(self):
+        self._orders_dirty = True
+
+    def _index_tokens(self, row):
+        weights = {token: CATEGORY_WEIGHT for token in tokenize(row.get("category") or "")}
+        weights.update({token: 1.0 for token in tokenize(row.get("name") or "")})
+        return weights
+
+    def _put(self, product):
+        product_id = str(product["_id"])
+        self._drop(product_id)
+        row = {k: product.get(k) for k in PRODUCT_PROJECTION}
+        self.products[product_id] = row
+        for token, weight in self._index_tokens(row).items():
+            self._index[token][product_id] = weight
+        if (row.get("current_stock") or 0) <= (row.get("low_stock_threshold") or 0):
+            self._low_stock.add(product_id)
+
+    def _drop(self, product_id):
+        row = self.products.pop(product_id, None)
+        if row is None:
+            return
+        for token in self._index_tokens(row):
+            postings = self._index.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._index[token]
+        self._low_stock.discard(product_id)
+
+    async def refresh(self, database):
+        async with self._lock:
+            if not self._loaded:
+                self._dirty_products.clear()
+                async for product in database["products"].find({}, PRODUCT_PROJECTION):
+                    self._put(product)
+                self._loaded = True
+                self.full_loads += 1
+            elif self._dirty_products:
+                dirty, self._dirty_products = self._dirty_products, set()
+                ids = [ObjectId(pid) for pid in dirty if ObjectId.is_valid(pid)]
+                found = await database["products"].find({"_id": {"$in": ids}}, PRODUCT_PROJECTION).to_list(None)
+                for product in found:
+                    self._put(product)
+                for product_id in dirty - {str(p["_id"]) for p in found}:
+                    self._drop(product_id)
+                self.incremental_refreshes += 1
+
+            if self._orders_dirty:
+                self._orders_dirty = False
+                self.pending_orders = await database["sales"].count_documents({"status": "pending"})
+                self._sellers_refreshed_at = None
+
+            now = time.monotonic()
+            if self._sellers_refreshed_at is None or now - self._sellers_refreshed_at > self.refresh_seconds:
+                self._sellers_refreshed_at = now
+                since = day_key(datetime.utcnow() - timedelta(days=HISTORY_DAYS))
+                self.top_sellers = await database[ROLLUP_COLLECTION].aggregate([
+                    {"$match": {"day": {"$gte": since}}},
+                    {"$group": {"_id": "$product_id", "qty": {"$sum": "$qty"}}},
+                    {"$sort": {"qty": -1}},
+                    {"$limit": self.top_seller_count},
+                ]).to_list(None)
+
+    def retrieve(self, message):
+        """Product ids ranked by weighted word overlap with the question."""
+        scores = defaultdict(float)
+        for token in set(tokenize(message)):
+            for product_id, weight in self._index.get(token, {}).items():
+                scores[product_id] += weight
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], self.products[pid]["name"]))
+        return ranked[:self.max_rows]
+
+    def render(self, relevant, forecasts=None):
+        """
+        :param relevant: Product ids from `retrieve` to list in full
+        :param forecasts: Predicted 7-day demand by product id
+        """
+        forecasts = forecasts or {}
+        lines = [f"Inventory snapshot ({datetime.utcnow():%Y-%m-%d} UTC), {len(self.products)} products."]
+        lines.append(f"Pending orders awaiting approval: {self.pending_orders}")
+
+        low = sorted(self._low_stock, key=lambda pid: (self.products[pid]["current_stock"] or 0, self.products[pid]["name"]))
+        if low:
+            shown = ", ".join(f"{self.products[pid]['name']} {self.products[pid]['current_stock']}/"
+                              f"{self.products[pid]['low_stock_threshold']}" for pid in low[:self.low_stock_rows])
+            more = f" (+{len(low) - self.low_stock_rows} more)" if len(low) > self.low_stock_rows else ""
+            lines.append(f"Low stock (stock/threshold): {shown}{more}")
+
+        sellers = [f"{self.products[s['_id']]['name']} ({s['qty']})" for s in self.top_sellers if s["_id"] in self.products]
+        if sellers:
+            lines.append(f"Top sellers, last {HISTORY_DAYS} days (units): {', '.join(sellers)}")
+
+        if relevant:
+            lines.append("Products matching the question (name | category | stock | low-stock threshold | price | forecast 7-day demand):")
+            for product_id in relevant:
+                row = self.products[product_id]
+                lines.append(f"{row['name']} | {row.get('category')} | {row.get('current_stock')} | "
+                             f"{row.get('low_stock_threshold')} | {row.get('price')} | {forecasts.get(product_id, '?')}")
+        return "\n".join(lines)
+
+    async def build(self, database, message):
+        """Refreshes what changed, then renders the context for one question."""
+        await self.refresh(database)
+        relevant = self.retrieve(message)
+        forecasts = await predict_products(database, relevant, pool=self.pool) if relevant else {}
+        return self.render(relevant, forecasts)
+
+    def stats(self):
+        return {
+            "products": len(self.products),
+            "indexed_terms": len(self._index),
+            "low_stock": len(self._low_stock),
+            "pending_orders": self.pending_orders,
+            "dirty_products": len(self._dirty_products),
+            "full_loads": self.full_loads,
+            "incremental_refreshes": self.incremental_refreshes,
+        }
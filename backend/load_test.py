@@ -0,0 +1,159 @@
+"""
+End-to-end load test against a running server: virtual users log in, then
+loop over a weighted mix of catalog reads, sale recording, approvals,
+predictions and (optionally) chat. Reports throughput and p50/p95/p99 latency
+per endpoint.
+
+Usage (after `python generate_data.py --drop`, with the server running):
+    python load_test.py --url http://localhost:8080 --users 50 --duration 60
+    python load_test.py --mix products=10 sale=5 approve=2 prediction=1
+
+Chat is off by default so a test run never calls the paid API. Point the
+server at the local stub to include it:
+    python bench_chat.py stub --port 8090
+    OPENROUTER_BASE_URL=http://127.0.0.1:8090 OPENROUTER_API_KEY=stub python main.py
+    python load_test.py --mix products=40 sale=20 approve=10 prediction=10 chat=5
+
+Server errors (5xx, timeouts) are counted as errors; 4xx answers such as an
+order already approved by another virtual user are reported separately.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from bench_login_storm import percentile
+from generate_data import ADMIN_EMAIL, LOADTEST_PASSWORD, user_email
+
+DEFAULT_MIX = {"products": 40, "sale": 20, "approve": 10, "prediction": 10, "login": 5}
+CHAT_PROMPTS = [
+    "Which products are running low?",
+    "How much milk do we have?",
+    "What should I reorder this week?",
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.client_errors = defaultdict(int)
+        self.errors = defaultdict(int)
+
+    async def call(self, name, request):
+        """Times one request; returns the response, or None if it failed."""
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 500:
+            self.errors[name] += 1
+        elif response.status_code >= 400:
+            self.client_errors[name] += 1
+        return response
+
+    def report(self, elapsed):
+        names = sorted(set(self.latencies) | set(self.errors))
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+        print(f"{'endpoint':<14} {'count':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'4xx':>5} {'errors':>6}")
+        for name in names:
+            samples = self.latencies[name]
+            print(f"{name:<14} {len(samples):>7} {len(samples) / elapsed:>7.1f} {percentile(samples, 50):>8.1f} "
+                  f"{percentile(samples, 95):>8.1f} {percentile(samples, 99):>8.1f} {max(samples, default=float('nan')):>8.1f} "
+                  f"{self.client_errors[name]:>5} {self.errors[name]:>6}")
+
+
+async def login(client, recorder, email):
+    response = await recorder.call("login", client.post("/token", data={"username": email, "password": LOADTEST_PASSWORD}))
+    if response is None or response.status_code != 200:
+        raise RuntimeError(f"Login failed for {email}: {response.status_code if response else 'no response'}")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def virtual_user(client, recorder, email, admin_headers, product_ids, mix, deadline, think, rng):
+    headers = await login(client, recorder, email)
+    actions, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        action = rng.choices(actions, weights)[0]
+        if action == "products":
+            await recorder.call("products", client.get("/products", params={"limit": 100}, headers=headers))
+        elif action == "sale":
+            await recorder.call("sale", client.post("/sales", headers=headers, json={
+                "product_id": rng.choice(product_ids), "quantity_sold": rng.randint(1, 3),
+            }))
+        elif action == "approve":
+            # What an admin does: open the pending queue, approve one of them
+            response = await recorder.call("admin orders", client.get(
+                "/admin/orders", params={"status": "pending", "limit": 20}, headers=admin_headers
+            ))
+            if response is not None and response.status_code == 200 and response.json():
+                order = rng.choice(response.json())
+                await recorder.call("approve", client.post(f"/admin/orders/{order['_id']}/approve", headers=admin_headers))
+        elif action == "prediction":
+            await recorder.call("prediction", client.get("/prediction", headers=headers))
+        elif action == "chat":
+            await recorder.call("chat", client.post("/ai/chat", headers=headers, json={
+                "message": rng.choice(CHAT_PROMPTS), "stream": False,
+            }))
+        elif action == "login":
+            headers = await login(client, recorder, email)
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+def parse_mix(pairs):
+    mix = {}
+    for pair in pairs:
+        name, _, weight = pair.partition("=")
+        if name not in DEFAULT_MIX and name != "chat":
+            raise SystemExit(f"Unknown action '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def main(args):
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users + 10, max_keepalive_connections=args.users + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        admin_headers = await login(client, recorder, ADMIN_EMAIL)
+        response = await client.get("/products", params={"limit": 1000, "fields": "name"}, headers=admin_headers)
+        response.raise_for_status()
+        product_ids = [p["_id"] for p in response.json()]
+        if not product_ids:
+            raise SystemExit("No products: run generate_data.py first")
+        recorder.latencies.clear()  # setup calls don't count
+
+        start = time.perf_counter()
+        deadline = start + args.ramp + args.duration
+        users = []
+        for i in range(args.users):
+            rng = random.Random(args.seed + i)
+            users.append(asyncio.create_task(virtual_user(
+                client, recorder, user_email(i % args.accounts), admin_headers, product_ids, mix, deadline,
+                args.think_ms / 1000, rng,
+            )))
+            await asyncio.sleep(args.ramp / args.users)
+        await asyncio.gather(*users)
+        recorder.report(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--accounts", type=int, default=200, help="Generated accounts to spread them over")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds at full load")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds to start all virtual users")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mean pause between a user's requests")
+    parser.add_argument("--mix", nargs="+", metavar="ACTION=WEIGHT",
+                        help=f"Request mix; actions: {', '.join(DEFAULT_MIX)}, chat")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -1,31 +1,131 @@
-from fastapi import FastAPI, Body, HTTPException, status, Depends
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Body, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import List, Optional
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+import metrics
 from models import ProductModel, ProductUpdateModel, SaleModel, UserCreate, UserModel, Token, StockModel
-from database import db
+import catalog
+import database
+import event_tickets
+from database import db, read_db
+from forecasting import build_predictions, compute_run, forecast_cache, invalidate_forecasts, persisted_predictions
+import orders
+import reorder
+import reports
+import sync
+from indexes import ensure_indexes
+import stock_ingest
+from events import EventBus, backend_from_env
+from chat import ChatProxy
+from inventory_context import InventoryContext
+from cache import TTLCache
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter, parse_fields
+from responses import FastJSONResponse, db_response
+from compression import CompressionMiddleware, etag_matches
 from bson import ObjectId
-import httpx
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import re
 from dotenv import load_dotenv
-from passlib.context import CryptContext
+import logs
+from passwords import PasswordHasher
+from scheduler import MongoLease, Scheduler
+from workers import ModelPool
 import jwt
 
 load_dotenv()
-
-app = FastAPI(title="Small Business Inventory API")
+logs.configure()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.connect(event_listeners=[metrics.mongo_listener, metrics.pool_listener])
+    await ensure_indexes(db)
+    # Keyset pages over orders stop where ISO-string timestamps meet BSON dates
+    converted = await orders.backfill(db, query=orders.STRING_TIMESTAMPS)
+    if converted:
+        logger.info("converted legacy order timestamps", extra={"orders": converted})
+    # Legacy documents without updated_at would otherwise be invisible to /sync cursors
+    stamped_products, stamped_orders = await sync.backfill(db)
+    if stamped_products or stamped_orders:
+        logger.info("stamped updated_at", extra={"products": stamped_products, "orders": stamped_orders})
+    await event_bus.start()
+    await chat_proxy.start()
+    if MODEL_POOL_WARMUP:
+        # Ready only once workers have imported the model code, so no request pays for it
+        seconds = await model_pool.warm_up()
+        logger.info("model pool warm", extra={"workers": model_pool.max_workers, "seconds": round(seconds, 2)})
+    else:
+        model_pool.start()
+    scheduler.start()
+    yield
+    await scheduler.stop()
+    model_pool.shutdown()
+    await chat_proxy.close()
+    await event_bus.stop()
+    password_hasher.shutdown()
+    database.close()
+
+app = FastAPI(title="Small Business Inventory API", lifespan=lifespan)
 
 # Auth Setup
 SECRET_KEY = os.getenv("SECRET_KEY", "yoursupersecretkeyforinventoryapp")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs off the event loop; PASSWORD_HASH_WORKERS caps concurrent hashes
+password_hasher = PasswordHasher(max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or None)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+# Order events pushed to browsers over GET /events; EVENT_BACKEND=mongo shares them
+# (and cache invalidations) between workers
+event_bus = EventBus(backend=backend_from_env(db))
+EVENTS_KEEPALIVE_SECONDS = 15
+
+# AI chat: one pooled upstream client; OPENROUTER_BASE_URL can point at a local stub
+chat_proxy = ChatProxy(
+    base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+    api_key=os.getenv("OPENROUTER_API_KEY"),
+    model=os.getenv("OPENROUTER_MODEL", "deepseek/deepseek-r1"),
+    max_concurrency=int(os.getenv("CHAT_MAX_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "64")),
+    cache=TTLCache(
+        maxsize=int(os.getenv("CHAT_CACHE_SIZE", "256")),
+        ttl=float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600")),
+    ),
+)
+
+# Model fitting runs in worker processes; forecasts are recomputed in the background
+MODEL_POOL_WARMUP = os.getenv("MODEL_POOL_WARMUP", "true").lower() == "true"
+model_pool = ModelPool(max_workers=int(os.getenv("MODEL_POOL_WORKERS", "0")) or None, warm=MODEL_POOL_WARMUP)
+# With a shared event backend there are several workers: one of them runs each periodic job
+scheduler = Scheduler(lease=MongoLease(db, event_bus.worker_id) if event_bus.backend.shared else None)
+scheduler.add_job("forecasts", lambda: compute_run(db, model_pool), float(os.getenv("FORECAST_INTERVAL_SECONDS", "900")))
+# Bulk uploads applying at least this many rows trigger an early forecast run
+FORECAST_RERUN_ROWS = int(os.getenv("FORECAST_RERUN_ROWS", "1000"))
+
+# Inventory facts for signed-in chat users, refreshed incrementally on writes
+inventory_context = InventoryContext(max_rows=int(os.getenv("CHAT_CONTEXT_ROWS", "8")), pool=model_pool)
+
+# Authenticated users keyed by token subject (email); a TTL of 0 disables the cache
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+event_bus.on("users.changed", user_cache.invalidate)
+# Embed role/id claims in tokens so read-only routes can skip the user lookup.
+# Role changes then only take effect once the token expires.
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "false").lower() == "true"
 
 # Enable CORS for frontend interaction
 app.add_middleware(
@@ -34,15 +134,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Forecast-Computed-At", "X-Forecast-Model", "ETag"],
 )
+# Outermost, so it times everything including CORS handling and streamed bodies
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 # Helper functions for Auth
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -67,12 +171,68 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
-    
-    user = await db["users"].find_one({"email": email})
+
+    user = await lookup_user(email)
     if user is None:
         raise credentials_exception
     return user
 
+async def lookup_user(email):
+    """Cached user document by email, or None if there is no such account."""
+    user = user_cache.get(email)
+    if user is None:
+        user = await db["users"].find_one({"email": email})
+        if user is None:
+            return None
+        user_cache.set(email, user)
+    # Handlers get their own copy so they can't mutate the cached entry
+    return dict(user)
+
+async def get_token_user(token: str = Depends(oauth2_scheme)):
+    """
+    Lightweight identity for read-only routes: built from token claims when
+    AUTH_TOKEN_CLAIMS is enabled, otherwise the regular (cached) user lookup.
+    Carries only _id, email, username and role.
+    """
+    if AUTH_TOKEN_CLAIMS:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.PyJWTError:
+            payload = {}
+        if payload.get("sub") and payload.get("uid") and payload.get("role"):
+            return {
+                "_id": ObjectId(payload["uid"]),
+                "email": payload["sub"],
+                "username": payload.get("name"),
+                "role": payload["role"],
+            }
+    return await get_current_user(token)
+
+def drop_product_state(*product_ids):
+    invalidate_forecasts(*product_ids)
+    inventory_context.mark_products(*product_ids)
+
+async def products_changed(*product_ids):
+    """
+    Drops per-product derived state after stock, price or catalog writes, in
+    every worker, and bumps the catalog version behind GET /products ETags.
+    """
+    drop_product_state(*product_ids)
+    event_bus.broadcast("products.changed", [str(pid) for pid in product_ids if pid])
+    await catalog.bump(db)
+
+def user_changed(email):
+    user_cache.invalidate(email)
+    event_bus.broadcast("users.changed", email)
+
+def orders_changed():
+    """Marks the pending-order count stale in every worker after order writes."""
+    inventory_context.mark_orders()
+    event_bus.broadcast("orders.changed", None)
+
+event_bus.on("products.changed", lambda product_ids: drop_product_state(*product_ids))
+event_bus.on("orders.changed", lambda _: inventory_context.mark_orders())
+
 # Auth Routes
 @app.post("/register", response_model=UserModel)
 async def register(user: UserCreate):
@@ -88,9 +248,13 @@ async def register(user: UserCreate):
         "email": user.email,
         "image_url": user.image_url,
         "role": "staff", # Default to staff for public registration
-        "hashed_password": get_password_hash(user.password)
+        "hashed_password": await get_password_hash(user.password)
     }
-    new_user = await db["users"].insert_one(user_dict)
+    try:
+        new_user = await db["users"].insert_one(user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration for the same email
+        raise HTTPException(status_code=400, detail="Email already registered")
     created_user = await db["users"].find_one({"_id": new_user.inserted_id})
     return created_user
 
@@ -98,15 +262,18 @@ async def register(user: UserCreate):
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     # Here form_data.username will contain the user's email
     user = await db["users"].find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {"sub": user["email"]}
+    if AUTH_TOKEN_CLAIMS:
+        claims.update(uid=str(user["_id"]), role=user.get("role", "staff"), name=user.get("username"))
     access_token = create_access_token(
-        data={"sub": user["email"]}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -135,10 +302,8 @@ async def list_users(current_user: dict = Depends(get_current_user)):
             results.append(u)
             
         return results
-    except Exception as e:
-        print(f"ERROR listing users: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("listing users failed")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 @app.post("/admin/users", response_model=UserModel)
@@ -158,9 +323,13 @@ async def create_user_admin(user: UserCreate, current_user: dict = Depends(get_c
         "email": user.email,
         "image_url": user.image_url,
         "role": user.role, # Allow admin to set role
-        "hashed_password": get_password_hash(user.password)
+        "hashed_password": await get_password_hash(user.password)
     }
-    new_user = await db["users"].insert_one(user_dict)
+    try:
+        new_user = await db["users"].insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    user_changed(user.email)
     created_user = await db["users"].find_one({"_id": new_user.inserted_id})
     return created_user
 
@@ -173,11 +342,30 @@ async def delete_user(id: str, current_user: dict = Depends(get_current_user)):
     if str(current_user["_id"]) == id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
         
-    delete_result = await db["users"].delete_one({"_id": ObjectId(id)})
-    if delete_result.deleted_count == 0:
+    deleted_user = await db["users"].find_one_and_delete({"_id": ObjectId(id)})
+    if deleted_user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    user_changed(deleted_user.get("email"))
+    await sync.record_deletion(db, "users", deleted_user["_id"])
     return JSONResponse(status_code=204)
 
+@app.put("/users/{id}/role", response_model=UserModel)
+async def update_user_role(id: str, payload: dict = Body(...), current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    role = payload.get("role")
+    if role not in ("admin", "staff"):
+        raise HTTPException(status_code=400, detail="Role must be 'admin' or 'staff'")
+
+    updated_user = await db["users"].find_one_and_update(
+        {"_id": ObjectId(id)}, {"$set": {"role": role}}, return_document=ReturnDocument.AFTER
+    )
+    if updated_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_changed(updated_user.get("email"))
+    return updated_user
+
 # ------------------------------------
 
 # Protected Product Routes
@@ -187,28 +375,78 @@ async def create_product(product: ProductModel = Body(...), current_user: dict =
         if current_user.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Only admins can add products")
             
-        product_dict = jsonable_encoder(product)
-        if "id" in product_dict: del product_dict["id"]
-        if "_id" in product_dict: del product_dict["_id"]
+        product_dict = product.model_dump(exclude={"id"})
+        product_dict["updated_at"] = sync.now()
         
         new_product = await db["products"].insert_one(product_dict)
+        await products_changed(new_product.inserted_id)
         created_product = await db["products"].find_one({"_id": new_product.inserted_id})
-        return JSONResponse(status_code=status.HTTP_201_CREATED, content=jsonable_encoder(created_product))
+        return FastJSONResponse(created_product, status_code=status.HTTP_201_CREATED)
+    except HTTPException:
+        raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Product name already exists")
     except Exception as e:
-        print(f"ERROR creating product: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("creating product failed")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/products", response_description="List all products", response_model=List[ProductModel], response_model_by_alias=True)
-async def list_products(current_user: dict = Depends(get_current_user)):
-    products = await db["products"].find().to_list(1000)
-    return products
+PRODUCT_FIELDS = set(ProductModel.model_fields) - {"id"}
+PRODUCT_SORTS = {"id": ["_id"], "name": ["name", "_id"]}
+# Browsers store tagged responses and revalidate them on every use
+REVALIDATE = "private, no-cache"
+
+@app.get("/products", response_description="List products, one page at a time", response_model=List[ProductModel], response_model_by_alias=True)
+async def list_products(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|name)$"),
+    category: Optional[str] = None,
+    low_stock: bool = False,
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. name,current_stock"),
+    current_user: dict = Depends(get_token_user),
+):
+    # A page only changes with the catalog version: revalidation costs one find_one
+    version = await catalog.version(db)
+    etag = f'"{version}-{hashlib.sha1(request.url.query.encode()).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    query = {}
+    if category:
+        query["category"] = category
+    if name_prefix:
+        query["name"] = {"$regex": "^" + re.escape(name_prefix)}
+    if low_stock:
+        query["$expr"] = {"$lte": ["$current_stock", "$low_stock_threshold"]}
+
+    sort_fields = PRODUCT_SORTS[sort]
+    if cursor:
+        after = keyset_filter(sort_fields, decode_cursor(cursor))
+        query = {"$and": [query, after]} if query else after
+
+    projection = parse_fields(fields, PRODUCT_FIELDS)
+    if projection is not None:
+        projection.update({f: 1 for f in sort_fields})
+
+    # Fetch one extra document to know whether another page exists
+    products = await db["products"].find(query, projection).sort(
+        [(f, ASCENDING) for f in sort_fields]
+    ).limit(limit + 1).to_list(None)
+
+    if len(products) > limit:
+        products = products[:limit]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor([products[-1][f] for f in sort_fields])
+
+    # Trusted DB documents: skip response model revalidation of every row
+    return db_response(products, ProductModel, headers=headers)
 
 @app.get("/products/{id}", response_description="Get a single product", response_model=ProductModel, response_model_by_alias=True)
-async def show_product(id: str, current_user: dict = Depends(get_current_user)):
+async def show_product(id: str, request: Request, current_user: dict = Depends(get_token_user)):
     if (product := await db["products"].find_one({"_id": ObjectId(id)})) is not None:
-        return product
+        return etag_response(request, ProductModel.model_validate(product).model_dump(mode="json", by_alias=True))
     raise HTTPException(status_code=404, detail=f"Product {id} not found")
 
 @app.put("/products/{id}", response_description="Update a product", response_model=ProductModel, response_model_by_alias=True)
@@ -219,7 +457,11 @@ async def update_product(id: str, product: ProductUpdateModel = Body(...), curre
     product = {k: v for k, v in product.model_dump().items() if v is not None}
 
     if len(product) >= 1:
-        update_result = await db["products"].update_one({"_id": ObjectId(id)}, {"$set": product})
+        try:
+            update_result = await db["products"].update_one({"_id": ObjectId(id)}, {"$set": {**product, "updated_at": sync.now()}})
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="Product name already exists")
+        await products_changed(id)
 
         if update_result.modified_count == 1:
             if (
@@ -240,15 +482,15 @@ async def delete_product(id: str, current_user: dict = Depends(get_current_user)
     delete_result = await db["products"].delete_one({"_id": ObjectId(id)})
 
     if delete_result.deleted_count == 1:
+        await products_changed(id)
+        await sync.record_deletion(db, "products", id)
         return JSONResponse(status_code=status.HTTP_204_NO_CONTENT)
 
     raise HTTPException(status_code=404, detail=f"Product {id} not found")
 
 @app.post("/sales", response_description="Record a sale")
 async def record_sale(sale: SaleModel = Body(...), current_user: dict = Depends(get_current_user)):
-    sale_data = jsonable_encoder(sale)
-    if "id" in sale_data: del sale_data["id"]
-    if "_id" in sale_data: del sale_data["_id"]
+    sale_data = sale.model_dump(exclude={"id"}) # timestamp stays a BSON date so orders sort and range-match correctly
 
     product = await db["products"].find_one({"_id": ObjectId(sale.product_id)})
     if not product:
@@ -266,100 +508,123 @@ async def record_sale(sale: SaleModel = Body(...), current_user: dict = Depends(
 
     # Initial status is pending unless admin overrides (staying simple for now)
     sale_data["status"] = "pending"
+    sale_data["updated_at"] = sync.now()
 
     if product["current_stock"] < sale.quantity_sold:
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
     # NOTE: Stock is NOT decremented here. It happens on Admin Approval.
     new_sale = await db["sales"].insert_one(sale_data)
+    orders_changed()
     
-    # Simulation: Notify Admin (Printing to console)
-    print(f"NOTIFICATION [To Admin]: New order request from {sale_data['user_name']} for {sale_data['product_name']} ({sale.quantity_sold} qty)")
+    # Simulation: Notify Admin (logged)
+    logger.info("notify admin: new order request", extra={
+        "user": sale_data["user_name"], "product": sale_data["product_name"], "quantity": sale.quantity_sold,
+    })
+    await event_bus.publish("order.created", {
+        "id": str(new_sale.inserted_id),
+        "product_id": sale_data["product_id"],
+        "product_name": sale_data["product_name"],
+        "quantity_sold": sale.quantity_sold,
+        "user_name": sale_data.get("user_name"),
+    }, user_id=sale_data.get("user_id"))
     
-    return JSONResponse(status_code=status.HTTP_201_CREATED, content=jsonable_encoder({"id": str(new_sale.inserted_id), "status": "pending"}))
-
-@app.get("/admin/orders", response_description="List all orders for admin management")
-async def list_admin_orders(current_user: dict = Depends(get_current_user)):
+    return FastJSONResponse({"id": new_sale.inserted_id, "status": "pending"}, status_code=status.HTTP_201_CREATED)
+
+@app.get("/admin/orders", response_description="List orders for admin management, newest first")
+async def list_admin_orders(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status", description="e.g. pending, approved"),
+    current_user: dict = Depends(get_current_user),
+):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Only admins can manage orders")
-        
-    orders = await db["sales"].find().sort("timestamp", -1).to_list(1000)
-    print(f"DEBUG: Found {len(orders)} orders for admin")
-    for order in orders:
-        try:
-            order["_id"] = str(order["_id"])
-            
-            # Migration-on-the-fly: Fill missing fields for old data with safety
-            if ("product_name" not in order or not order["product_name"]) and order.get("product_id"):
-                pid = order["product_id"]
-                if ObjectId.is_valid(pid):
-                    product = await db["products"].find_one({"_id": ObjectId(pid)})
-                    if product:
-                        order["product_name"] = product["name"]
-                        if "unit_price" not in order: order["unit_price"] = product["price"]
-                        if "total_price" not in order: order["total_price"] = product["price"] * order.get("quantity_sold", 0)
-            
-            if ("user_name" not in order or not order["user_name"]) and order.get("user_id"):
-                uid = order["user_id"]
-                if ObjectId.is_valid(uid):
-                    user = await db["users"].find_one({"_id": ObjectId(uid)})
-                    if user:
-                        order["user_name"] = user["username"]
-                        
-            if "status" not in order:
-                order["status"] = "pending"
-        except Exception as e:
-            print(f"Error enriching order {order.get('_id')}: {e}")
-            
-    return orders
+
+    query = {"status": orders.status_filter(status_filter)} if status_filter else {}
+    results, next_cursor = await orders.list_orders(db, query, limit, cursor)
+    return db_response(results, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+APPROVAL_ERRORS = {
+    orders.ORDER_NOT_FOUND: (404, "Order not found"),
+    orders.NOT_PENDING: (400, "Order is not pending"),
+    orders.PRODUCT_MISSING: (404, "Product no longer exists"),
+    orders.INSUFFICIENT_STOCK: (400, "Insufficient stock to approve order"),
+}
+
+async def notify_approved(approved_orders):
+    for order in approved_orders:
+        await event_bus.publish("order.approved", {
+            "id": str(order["_id"]),
+            "product_id": order.get("product_id"),
+            "product_name": order.get("product_name"),
+            "quantity_sold": order.get("quantity_sold"),
+        }, user_id=order.get("user_id"))
+
+    # Simulation: Notify User (logged)
+    user_ids = [ObjectId(o["user_id"]) for o in approved_orders if ObjectId.is_valid(o.get("user_id") or "")]
+    users = await db["users"].find({"_id": {"$in": user_ids}}, {"email": 1}).to_list(None) if user_ids else []
+    emails = {str(u["_id"]): u["email"] for u in users}
+    for order in approved_orders:
+        user_email = emails.get(order.get("user_id"), "User")
+        logger.info("notify user: order approved", extra={"email": user_email, "product": order.get("product_name")})
 
 @app.post("/admin/orders/{id}/approve", response_description="Approve and process an order")
 async def approve_order(id: str, current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Only admins can approve orders")
-    
-    order = await db["sales"].find_one({"_id": ObjectId(id)})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    if order["status"] == "approved":
+
+    outcome, order = await orders.approve(db, id)
+    if outcome == orders.ALREADY_APPROVED:
         return {"message": "Order already approved"}
+    if outcome in APPROVAL_ERRORS:
+        status_code, detail = APPROVAL_ERRORS[outcome]
+        raise HTTPException(status_code=status_code, detail=detail)
 
-    product = await db["products"].find_one({"_id": ObjectId(order["product_id"])})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product no longer exists")
-        
-    if product["current_stock"] < order["quantity_sold"]:
-        raise HTTPException(status_code=400, detail="Insufficient stock to approve order")
+    await products_changed(order["product_id"])
+    orders_changed()
+    await notify_approved([order])
 
-    # 1. Decrement Stock
-    await db["products"].update_one(
-        {"_id": ObjectId(order["product_id"])},
-        {"$inc": {"current_stock": -order["quantity_sold"]}}
-    )
-    
-    # 2. Update Order Status
-    await db["sales"].update_one(
-        {"_id": ObjectId(id)},
-        {"$set": {"status": "approved"}}
-    )
-    
-    # Simulation: Notify User (Printing to console)
-    user_email = "User" # Default
-    user = await db["users"].find_one({"_id": ObjectId(order["user_id"])})
-    if user: user_email = user["email"]
-    
-    print(f"NOTIFICATION [To Email]: Sent to {user_email} - Your order for {order['product_name']} has been APPROVED and PLACED!")
-    
     return {"status": "approved", "message": "Order approved and stock updated"}
 
+@app.post("/admin/orders/approve-batch", response_description="Approve many pending orders in one call")
+async def approve_orders_batch(payload: dict = Body(...), current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can approve orders")
+
+    ids = payload.get("ids")
+    if not isinstance(ids, list) or not ids:
+        raise HTTPException(status_code=400, detail="ids must be a non-empty list")
+    if len(ids) > 1000:
+        raise HTTPException(status_code=400, detail="At most 1000 orders per batch")
+
+    # Each approval is independently atomic, so they can safely run concurrently
+    semaphore = asyncio.Semaphore(16)
+
+    async def approve_one(order_id):
+        async with semaphore:
+            return order_id, *(await orders.approve(db, str(order_id)))
+
+    results = await asyncio.gather(*(approve_one(i) for i in dict.fromkeys(ids)))
+
+    approved, failed = [], []
+    for order_id, outcome, order in results:
+        if outcome == orders.APPROVED:
+            approved.append(order)
+        else:
+            failed.append({"id": order_id, "reason": outcome})
+
+    await products_changed(*{o["product_id"] for o in approved})
+    orders_changed()
+    await notify_approved(approved)
+    return {"approved": [str(o["_id"]) for o in approved], "failed": failed}
+
 @app.post("/stock", response_description="Upload current stock", status_code=status.HTTP_201_CREATED)
 async def upload_stock(stock: StockModel = Body(...), current_user: dict = Depends(get_current_user)):
     try:
-        stock_data = jsonable_encoder(stock)
-        print(f"DEBUG: stock_data before insert: {stock_data}")
-        if "id" in stock_data: del stock_data["id"]
-        if "_id" in stock_data and stock_data["_id"] is None: del stock_data["_id"]
+        stock_data = stock.model_dump(by_alias=True)
+        logger.debug("stock upload", extra={"stock": stock_data})
+        if stock_data["_id"] is None: del stock_data["_id"]
         
         # 1. Log to stock collection
         new_stock = await db["stock"].insert_one(stock_data)
@@ -372,9 +637,10 @@ async def upload_stock(stock: StockModel = Body(...), current_user: dict = Depen
                 {"_id": product["_id"]},
                 {
                     "$inc": {"current_stock": stock.quantity},
-                    "$set": {"price": stock.price} # Update price during stock upload
+                    "$set": {"price": stock.price, "updated_at": sync.now()} # Update price during stock upload
                 }
             )
+            await products_changed(product["_id"])
         else:
             # Create new product with provided price
             new_product = {
@@ -382,136 +648,237 @@ async def upload_stock(stock: StockModel = Body(...), current_user: dict = Depen
                 "category": stock.category,
                 "price": stock.price,
                 "current_stock": stock.quantity,
-                "low_stock_threshold": 10
+                "low_stock_threshold": 10,
+                "updated_at": sync.now(),
             }
-            await db["products"].insert_one(new_product)
+            created = await db["products"].insert_one(new_product)
+            await products_changed(created.inserted_id)
             
         return {"id": str(new_stock.inserted_id), "message": "Stock logged and Marketplace synced"}
+    except DuplicateKeyError:
+        # A concurrent upload created the product between the lookup and the insert
+        raise HTTPException(status_code=409, detail="Product name already exists")
     except Exception as e:
-        print(f"ERROR in upload_stock: {e}")
+        logger.exception("stock upload failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/stock/bulk", response_description="Stream a CSV or NDJSON stock manifest")
+async def upload_stock_bulk(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+    current_user: dict = Depends(get_current_user),
+):
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "ndjson" if "json" in content_type else "csv"
+    summary = await stock_ingest.ingest(
+        db, request.stream(), fmt, on_products_touched=lambda ids: products_changed(*ids)
+    )
+    if summary["applied"] >= FORECAST_RERUN_ROWS:
+        scheduler.trigger("forecasts")
+    return summary
+
 @app.get("/orders/me")
-async def get_my_orders(current_user: dict = Depends(get_current_user)):
-    user_id = str(current_user["_id"])
-    orders = await db["sales"].find({"user_id": user_id}).sort("timestamp", -1).to_list(1000)
-    
-    results = []
-    for order in orders:
-        order["_id"] = str(order["_id"])
-        # Ensure product_name is present (legacy or new)
-        if "product_name" not in order:
-            product = await db["products"].find_one({"_id": ObjectId(order["product_id"])})
-            order["product_name"] = product["name"] if product else "Unknown Product"
-        results.append(order)
-    return results
+async def get_my_orders(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    current_user: dict = Depends(get_token_user),
+):
+    query = {"user_id": str(current_user["_id"])}
+    if status_filter:
+        query["status"] = orders.status_filter(status_filter)
+    results, next_cursor = await orders.list_orders(db, query, limit, cursor)
+    for order in results:
+        order.setdefault("product_name", "Unknown Product")
+    return db_response(results, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+@app.get("/sync", response_description="Products, orders and deletions changed since a cursor")
+async def sync_changes(
+    since: Optional[str] = Query(None, description="Cursor from the previous /sync response; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: dict = Depends(get_token_user),
+):
+    # Admins get every order, staff only their own; repeat while has_more is true
+    return FastJSONResponse(await sync.changes_since(db, since, current_user, limit))
 
 @app.get("/prediction", response_description="Get inventory predictions")
-async def get_predictions(current_user: dict = Depends(get_current_user)):
-    from ai_engine import StockPredictor
-    predictor = StockPredictor()
-    
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    
-    # 1. Get List of all products
-    products = await db["products"].find().to_list(1000)
-    
-    predictions = []
-    
-    for product in products:
-        product_id = str(product["_id"])
-        
-        # 2. Get daily sales history for this product
-        pipeline = [
-            {
-                "$match": {
-                    "product_id": product_id,
-                    "timestamp": {"$gte": thirty_days_ago}
-                }
-            },
-            {
-                "$project": {
-                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                    "quantity_sold": 1
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$date",
-                    "daily_total": {"$sum": "$quantity_sold"}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
-        
-        daily_sales_cursor = await db["sales"].aggregate(pipeline).to_list(1000)
-        
-        # Convert to format expected by AI Engine
-        sales_history = [
-            {'date': datetime.strptime(d["_id"], "%Y-%m-%d"), 'quantity': d["daily_total"]}
-            for d in daily_sales_cursor
-        ]
-        
-        # 3. Predict
-        predicted_need = predictor.predict_future_demand(sales_history, days_to_predict=7)
-        
-        predictions.append({
-            "product_name": product["name"],
-            "current_stock": product["current_stock"],
-            "predicted_need": predicted_need,
-            "status": "Shortage Dept" if product["current_stock"] < predicted_need else "Stocked"
-        })
-            
-    return predictions
+async def get_predictions(
+    request: Request,
+    fresh: bool = Query(False, description="Refit now instead of reading the latest scheduled run"),
+    current_user: dict = Depends(get_token_user),
+):
+    if not fresh:
+        latest = await persisted_predictions(read_db, days_to_predict=7, pool=model_pool)
+        if latest is not None:
+            run, predictions = latest
+            return etag_response(request, predictions, headers={
+                "X-Forecast-Computed-At": run["computed_at"].isoformat() + "Z",
+                "X-Forecast-Model": f"{run['model']}@{run['model_version']}",
+            })
+        # Nothing persisted yet (first start): answer inline and make sure a run is coming
+        scheduler.trigger("forecasts")
+    return etag_response(request, await build_predictions(read_db, days_to_predict=7, pool=model_pool))
+
+@app.get("/reorder-plan", response_description="Safety stock, reorder point and order quantity per product")
+async def get_reorder_plan(
+    fmt: str = Query("json", alias="format", pattern="^(json|csv)$"),
+    only_needed: bool = Query(False, description="Only products at or below their reorder point"),
+    current_user: dict = Depends(get_token_user),
+):
+    rows = await reorder.build_plan(read_db, pool=model_pool, only_needed=only_needed)
+    if fmt == "csv":
+        filename = f"reorder-plan-{datetime.utcnow():%Y%m%d}.csv"
+        return StreamingResponse(
+            reorder.iter_csv(rows),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    return db_response(rows)
+
+def etag_response(request: Request, content, cache_control=REVALIDATE, headers=None):
+    """
+    JSON response tagged with a hash of its body; answers 304 Not Modified when
+    the client already holds that body (If-None-Match).
+    """
+    response = FastJSONResponse(content)
+    etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return response
+
+@app.get("/reports/sales", response_description="Approved sales per day/week/month and product, category or user")
+async def get_sales_report(
+    request: Request,
+    group_by: str = Query("product", pattern="^(product|category|user)$"),
+    period: str = Query("day", pattern="^(day|week|month)$"),
+    start: Optional[date] = Query(None, description="First day; defaults to 30 days before end"),
+    end: Optional[date] = Query(None, description="Last day, inclusive; defaults to today"),
+    source: Optional[str] = Query(None, pattern="^(cubes|sales)$", description="Force the cubes or the raw aggregation"),
+    current_user: dict = Depends(get_token_user),
+):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view reports")
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    report = await reports.sales_report(read_db, group_by, period, start, end, source)
+    return etag_response(request, report)
+
+@app.post("/events/ticket", response_description="Single-use ticket for opening GET /events")
+async def create_event_ticket(current_user: dict = Depends(get_token_user)):
+    ticket = await event_tickets.issue(db, current_user["email"])
+    return {"ticket": ticket, "expires_in": event_tickets.TICKET_SECONDS}
+
+@app.get("/events", response_description="Server-sent stream of order events")
+async def stream_events(request: Request, ticket: str = Query(..., description="From POST /events/ticket; EventSource can't send headers")):
+    email = await event_tickets.redeem(db, ticket)
+    user = await lookup_user(email) if email else None
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired event ticket")
+    if user.get("role") == "admin":
+        predicate = lambda event: True
+    else:
+        user_id = str(user["_id"])
+        predicate = lambda event: event.get("user_id") == user_id
+
+    async def event_stream():
+        with event_bus.subscribe(predicate) as subscription:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/admin/stats", response_description="In-process cache and worker counters")
+async def get_admin_stats(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "forecast_cache": forecast_cache.stats(),
+        "reorder_stats_cache": reorder.stats_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "events": event_bus.stats(),
+        "chat": chat_proxy.stats(),
+        "inventory_context": inventory_context.stats(),
+        "model_pool": model_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "mongo_pool": metrics.pool_listener.stats(),
+    }
+
+# Scrapers can't log in; an optional shared token keeps the endpoint private
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+metrics.registry.gauge("password_hash_queue_depth", "Logins waiting for a bcrypt thread",
+                       lambda: password_hasher.stats()["queue_depth"])
+metrics.registry.gauge("model_pool_in_flight", "Forecast jobs running or queued in the model pool",
+                       lambda: model_pool.stats()["in_flight"])
+metrics.registry.gauge("chat_in_flight", "Chat completions streaming from the AI service",
+                       lambda: chat_proxy.stats()["in_flight"])
+metrics.registry.gauge("chat_queue_depth", "Chat requests waiting for a slot", lambda: chat_proxy.stats()["queue_depth"])
+metrics.registry.gauge("mongo_pool_checked_out", "MongoDB connections in use, summed over servers",
+                       lambda: metrics.pool_listener.checked_out)
+metrics.registry.gauge("mongo_pool_waiting", "Operations waiting for a MongoDB connection",
+                       lambda: metrics.pool_listener.waiting)
+metrics.registry.gauge("mongo_pool_saturation", "Connections in use as a fraction of MONGO_MAX_POOL_SIZE",
+                       lambda: metrics.pool_listener.checked_out / database.current_settings().mongo_max_pool_size)
+metrics.registry.gauge("mongo_pool_wait_timeouts", "Check-outs that hit MONGO_WAIT_QUEUE_TIMEOUT_MS",
+                       lambda: metrics.pool_listener.timeouts)
+metrics.registry.gauge("event_subscribers", "Open /events streams", lambda: event_bus.stats()["subscribers"])
+
+@app.get("/metrics", response_description="Prometheus metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # AI Chat Proxy
 @app.post("/ai/chat")
-async def ai_chat_proxy(payload: dict = Body(...)):
+async def ai_chat_proxy(payload: dict = Body(...), token: Optional[str] = Depends(optional_oauth2_scheme)):
     user_message = payload.get("message")
     if not user_message:
         raise HTTPException(status_code=400, detail="Message is required")
 
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not api_key:
+    if not chat_proxy.api_key:
         raise HTTPException(status_code=500, detail="AI API Key not configured on server")
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:8080",
-                    "X-Title": "ShopManager AI"
-                },
-                json={
-                    "model": "deepseek/deepseek-r1",
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "You are a helpful AI assistant for ShopManager, a software for small business inventory and sales management. Provide direct, helpful answers. Avoid technical jargon or showing your internal thought process."
-                        },
-                        { "role": "user", "content": user_message }
-                    ]
-                },
-                timeout=60.0
-            )
-            
-            if response.status_code != 200:
-                print(f"OpenRouter Error: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail="Error from AI service")
-                
-            return response.json()
-            
-    except Exception as e:
-        print(f"Chat Proxy Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # The widget is also on the public landing page: only signed-in users get shop data
+    context = None
+    if token:
+        try:
+            await get_token_user(token)
+            context = await inventory_context.build(read_db, user_message)
+        except HTTPException:
+            pass  # Expired token left in localStorage: answer without shop data
+
+    # {"stream": false} keeps the old single JSON response for non-browser callers
+    if payload.get("stream") is False:
+        return await chat_proxy.complete(user_message, context)
+
+    chunks, cached = await chat_proxy.stream(user_message, context)
+    return StreamingResponse(
+        chunks,
+        media_type="text/plain; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Chat-Cache": "hit" if cached else "miss"},
+    )
 
 # Serve Frontend Static Files
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
 
 if __name__ == "__main__":
+    # Single worker for development; serve.py runs one per core
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,289 @@
+"""
+In-process metrics exposed at `/metrics` in the Prometheus text format.
+
+- `MetricsMiddleware` (pure ASGI, so streamed bodies are included) records a
+  latency histogram per route template and the number of MongoDB round trips
+  each request made.
+- `MongoCommandListener` times every command the driver sends. Motor runs
+  driver calls with a copy of the caller's context, so the listener can
+  attribute round trips to the request that issued them.
+- `MongoPoolListener` tracks connections checked out of the driver's pool and
+  requests waiting for one, i.e. how saturated MONGO_MAX_POOL_SIZE is.
+
+Both listeners are passed to `database.connect` in the API lifespan.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from pymongo import monitoring
+from starlette.routing import Mount
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Requests making more Mongo round trips than this are logged: usually an N+1 query
+ROUND_TRIP_WARNING = int(os.getenv("METRICS_ROUND_TRIP_WARNING", "25"))
+SLOW_REQUEST_SECONDS = float(os.getenv("METRICS_SLOW_REQUEST_SECONDS", "1.0"))
+# Adds X-DB-Round-Trips / Server-Timing to responses, for development and load tests
+TIMING_HEADERS = os.getenv("METRICS_TIMING_HEADERS", "false").lower() == "true"
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observations may come from driver threads."""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # One count per bucket plus +Inf, then sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.labels + ("le",)
+        with self._lock:
+            snapshot = sorted((values, list(series)) for values, series in self._series.items())
+        for values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(bucket_labels, values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callable, e.g. a queue depth in some `stats()`."""
+
+    def __init__(self, name, help_text, func):
+        self.name = name
+        self.help = help_text
+        self.func = func
+
+    def render(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            logger.warning("gauge %s failed: %r", self.name, e)
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, func):
+        return self.add(Gauge(name, help_text, func))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+http_requests = registry.add(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+http_latency = registry.add(Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")))
+http_round_trips = registry.add(Histogram(
+    "http_request_mongo_round_trips", "MongoDB commands sent per HTTP request", ("method", "route"),
+    buckets=ROUND_TRIP_BUCKETS))
+mongo_latency = registry.add(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command",), buckets=MONGO_BUCKETS))
+mongo_failures = registry.add(Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error", ("command",)))
+
+
+class RequestStats:
+    __slots__ = ("round_trips", "mongo_seconds")
+
+    def __init__(self):
+        self.round_trips = 0
+        self.mongo_seconds = 0.0
+
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        stats = current_request.get()
+        if stats is not None:
+            stats.round_trips += 1
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        mongo_failures.inc(event.command_name)
+        self._finished(event)
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_latency.observe(seconds, event.command_name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.mongo_seconds += seconds
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Checked-out and waiting counts summed over every server's pool."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.timeouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def stats(self):
+        return {"checked_out": self.checked_out, "waiting": self.waiting, "max_waiting": self.max_waiting,
+                "timeouts": self.timeouts}
+
+
+mongo_listener = MongoCommandListener()
+pool_listener = MongoPoolListener()
+
+
+def route_label(scope):
+    """Route template (e.g. /products/{id}) so labels stay bounded; mounts by prefix."""
+    route = scope.get("route")
+    if isinstance(route, Mount) or route is None and "app_root_path" in scope:
+        # Mounted app (the static frontend); some versions don't record the Mount itself
+        return (getattr(route, "path", None) or scope.get("root_path", "")) + "/*"
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if TIMING_HEADERS:
+                    elapsed = (time.perf_counter() - start) * 1000
+                    message.setdefault("headers", []).extend([
+                        (b"x-db-round-trips", str(stats.round_trips).encode()),
+                        (b"server-timing", f"db;dur={stats.mongo_seconds * 1000:.1f}, app;dur={elapsed:.1f}".encode()),
+                    ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            method, route = scope["method"], route_label(scope)
+            http_requests.inc(method, route, str(status_code))
+            http_latency.observe(elapsed, method, route)
+            http_round_trips.observe(stats.round_trips, method, route)
+            if stats.round_trips > ROUND_TRIP_WARNING or elapsed > SLOW_REQUEST_SECONDS:
+                logger.warning("slow request", extra={
+                    "method": method, "route": route, "status": status_code, "duration_ms": round(elapsed * 1000, 1),
+                    "round_trips": stats.round_trips, "mongo_ms": round(stats.mongo_seconds * 1000, 1),
+                })
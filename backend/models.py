@@ -45,6 +45,9 @@ class ProductModel(BaseModel):
     price: float = Field(..., gt=0)
     current_stock: int = Field(..., ge=0)
     low_stock_threshold: int = Field(default=10, ge=0)
+    # Reorder planning; None falls back to the REORDER_* defaults
+    lead_time_days: Optional[float] = Field(default=None, gt=0)
+    service_level: Optional[float] = Field(default=None, gt=0, lt=1)
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -66,6 +69,8 @@ class ProductUpdateModel(BaseModel):
     price: Optional[float] = None
     current_stock: Optional[int] = None
     low_stock_threshold: Optional[int] = None
+    lead_time_days: Optional[float] = Field(default=None, gt=0)
+    service_level: Optional[float] = Field(default=None, gt=0, lt=1)
 
     model_config = ConfigDict(
         populate_by_name=True,
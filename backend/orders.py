@@ -0,0 +1,218 @@
+"""
+Order (sales) listing helpers and the one-time legacy order migration.
+
+Orders created before sales were enriched at write time lack product_name,
+unit_price/total_price and user_name, and older API writes stored the
+timestamp as an ISO string. The migration fixes both permanently:
+
+    python orders.py backfill
+
+String timestamps sort apart from BSON dates (Mongo orders values by type
+first), so keyset pages would stop where they meet; the API converts them at
+startup with `backfill(database, query=STRING_TIMESTAMPS)`.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+
+import reports
+import sales_rollup
+from pagination import decode_cursor, encode_cursor, keyset_filter
+
+ORDER_SORT = ["timestamp", "_id"]
+
+STRING_TIMESTAMPS = {"timestamp": {"$type": "string"}}
+LEGACY_FILTER = {"$or": [
+    {"product_name": {"$in": [None, ""]}},
+    {"user_name": {"$in": [None, ""]}},
+    STRING_TIMESTAMPS,
+]}
+
+
+async def list_orders(database, query, limit, cursor=None):
+    """
+    Returns one page of orders, newest first, and the cursor of the next page.
+    Legacy rows are enriched with two batched lookups instead of one per order.
+    """
+    if cursor:
+        after = keyset_filter(ORDER_SORT, decode_cursor(cursor), descending=True)
+        query = {"$and": [query, after]} if query else after
+
+    orders = await database["sales"].find(query).sort(
+        [(f, DESCENDING) for f in ORDER_SORT]
+    ).limit(limit + 1).to_list(None)
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor([orders[-1].get(f) for f in ORDER_SORT])
+
+    await enrich_orders(database, orders)
+    for order in orders:
+        order["_id"] = str(order["_id"])
+        # Same rule as sales_rollup.COUNTED_STATUSES: no status means a completed legacy sale
+        order.setdefault("status", APPROVED)
+    return orders, next_cursor
+
+
+def status_filter(status):
+    """Query value for ?status=, counting status-less legacy sales as approved."""
+    return {"$in": sales_rollup.COUNTED_STATUSES} if status == APPROVED else status
+
+
+def _object_ids(values):
+    return list({ObjectId(v) for v in values if v and ObjectId.is_valid(v)})
+
+
+async def _lookup(database, collection, ids, projection):
+    if not ids:
+        return {}
+    docs = await database[collection].find({"_id": {"$in": ids}}, projection).to_list(None)
+    return {str(d["_id"]): d for d in docs}
+
+
+async def enrich_orders(database, orders):
+    """Fills missing product/user details in place: at most one products and one users query."""
+    missing_product = [o for o in orders if not o.get("product_name") and o.get("product_id")]
+    missing_user = [o for o in orders if not o.get("user_name") and o.get("user_id")]
+
+    products = await _lookup(database, "products", _object_ids(o["product_id"] for o in missing_product),
+                             {"name": 1, "price": 1})
+    users = await _lookup(database, "users", _object_ids(o["user_id"] for o in missing_user), {"username": 1})
+
+    for order in missing_product:
+        product = products.get(order["product_id"])
+        if product:
+            order["product_name"] = product["name"]
+            order.setdefault("unit_price", product["price"])
+            order.setdefault("total_price", product["price"] * order.get("quantity_sold", 0))
+    for order in missing_user:
+        user = users.get(order["user_id"])
+        if user:
+            order["user_name"] = user["username"]
+
+
+APPROVED = "approved"
+ALREADY_APPROVED = "already_approved"
+ORDER_NOT_FOUND = "order_not_found"
+NOT_PENDING = "not_pending"
+PRODUCT_MISSING = "product_missing"
+INSUFFICIENT_STOCK = "insufficient_stock"
+
+
+async def approve(database, order_id):
+    """
+    Approves one pending order without races, using two conditional updates:
+
+    1. claim the order: status pending -> approved (only one caller can win)
+    2. decrement stock only if current_stock >= quantity
+
+    If step 2 fails the claim is rolled back to pending. Stock can never go
+    negative and an order can never be approved twice, without requiring a
+    replica set for multi-document transactions.
+
+    :return: (outcome, order) where outcome is one of the module constants
+    """
+    if not ObjectId.is_valid(order_id):
+        return ORDER_NOT_FOUND, None
+    oid = ObjectId(order_id)
+
+    now = datetime.utcnow()
+    order = await database["sales"].find_one_and_update(
+        {"_id": oid, "status": "pending"},
+        {"$set": {"status": APPROVED, "approved_at": now, "updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if order is None:
+        existing = await database["sales"].find_one({"_id": oid}, {"status": 1})
+        if existing is None:
+            return ORDER_NOT_FOUND, None
+        approved = existing.get("status") in sales_rollup.COUNTED_STATUSES
+        return (ALREADY_APPROVED if approved else NOT_PENDING), existing
+
+    product_id = order.get("product_id")
+    product_oid = ObjectId(product_id) if product_id and ObjectId.is_valid(product_id) else None
+    product = None
+    if product_oid:
+        product = await database["products"].find_one_and_update(
+            {"_id": product_oid, "current_stock": {"$gte": order["quantity_sold"]}},
+            {"$inc": {"current_stock": -order["quantity_sold"]}, "$set": {"updated_at": now}},
+        )
+    if product is None:
+        await database["sales"].update_one(
+            {"_id": oid, "status": APPROVED},
+            {"$set": {"status": "pending", "updated_at": datetime.utcnow()}, "$unset": {"approved_at": ""}},
+        )
+        exists = product_oid and await database["products"].count_documents({"_id": product_oid}, limit=1)
+        return (INSUFFICIENT_STOCK if exists else PRODUCT_MISSING), order
+
+    # Roll the sale into the daily summary used by forecasting and the report cubes
+    await sales_rollup.record_sale(database, order)
+    await reports.record_sale(database, order, product.get("category"))
+    return APPROVED, order
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+async def backfill(database, batch_size=1000, query=LEGACY_FILTER):
+    """
+    Permanently writes the enriched fields and BSON timestamps onto legacy orders.
+
+    :param query: Which legacy orders to fix; STRING_TIMESTAMPS is served by the
+                  timestamp index, so it is cheap enough to run at every startup
+    """
+    legacy = query
+    updated = 0
+    last_id = None
+    while True:
+        query = legacy if last_id is None else {"$and": [legacy, {"_id": {"$gt": last_id}}]}
+        orders = await database["sales"].find(query).sort("_id", 1).limit(batch_size).to_list(None)
+        if not orders:
+            break
+        last_id = orders[-1]["_id"]
+
+        before = {o["_id"]: dict(o) for o in orders}
+        await enrich_orders(database, orders)
+
+        operations = []
+        for order in orders:
+            changes = {
+                field: order[field]
+                for field in ("product_name", "unit_price", "total_price", "user_name")
+                if order.get(field) is not None and before[order["_id"]].get(field) != order[field]
+            }
+            if isinstance(order.get("timestamp"), str):
+                timestamp = _parse_timestamp(order["timestamp"])
+                if timestamp:
+                    changes["timestamp"] = timestamp
+            if changes:
+                changes["updated_at"] = datetime.utcnow()
+                operations.append(UpdateOne({"_id": order["_id"]}, {"$set": changes}))
+        if operations:
+            result = await database["sales"].bulk_write(operations, ordered=False)
+            updated += result.modified_count
+    return updated
+
+
+async def main(args):
+    from database import db
+
+    if args.command == "backfill":
+        updated = await backfill(db, args.batch_size)
+        print(f"[OK] Backfilled {updated} legacy orders.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Permanently enrich legacy orders")
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Values a cursor may carry; anything else (e.g. a {"$ne": ...} object) is rejected
+CURSOR_TYPES = (str, int, float, bool, type(None), ObjectId, datetime)
+
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$oid" in value:
+        return ObjectId(value["$oid"])
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(values):
+    """Packs the sort key of the last returned document into an opaque token."""
+    payload = [_encode_value(v) for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode().rstrip("=")
+
+
+def invalid_cursor():
+    return HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list):
+            raise ValueError("cursor payload is not a list")
+        values = [_decode_value(v) for v in payload]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise invalid_cursor()
+    if not all(isinstance(v, CURSOR_TYPES) for v in values):
+        raise invalid_cursor()
+    return values
+
+
+def keyset_filter(sort_fields, last_values, descending=False):
+    """
+    Builds the `$or` filter selecting documents strictly after `last_values`
+    in the (sort_fields...) order, e.g. name > n OR (name == n AND _id > id).
+
+    :raises HTTPException: 400 when `last_values` does not match `sort_fields`
+    """
+    if len(last_values) != len(sort_fields):
+        raise invalid_cursor()
+    for field, value in zip(sort_fields, last_values):
+        if not isinstance(value, CURSOR_TYPES) or (field == "_id" and not isinstance(value, ObjectId)):
+            raise invalid_cursor()
+    op = "$lt" if descending else "$gt"
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {f: last_values[j] for j, f in enumerate(sort_fields[:i])}
+        clause[field] = {op: last_values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def parse_fields(fields, allowed):
+    """Turns a comma separated `fields` query parameter into a Mongo projection."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {f: 1 for f in requested}
@@ -0,0 +1,159 @@
+"""
+Reorder recommendations for the whole catalog.
+
+For every product, demand over the lead time is estimated from the forecast
+model's mean daily demand and the day-to-day standard deviation of its sales
+history, then:
+
+    safety stock   = z(service level) * std * sqrt(lead time)
+    reorder point  = mean * lead time + safety stock
+    order-up-to    = mean * (lead time + review period) + z * std * sqrt(lead time + review period)
+    order quantity = order-up-to - current stock, once stock is at or below the reorder point
+
+Lead time and service level come from the product (`lead_time_days`,
+`service_level`) or the REORDER_* defaults. All products are planned in one
+vectorized pass; the demand statistics are computed in the model pool and
+cached for REORDER_STATS_TTL_SECONDS.
+"""
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+
+from cache import TTLCache
+from forecasting import FORECAST_MODEL, HISTORY_DAYS, load_daily_sales
+from workers import demand_stats
+
+DEFAULT_LEAD_TIME_DAYS = float(os.getenv("REORDER_LEAD_TIME_DAYS", "7"))
+DEFAULT_SERVICE_LEVEL = float(os.getenv("REORDER_SERVICE_LEVEL", "0.95"))
+# How often purchase orders go out; an order has to cover demand until the next one arrives
+REVIEW_PERIOD_DAYS = float(os.getenv("REORDER_REVIEW_PERIOD_DAYS", "7"))
+
+PRODUCT_PROJECTION = {"name": 1, "category": 1, "current_stock": 1, "lead_time_days": 1, "service_level": 1}
+CSV_COLUMNS = [
+    "product_id", "product_name", "category", "current_stock", "daily_demand", "demand_std",
+    "lead_time_days", "service_level", "safety_stock", "reorder_point", "order_up_to",
+    "order_quantity", "days_of_cover", "needs_reorder",
+]
+
+stats_cache = TTLCache(maxsize=1, ttl=float(os.getenv("REORDER_STATS_TTL_SECONDS", "300")))
+
+
+async def load_demand_stats(database, pool=None):
+    """
+    Mean and standard deviation of daily demand for every product with sales
+    in the history window.
+
+    :param pool: workers.ModelPool to compute in, or None to compute inline
+    :return: (sorted product ids, mean per day, std per day)
+    """
+    cached = stats_cache.get("all")
+    if cached is not None:
+        return cached
+    today = datetime.utcnow()
+    daily_sales = await load_daily_sales(database, today - timedelta(days=HISTORY_DAYS - 1))
+    args = (
+        [d["product_id"] for d in daily_sales],
+        [d["date"] for d in daily_sales],
+        [d["quantity"] for d in daily_sales],
+        FORECAST_MODEL,
+        HISTORY_DAYS,
+        today.date(),
+    )
+    stats = demand_stats(*args) if pool is None else await pool.run(demand_stats, *args)
+    stats_cache.set("all", stats)
+    return stats
+
+
+def _z_scores(service_levels):
+    """Standard normal quantiles, computed once per distinct service level."""
+    levels, inverse = np.unique(service_levels, return_inverse=True)
+    z = np.array([NormalDist().inv_cdf(level) for level in levels])
+    return z[inverse.ravel()]
+
+
+def plan(products, stats):
+    """
+    :param products: Product documents with at least PRODUCT_PROJECTION fields
+    :param stats: Output of `load_demand_stats`
+    :return: Dict of column name to NumPy array, one entry per product in input order
+    """
+    stat_ids, stat_mean, stat_std = stats
+    ids = np.array([str(p["_id"]) for p in products], dtype=str)
+    stock = np.array([p.get("current_stock") or 0 for p in products], dtype=np.float64)
+    lead = np.array([p.get("lead_time_days") or DEFAULT_LEAD_TIME_DAYS for p in products], dtype=np.float64)
+    service = np.array([p.get("service_level") or DEFAULT_SERVICE_LEVEL for p in products], dtype=np.float64)
+
+    # Products without sales in the window have zero demand
+    mean = np.zeros(len(products))
+    std = np.zeros(len(products))
+    if len(stat_ids):
+        position = np.clip(np.searchsorted(stat_ids, ids), 0, len(stat_ids) - 1)
+        found = stat_ids[position] == ids
+        mean[found] = stat_mean[position[found]]
+        std[found] = stat_std[position[found]]
+
+    z = _z_scores(np.clip(service, 0.5, 0.9999))
+    cover = lead + REVIEW_PERIOD_DAYS
+    safety_stock = np.ceil(z * std * np.sqrt(lead))
+    reorder_point = np.ceil(mean * lead + safety_stock)
+    order_up_to = np.ceil(mean * cover + z * std * np.sqrt(cover))
+    needs_reorder = (stock <= reorder_point) & (order_up_to > stock)
+    days_of_cover = np.full(len(products), np.inf)
+    np.divide(stock, mean, out=days_of_cover, where=mean > 0)
+
+    return {
+        "product_id": ids,
+        "current_stock": stock,
+        "daily_demand": np.round(mean, 2),
+        "demand_std": np.round(std, 2),
+        "lead_time_days": lead,
+        "service_level": service,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "order_up_to": order_up_to,
+        "order_quantity": np.where(needs_reorder, order_up_to - stock, 0),
+        "days_of_cover": np.round(days_of_cover, 1),
+        "needs_reorder": needs_reorder,
+    }
+
+
+def to_rows(products, columns, only_needed=False):
+    """Plan rows as dicts, most urgent (fewest days of cover) first."""
+    order = np.argsort(columns["days_of_cover"], kind="stable")
+    if only_needed:
+        order = order[columns["needs_reorder"][order]]
+    cover = columns["days_of_cover"][order]
+    integer = ("current_stock", "safety_stock", "reorder_point", "order_up_to", "order_quantity")
+    values = {
+        name: (column[order].astype(np.int64) if name in integer else column[order]).tolist()
+        for name, column in columns.items() if name != "days_of_cover"
+    }
+    values["days_of_cover"] = np.where(np.isinf(cover), None, cover).tolist()
+    values["product_name"] = [products[i].get("name") for i in order.tolist()]
+    values["category"] = [products[i].get("category") for i in order.tolist()]
+    return [dict(zip(CSV_COLUMNS, row)) for row in zip(*(values[name] for name in CSV_COLUMNS))]
+
+
+async def build_plan(database, pool=None, only_needed=False):
+    """The `/reorder-plan` rows: one products query, cached demand statistics, one vectorized pass."""
+    products = await database["products"].find({}, PRODUCT_PROJECTION).to_list(None)
+    stats = await load_demand_stats(database, pool)
+    return to_rows(products, plan(products, stats), only_needed)
+
+
+def iter_csv(rows, chunk_rows=1000):
+    """Yields the plan as CSV text in chunks, for a StreamingResponse."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for start in range(0, len(rows), chunk_rows):
+        writer.writerows(rows[start:start + chunk_rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
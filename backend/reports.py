@@ -0,0 +1,256 @@
+"""
+Sales reports served from pre-aggregated cubes (`sales_cubes`).
+
+One document per (grain, dimension, period, key) holds the approved quantity,
+revenue and order count:
+
+    grain      day | week | month   (weeks are keyed by their Monday, months by 'YYYY-MM')
+    dimension  product | category | user
+
+Approving an order updates its nine cells in one bulk write. A report for any
+date range reads whole week/month cells plus day cells for the partial periods
+at either end. Until the cubes have been backfilled from historical sales,
+reports fall back to a `$group` aggregation streamed over raw sales.
+
+Usage:
+    python reports.py backfill    # rebuild every cube from raw sales
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+import sales_rollup
+
+SALES_CUBES = "sales_cubes"
+CUBES_STATE = "sales_cubes_state"
+GRAINS = ("day", "week", "month")
+DIMENSIONS = ("product", "category", "user")
+# Cell key for sales without a category or user
+UNKNOWN_KEY = ""
+
+# Registered in indexes.INDEXES; the unique key also backs `$merge` in `backfill`
+CUBE_INDEXES = [
+    IndexModel([("grain", ASCENDING), ("dim", ASCENDING), ("period", ASCENDING), ("key", ASCENDING)],
+               name="grain_dim_period_key", unique=True),
+]
+CELL_PROJECTION = {"_id": 0, "period": 1, "key": 1, "label": 1, "qty": 1, "revenue": 1, "orders": 1}
+
+
+def period_start(day, grain):
+    """First day of the `grain` period containing `day`."""
+    if grain == "week":
+        return day - timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_period(start, grain):
+    if grain == "week":
+        return start + timedelta(days=7)
+    if grain == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def period_key(day, grain):
+    if grain == "month":
+        return day.strftime("%Y-%m")
+    return period_start(day, grain).isoformat()
+
+
+def _period_expression(grain, day="$day"):
+    """`period_key` as an aggregation expression over a 'YYYY-MM-DD' string."""
+    if grain == "month":
+        return {"$substrBytes": [day, 0, 7]}
+    if grain == "week":
+        date = {"$dateFromString": {"dateString": day, "format": sales_rollup.DAY_FORMAT}}
+        monday = {"$subtract": [date, {"$multiply": [{"$subtract": [{"$isoDayOfWeek": date}, 1]}, 86400000]}]}
+        return {"$dateToString": {"format": sales_rollup.DAY_FORMAT, "date": monday}}
+    return day
+
+
+async def record_sale(database, order, category=None):
+    """Adds an approved order to its day, week and month cells for every dimension."""
+    day = datetime.strptime(sales_rollup.day_key(order["timestamp"]), sales_rollup.DAY_FORMAT).date()
+    amounts = {"qty": order.get("quantity_sold", 0), "revenue": sales_rollup.sale_revenue(order), "orders": 1}
+    keys = {
+        "product": (order.get("product_id"), order.get("product_name")),
+        "category": (category, category),
+        "user": (order.get("user_id"), order.get("user_name")),
+    }
+    operations = []
+    for grain in GRAINS:
+        period = period_key(day, grain)
+        for dim, (key, label) in keys.items():
+            update = {"$inc": amounts}
+            if label:
+                update["$set"] = {"label": label}
+            operations.append(UpdateOne(
+                {"grain": grain, "dim": dim, "period": period, "key": key or UNKNOWN_KEY}, update, upsert=True
+            ))
+    await database[SALES_CUBES].bulk_write(operations, ordered=False)
+
+
+def _raw_pipeline(match, dim, grain):
+    """Groups approved raw sales into cube-shaped cells."""
+    pipeline = [
+        {"$match": {**match, "status": {"$in": sales_rollup.COUNTED_STATUSES}, "product_id": {"$nin": [None, ""]}}},
+        {"$project": {
+            "product_id": 1, "product_name": 1, "user_id": 1, "user_name": 1, "quantity_sold": 1,
+            "revenue": sales_rollup.REVENUE_EXPRESSION, "day": sales_rollup.DAY_EXPRESSION,
+        }},
+    ]
+    sums = {"qty": {"$sum": "$quantity_sold"}, "revenue": {"$sum": "$revenue"}, "orders": {"$sum": 1}}
+    if dim == "category":
+        # Sales don't carry the category: group per product first so the lookup runs once per cell
+        pipeline += [
+            {"$group": {"_id": {"period": _period_expression(grain), "product_id": "$product_id"}, **sums}},
+            {"$lookup": {
+                "from": "products",
+                "let": {"pid": {"$convert": {"input": "$_id.product_id", "to": "objectId", "onError": None, "onNull": None}}},
+                "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$pid"]}}}, {"$project": {"category": 1}}],
+                "as": "product",
+            }},
+            {"$group": {
+                "_id": {"period": "$_id.period",
+                        "key": {"$ifNull": [{"$arrayElemAt": ["$product.category", 0]}, UNKNOWN_KEY]}},
+                "label": {"$first": {"$arrayElemAt": ["$product.category", 0]}},
+                "qty": {"$sum": "$qty"}, "revenue": {"$sum": "$revenue"}, "orders": {"$sum": "$orders"},
+            }},
+        ]
+    else:
+        key, label = ("$product_id", "$product_name") if dim == "product" else ("$user_id", "$user_name")
+        pipeline.append({"$group": {
+            "_id": {"period": _period_expression(grain), "key": {"$ifNull": [key, UNKNOWN_KEY]}},
+            "label": {"$last": label}, **sums,
+        }})
+    pipeline.append({"$project": {"_id": 0, "period": "$_id.period", "key": "$_id.key", "label": 1,
+                                  "qty": 1, "revenue": 1, "orders": 1}})
+    return pipeline
+
+
+def _merge_stage():
+    return {"$merge": {"into": SALES_CUBES, "on": ["grain", "dim", "period", "key"],
+                       "whenMatched": "replace", "whenNotMatched": "insert"}}
+
+
+async def backfill(database):
+    """
+    Rebuilds every cube server-side: day cells from raw sales via `$merge`,
+    then week and month cells from the day cells. Marks the cubes as covering
+    all history, which switches reports over from the raw fallback.
+    """
+    await database[SALES_CUBES].create_indexes(CUBE_INDEXES)
+    await database[SALES_CUBES].delete_many({})
+    for dim in DIMENSIONS:
+        await database["sales"].aggregate(
+            _raw_pipeline({}, dim, "day") + [{"$addFields": {"grain": {"$literal": "day"}, "dim": {"$literal": dim}}}, _merge_stage()],
+            allowDiskUse=True,
+        ).to_list(None)
+    for grain in ("week", "month"):
+        await database[SALES_CUBES].aggregate([
+            {"$match": {"grain": "day"}},
+            {"$group": {
+                "_id": {"dim": "$dim", "period": _period_expression(grain, "$period"), "key": "$key"},
+                "label": {"$last": "$label"},
+                "qty": {"$sum": "$qty"}, "revenue": {"$sum": "$revenue"}, "orders": {"$sum": "$orders"},
+            }},
+            {"$project": {"_id": 0, "grain": {"$literal": grain}, "dim": "$_id.dim", "period": "$_id.period", "key": "$_id.key",
+                          "label": 1, "qty": 1, "revenue": 1, "orders": 1}},
+            _merge_stage(),
+        ], allowDiskUse=True).to_list(None)
+    await database[CUBES_STATE].replace_one(
+        {"_id": "coverage"}, {"_id": "coverage", "backfilled_at": datetime.utcnow()}, upsert=True
+    )
+    return await database[SALES_CUBES].count_documents({})
+
+
+def _accumulate(totals, cell, period):
+    row = totals.get((period, cell["key"]))
+    if row is None:
+        totals[(period, cell["key"])] = {**cell, "period": period}
+        return
+    for field in ("qty", "revenue", "orders"):
+        row[field] += cell[field]
+    row["label"] = row.get("label") or cell.get("label")
+
+
+async def _from_cubes(database, dim, grain, start, end):
+    # Whole periods inside [start, end] come from `grain` cells, the partial ones at the edges from day cells
+    inner_start = start if period_start(start, grain) == start else next_period(period_start(start, grain), grain)
+    inner_stop = next_period(period_start(end, grain), grain)
+    if inner_stop - timedelta(days=1) != end:
+        inner_stop = period_start(end, grain)
+
+    async def cells(cell_grain, first, last):
+        if first > last:
+            return []
+        query = {"grain": cell_grain, "dim": dim, "period": {"$gte": period_key(first, cell_grain),
+                                                             "$lte": period_key(last, cell_grain)}}
+        return await database[SALES_CUBES].find(query, CELL_PROJECTION).to_list(None)
+
+    day = timedelta(days=1)
+    if inner_start < inner_stop:
+        edges = [(start, inner_start - day), (inner_stop, end)]
+    else:
+        inner_start = inner_stop = start
+        edges = [(start, end)]
+    inner, *edge_cells = await asyncio.gather(
+        cells(grain, inner_start, inner_stop - day), *(cells("day", first, last) for first, last in edges)
+    )
+
+    totals = {(cell["period"], cell["key"]): cell for cell in inner}
+    for day_cells in edge_cells:
+        for cell in day_cells:
+            _accumulate(totals, cell, period_key(datetime.strptime(cell["period"], sales_rollup.DAY_FORMAT).date(), grain))
+    return list(totals.values())
+
+
+async def _from_sales(database, dim, grain, start, end):
+    match = sales_rollup.timestamp_range(start.isoformat(), (end + timedelta(days=1)).isoformat())
+    cursor = database["sales"].aggregate(_raw_pipeline(match, dim, grain), allowDiskUse=True, batchSize=1000)
+    return [row async for row in cursor]
+
+
+async def sales_report(database, dim, grain, start, end, source=None):
+    """
+    :param dim: One of DIMENSIONS
+    :param grain: One of GRAINS
+    :param start: First day (date) of the range
+    :param end: Last day (date) of the range, inclusive
+    :param source: 'cubes' or 'sales' to force one; by default cubes once they are backfilled
+    :return: Report dict with one row per period and key, ordered by period then key
+    """
+    if source is None:
+        source = "cubes" if await database[CUBES_STATE].find_one({"_id": "coverage"}) else "sales"
+    rows = await (_from_cubes if source == "cubes" else _from_sales)(database, dim, grain, start, end)
+    rows.sort(key=lambda r: (r["period"], r["key"]))
+    for row in rows:
+        row["revenue"] = round(row["revenue"], 2)
+    return {
+        "group_by": dim,
+        "period": grain,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source": source,
+        "totals": {field: round(sum(r[field] for r in rows), 2) for field in ("qty", "revenue", "orders")},
+        "rows": rows,
+    }
+
+
+async def main(args):
+    from database import db
+
+    if args.command == "backfill":
+        count = await backfill(db)
+        print(f"[OK] Rebuilt {count} cells in '{SALES_CUBES}'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Rebuild every cube from raw sales")
+    asyncio.run(main(parser.parse_args()))
@@ -1,29 +1,32 @@
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+import catalog
+from database import connected, current_settings
+from forecasting import FORECAST_RUNS_COLLECTION, FORECASTS_COLLECTION
+from reports import CUBES_STATE, SALES_CUBES
+from sales_rollup import ROLLUP_COLLECTION
+from sync import TOMBSTONES
 
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = "small_shop_inventory"
 
 async def reset_database():
-    print(f"Connecting to {MONGODB_URL}...")
-    client = AsyncIOMotorClient(MONGODB_URL)
-    db = client[DATABASE_NAME]
-    
-    # Collections to clear
-    collections = ["products", "sales", "stock"]
-    
-    for collection in collections:
-        count = await db[collection].count_documents({})
-        print(f"Deleting {count} documents from '{collection}'...")
-        await db[collection].delete_many({})
-        print(f"Collection '{collection}' is now empty.")
-    
-    print("\n[OK] Database cleanup complete! All stock and sales data removed.")
-    client.close()
+    async with connected() as db:
+        print(f"Connecting to {current_settings().mongodb_url}...")
+
+        # Collections to clear, including everything derived from sales so no
+        # rollups, cubes, forecasts or sync tombstones outlive the data
+        collections = [
+            "products", "sales", "stock", ROLLUP_COLLECTION, SALES_CUBES, CUBES_STATE,
+            FORECASTS_COLLECTION, FORECAST_RUNS_COLLECTION, TOMBSTONES,
+        ]
+
+        for collection in collections:
+            count = await db[collection].count_documents({})
+            print(f"Deleting {count} documents from '{collection}'...")
+            await db[collection].delete_many({})
+            print(f"Collection '{collection}' is now empty.")
+        await catalog.bump(db)
+
+        print("\n[OK] Database cleanup complete! All stock and sales data removed.")
 
 if __name__ == "__main__":
     asyncio.run(reset_database())
@@ -0,0 +1,66 @@
+"""
+JSON responses rendered straight from MongoDB documents with orjson.
+
+A handler returning plain dicts goes through `jsonable_encoder` (a recursive
+Python walk over every value) and `json.dumps`; one with a `response_model`
+also validates every row. Documents this API has just read from MongoDB need
+neither: `FastJSONResponse` encodes ObjectId, datetime and numpy values in
+orjson's C encoder.
+
+Handlers that declare a response_model and return plain objects keep FastAPI's
+own Pydantic `dump_json` path, which is fast already. Don't make this the app's
+default_response_class, since that turns the `dump_json` path off.
+"""
+import os
+from decimal import Decimal
+from functools import lru_cache
+from typing import List
+
+import orjson
+from bson import Decimal128, ObjectId
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+# Validate DB reads against their response model anyway, e.g. while migrating a schema
+VALIDATE_DB_RESPONSES = os.getenv("VALIDATE_DB_RESPONSES", "false").lower() == "true"
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        # What jsonable_encoder does
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for BSON documents; NaN and infinity become null instead of raising."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model):
+    return TypeAdapter(List[model])
+
+
+def db_response(documents, model=None, status_code=200, headers=None):
+    """
+    Trusted documents from MongoDB as a JSON array, without revalidating them.
+
+    :param model: Response model checked only when VALIDATE_DB_RESPONSES is on
+    """
+    if model is not None and VALIDATE_DB_RESPONSES:
+        adapter = _list_adapter(model)
+        body = adapter.dump_json(adapter.validate_python(documents), by_alias=True)
+        return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+    return FastJSONResponse(documents, status_code=status_code, headers=headers)
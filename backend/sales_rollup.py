@@ -0,0 +1,166 @@
+"""
+Materialized daily sales rollup (`sales_daily`): one document per product and day
+holding the approved quantity and revenue, maintained incrementally on order approval.
+
+Usage:
+    python sales_rollup.py backfill [--since YYYY-MM-DD]   # rebuild from raw sales
+    python sales_rollup.py check --day YYYY-MM-DD          # diff a day against raw sales
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel
+
+ROLLUP_COLLECTION = "sales_daily"
+DAY_FORMAT = "%Y-%m-%d"
+
+# Registered in indexes.INDEXES; the unique key also backs `$merge` in `backfill`
+ROLLUP_INDEXES = [
+    IndexModel([("product_id", ASCENDING), ("day", ASCENDING)], name="product_day_unique", unique=True),
+    IndexModel([("day", ASCENDING)], name="day"),
+]
+
+# Sales recorded before the approval workflow have no status and count as completed
+COUNTED_STATUSES = ["approved", None]
+
+# 'YYYY-MM-DD' of a sale's timestamp, whether stored as a BSON date or as the ISO
+# string written by `jsonable_encoder` in `record_sale`
+DAY_EXPRESSION = {"$cond": [
+    {"$eq": [{"$type": "$timestamp"}, "string"]},
+    {"$substrBytes": ["$timestamp", 0, 10]},
+    {"$dateToString": {"format": DAY_FORMAT, "date": "$timestamp"}},
+]}
+REVENUE_EXPRESSION = {"$ifNull": [
+    "$total_price",
+    {"$multiply": [{"$ifNull": ["$unit_price", 0]}, "$quantity_sold"]},
+]}
+
+
+def day_key(timestamp):
+    """Returns the 'YYYY-MM-DD' bucket for a datetime or an ISO formatted string."""
+    if isinstance(timestamp, str):
+        return timestamp[:10]
+    return timestamp.strftime(DAY_FORMAT)
+
+
+def sale_revenue(order):
+    return order.get("total_price") or (order.get("unit_price") or 0) * order.get("quantity_sold", 0)
+
+
+async def record_sale(database, order):
+    """Adds an approved order to its product/day bucket."""
+    quantity = order.get("quantity_sold", 0)
+    revenue = sale_revenue(order)
+    await database[ROLLUP_COLLECTION].update_one(
+        {"product_id": order["product_id"], "day": day_key(order["timestamp"])},
+        {"$inc": {"qty": quantity, "revenue": revenue}},
+        upsert=True,
+    )
+
+
+async def load_daily_rows(database, since_day, product_ids=None):
+    """Returns rollup rows with `day >= since_day`, optionally limited to some products."""
+    query = {"day": {"$gte": since_day}}
+    if product_ids is not None:
+        query["product_id"] = {"$in": list(product_ids)}
+    projection = {"_id": 0, "product_id": 1, "day": 1, "qty": 1, "revenue": 1}
+    return await database[ROLLUP_COLLECTION].find(query, projection).to_list(None)
+
+
+def _raw_rollup_pipeline(match):
+    """Aggregates raw sales into rollup-shaped documents."""
+    return [
+        {"$match": {**match, "status": {"$in": COUNTED_STATUSES}, "product_id": {"$nin": [None, ""]}}},
+        {
+            "$project": {
+                "product_id": 1,
+                "quantity_sold": 1,
+                "revenue": REVENUE_EXPRESSION,
+                "day": DAY_EXPRESSION,
+            }
+        },
+        {
+            "$group": {
+                "_id": {"product_id": "$product_id", "day": "$day"},
+                "qty": {"$sum": "$quantity_sold"},
+                "revenue": {"$sum": "$revenue"},
+            }
+        },
+        {"$project": {"_id": 0, "product_id": "$_id.product_id", "day": "$_id.day", "qty": 1, "revenue": 1}},
+    ]
+
+
+def timestamp_range(start_day, end_day=None):
+    """Matches sales timestamps in [start_day, end_day) whether stored as dates or strings."""
+    start = datetime.strptime(start_day, DAY_FORMAT)
+    date_range, string_range = {"$gte": start}, {"$gte": start_day}
+    if end_day:
+        date_range["$lt"] = datetime.strptime(end_day, DAY_FORMAT)
+        string_range["$lt"] = end_day
+    return {"$or": [{"timestamp": date_range}, {"timestamp": string_range}]}
+
+
+async def aggregate_raw(database, start_day, end_day=None):
+    """Rollup-shaped rows computed directly from raw sales in [start_day, end_day)."""
+    return await database["sales"].aggregate(_raw_rollup_pipeline(timestamp_range(start_day, end_day))).to_list(None)
+
+
+async def backfill(database, since_day=None):
+    """Rebuilds the rollup from raw sales, entirely server-side via `$merge`."""
+    await database[ROLLUP_COLLECTION].create_indexes(ROLLUP_INDEXES)
+    since_day = since_day or "0001-01-01"
+    await database[ROLLUP_COLLECTION].delete_many({"day": {"$gte": since_day}})
+    pipeline = _raw_rollup_pipeline(timestamp_range(since_day)) + [
+        {"$merge": {
+            "into": ROLLUP_COLLECTION,
+            "on": ["product_id", "day"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }}
+    ]
+    await database["sales"].aggregate(pipeline).to_list(None)
+    return await database[ROLLUP_COLLECTION].count_documents({"day": {"$gte": since_day}})
+
+
+async def check_day(database, day):
+    """
+    Rebuilds one day from raw sales and diffs it against the rollup.
+
+    :return: List of {'product_id', 'expected', 'actual'} entries that disagree
+    """
+    next_day = (datetime.strptime(day, DAY_FORMAT) + timedelta(days=1)).strftime(DAY_FORMAT)
+    raw = await aggregate_raw(database, day, next_day)
+    expected = {r["product_id"]: (r["qty"], round(r["revenue"], 2)) for r in raw}
+    stored = await database[ROLLUP_COLLECTION].find({"day": day}).to_list(None)
+    actual = {r["product_id"]: (r["qty"], round(r["revenue"], 2)) for r in stored}
+
+    diffs = []
+    for product_id in sorted(set(expected) | set(actual)):
+        if expected.get(product_id) != actual.get(product_id):
+            diffs.append({"product_id": product_id, "expected": expected.get(product_id), "actual": actual.get(product_id)})
+    return diffs
+
+
+async def main(args):
+    from database import db
+
+    if args.command == "backfill":
+        count = await backfill(db, args.since)
+        print(f"[OK] Rebuilt {count} rollup rows in '{ROLLUP_COLLECTION}'.")
+    elif args.command == "check":
+        diffs = await check_day(db, args.day)
+        if not diffs:
+            print(f"[OK] Rollup for {args.day} matches raw sales.")
+        for d in diffs:
+            print(f"[MISMATCH] product {d['product_id']}: raw (qty, revenue)={d['expected']} rollup={d['actual']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Rebuild the rollup from raw sales")
+    backfill_parser.add_argument("--since", help="Only rebuild days on or after YYYY-MM-DD")
+    check_parser = subparsers.add_parser("check", help="Diff one day of the rollup against raw sales")
+    check_parser.add_argument("--day", required=True, help="Day to check, YYYY-MM-DD")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,150 @@
+"""
+Minimal in-process job scheduler started from the FastAPI lifespan.
+
+Each job runs on its own interval and can be triggered early (e.g. after a
+large stock upload); triggers that arrive while a run is in progress collapse
+into a single follow-up run. Failures are logged and retried on the next tick.
+
+With several workers every process has its own scheduler; a `MongoLease`
+makes each periodic tick run in only one of them. Triggered runs stay local to
+the worker that saw the write.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, interval_seconds, run_at_start):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.run_at_start = run_at_start
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.running = False
+        self.last_started_at = None
+        self.last_duration_seconds = None
+        self.last_error = None
+
+
+class MongoLease:
+    """Time-based lease per job name, shared by every worker using the database."""
+
+    def __init__(self, database, owner, collection="scheduler_leases"):
+        self.database = database
+        self.owner = owner
+        self.collection = collection
+
+    async def acquire(self, name, seconds):
+        """
+        :return: True if no other worker holds `name`; it is then held for `seconds`
+        """
+        now = datetime.utcnow()
+        try:
+            # Matches only an expired lease; otherwise the upsert collides with the held one
+            await self.database[self.collection].update_one(
+                {"_id": name, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=seconds), "owner": self.owner}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+
+class Scheduler:
+    def __init__(self, lease=None):
+        self.jobs = {}
+        self.lease = lease
+
+    def add_job(self, name, func, interval_seconds, run_at_start=True):
+        """
+        :param func: Coroutine function taking no arguments
+        :param interval_seconds: Delay between runs; 0 runs the job only when triggered
+        """
+        self.jobs[name] = Job(name, func, interval_seconds, run_at_start)
+
+    def start(self):
+        for job in self.jobs.values():
+            if job.task is None:
+                job.task = asyncio.create_task(self._loop(job))
+
+    async def stop(self):
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs.values():
+            job.task = None
+
+    def trigger(self, name):
+        """Asks for a run as soon as the current one (if any) finishes."""
+        self.jobs[name].wakeup.set()
+
+    async def _loop(self, job):
+        triggered = False
+        if not job.run_at_start:
+            triggered = await self._wait(job)
+        while True:
+            job.wakeup.clear()
+            await self._run(job, triggered)
+            triggered = await self._wait(job)
+
+    async def _wait(self, job):
+        """:return: True if woken by `trigger`, False on the interval tick"""
+        timeout = job.interval_seconds or None
+        try:
+            await asyncio.wait_for(job.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run(self, job, triggered=False):
+        if self.lease is not None and not triggered and job.interval_seconds:
+            try:
+                # Held for most of the interval so this worker's next tick can take it again
+                acquired = await self.lease.acquire(job.name, job.interval_seconds * 0.9)
+            except Exception as e:
+                logger.warning("job lease unavailable", extra={"job": job.name, "error": repr(e)})
+                acquired = False
+            if not acquired:
+                job.skipped += 1
+                return
+        job.running = True
+        job.last_started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            logger.exception("scheduled job failed", extra={"job": job.name})
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration_seconds = time.perf_counter() - start
+
+    def stats(self):
+        return {
+            name: {
+                "interval_seconds": job.interval_seconds,
+                "running": job.running,
+                "runs": job.runs,
+                "skipped": job.skipped,
+                "failures": job.failures,
+                "last_started_at": job.last_started_at,
+                "last_duration_seconds": job.last_duration_seconds,
+                "last_error": job.last_error,
+            }
+            for name, job in self.jobs.items()
+        }
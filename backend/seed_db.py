@@ -1,8 +1,10 @@
 import asyncio
 from datetime import datetime, timedelta
 import random
+from backend import catalog
 from backend.database import db
 from backend.models import ProductModel, SaleModel
+from backend.sales_rollup import backfill
 from fastapi.encoders import jsonable_encoder
 
 async def seed_data():
@@ -29,6 +31,7 @@ async def seed_data():
         # Note: We let MongoDB generate the _id by removing the None id
         if "id" in encoded_product: del encoded_product["id"]
         if "_id" in encoded_product: del encoded_product["_id"]
+        encoded_product["updated_at"] = datetime.utcnow()
         
         result = await db["products"].insert_one(encoded_product)
         product_ids.append(str(result.inserted_id))
@@ -46,9 +49,16 @@ async def seed_data():
             sale = {
                 "product_id": pid,
                 "quantity_sold": quantity,
-                "timestamp": timestamp
+                "timestamp": timestamp,
+                "updated_at": timestamp
             }
             await db["sales"].insert_one(sale)
+
+    await catalog.bump(db)
+
+    # 4. Rebuild the daily rollup that forecasting reads from
+    rows = await backfill(db)
+    print(f"Rebuilt {rows} daily sales rollup rows.")
     
     print("Seeding complete! Database is ready.")
 
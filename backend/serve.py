@@ -0,0 +1,61 @@
+"""
+Production launcher: one uvicorn worker process per core behind a shared port.
+
+Usage:
+    python serve.py                      # WEB_CONCURRENCY or one worker per usable core
+    python serve.py --workers 4 --port 8080
+
+Workers share nothing in memory, so with more than one the launcher defaults
+EVENT_BACKEND to `mongo`: order events and cache invalidations then go through
+MongoDB and reach every worker (and every host running serve.py against the
+same database), and periodic jobs take a lease so each tick runs once. Set
+EVENT_BACKEND explicitly on every host of a multi-node deployment.
+
+Per-worker pools are sized down so the host isn't oversubscribed: unless set,
+MODEL_POOL_WORKERS becomes half the cores divided by the worker count. Each
+worker opens its own MongoDB pool, so the server sees up to
+workers x MONGO_MAX_POOL_SIZE connections.
+"""
+import argparse
+import logging
+import os
+
+import uvicorn
+
+from logs import configure
+
+logger = logging.getLogger(__name__)
+
+
+def usable_cores():
+    # Respects taskset/cgroup CPU pinning where the platform exposes it
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main(args):
+    configure()
+    cores = usable_cores()
+    workers = args.workers or int(os.getenv("WEB_CONCURRENCY", "0")) or cores
+    if workers > 1:
+        # Read by each worker process at import time
+        os.environ.setdefault("EVENT_BACKEND", "mongo")
+        os.environ.setdefault("MODEL_POOL_WORKERS", str(max(1, cores // 2 // workers)))
+    logger.info("starting", extra={
+        "workers": workers, "cores": cores, "event_backend": os.getenv("EVENT_BACKEND", "memory"),
+    })
+    # An import string, not the app object: each worker imports main itself
+    uvicorn.run(
+        "main:app", host=args.host, port=args.port, workers=workers,
+        log_level=os.getenv("LOG_LEVEL", "info").lower(), access_log=args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=0, help="Default: WEB_CONCURRENCY, else one per core")
+    parser.add_argument("--access-log", action="store_true", help="uvicorn access log (costs throughput)")
+    main(parser.parse_args())
@@ -0,0 +1,153 @@
+"""
+Streaming bulk stock ingest for `POST /stock/bulk`.
+
+Delivery manifests arrive as CSV (header row with product_name, category,
+quantity, price) or NDJSON (one StockModel object per line). Rows are parsed
+and validated as the body streams in and applied in batches with `bulk_write`,
+so memory stays bounded by the batch size regardless of manifest length.
+"""
+import csv
+import json
+from datetime import datetime
+
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+
+from models import StockModel
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def _decode(line, first):
+    """Text of one line, or the UnicodeDecodeError so only that row is rejected."""
+    try:
+        return line.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+    except UnicodeDecodeError as e:
+        return e
+
+
+async def iter_lines(chunks):
+    """Re-assembles an async stream of byte chunks into decoded text lines."""
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield _decode(line, first)
+            first = False
+    if buffer:
+        yield _decode(buffer, first)
+
+
+async def iter_records(chunks, fmt):
+    """Yields (line number, dict or parse error) for each non-blank data line."""
+    header = None
+    line_number = 0
+    async for line in iter_lines(chunks):
+        line_number += 1
+        if isinstance(line, UnicodeDecodeError):
+            yield line_number, ValueError(f"Invalid UTF-8: {line.reason} at byte {line.start}")
+            continue
+        if not line.strip():
+            continue
+        try:
+            if fmt == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [h.strip() for h in values]
+                    continue
+                yield line_number, dict(zip(header, values))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Each line must be a JSON object")
+                yield line_number, record
+        except (csv.Error, ValueError) as e:
+            yield line_number, e
+
+
+def _error_detail(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+async def _apply_batch(database, batch):
+    """Logs the rows to `stock` and upserts products by name, one bulk_write each."""
+    uploaded_at = datetime.utcnow()
+    merged = {}
+    for stock in batch:
+        entry = merged.setdefault(stock.product_name, {"category": stock.category, "quantity": 0})
+        entry["quantity"] += stock.quantity
+        entry["price"] = stock.price  # Last price in the manifest wins, as with sequential uploads
+
+    await database["stock"].bulk_write([
+        InsertOne({
+            "product_name": s.product_name,
+            "category": s.category,
+            "quantity": s.quantity,
+            "price": s.price,
+            "uploaded_at": uploaded_at,
+        })
+        for s in batch
+    ], ordered=False)
+
+    result = await database["products"].bulk_write([
+        UpdateOne(
+            {"name": name},
+            {
+                "$inc": {"current_stock": entry["quantity"]},
+                "$set": {"price": entry["price"], "updated_at": uploaded_at},
+                "$setOnInsert": {"category": entry["category"], "low_stock_threshold": 10},
+            },
+            upsert=True,
+        )
+        for name, entry in merged.items()
+    ], ordered=False)
+
+    touched = await database["products"].find({"name": {"$in": list(merged)}}, {"_id": 1}).to_list(None)
+    return result.upserted_count, result.matched_count, [p["_id"] for p in touched]
+
+
+async def ingest(database, chunks, fmt="csv", batch_size=BATCH_SIZE, on_products_touched=None):
+    """
+    Streams a manifest into the database.
+
+    :param chunks: Async iterable of raw body bytes
+    :param fmt: 'csv' or 'ndjson'
+    :param on_products_touched: Optional coroutine function receiving product ids after each batch
+    :return: Summary with per-row error report (capped at MAX_REPORTED_ERRORS entries)
+    """
+    summary = {"rows": 0, "applied": 0, "products_created": 0, "products_updated": 0,
+               "error_count": 0, "errors": []}
+    batch = []
+
+    async def flush():
+        created, updated, product_ids = await _apply_batch(database, batch)
+        summary["applied"] += len(batch)
+        summary["products_created"] += created
+        summary["products_updated"] += updated
+        if on_products_touched:
+            await on_products_touched(product_ids)
+        batch.clear()
+
+    async for line_number, record in iter_records(chunks, fmt):
+        summary["rows"] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            batch.append(StockModel(**record))
+        except (ValidationError, ValueError, TypeError) as e:
+            summary["error_count"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"line": line_number, "error": _error_detail(e)})
+            continue
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    summary["errors_truncated"] = summary["error_count"] > len(summary["errors"])
+    return summary
@@ -0,0 +1,76 @@
+"""
+Concurrency stress test for order approval: many pending orders competing for
+too little stock, each approved by several "admins" at once. Asserts that stock
+never goes below zero, no order is approved twice and the daily rollup matches.
+
+Usage:
+    python stress_approval.py [--orders 500] [--stock 300] [--admins 4] [--rounds 3]
+
+Writes to a separate `small_shop_bench` database and drops it afterwards.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime
+
+from bson import ObjectId
+
+import orders
+from bench_prediction import BENCH_DATABASE_NAME
+from database import connected
+from sales_rollup import ROLLUP_COLLECTION
+
+
+async def run_round(database, n_orders, stock, admins, rng):
+    for name in ("products", "sales", ROLLUP_COLLECTION):
+        await database[name].delete_many({})
+    product_id = ObjectId()
+    await database["products"].insert_one({"_id": product_id, "name": "Contended", "category": "Stress",
+                                           "price": 1.0, "current_stock": stock, "low_stock_threshold": 0})
+    sale_docs = [{"product_id": str(product_id), "product_name": "Contended", "quantity_sold": rng.randint(1, 3),
+                  "unit_price": 1.0, "status": "pending", "timestamp": datetime.utcnow()} for _ in range(n_orders)]
+    result = await database["sales"].insert_many(sale_docs)
+    order_ids = [str(i) for i in result.inserted_ids]
+
+    # Every admin tries to approve every order, in a different order, all at once
+    attempts = []
+    for _ in range(admins):
+        shuffled = order_ids[:]
+        rng.shuffle(shuffled)
+        attempts.extend(shuffled)
+    outcomes = await asyncio.gather(*(orders.approve(database, order_id) for order_id in attempts))
+    tally = Counter(outcome for outcome, _ in outcomes)
+
+    product = await database["products"].find_one({"_id": product_id})
+    approved = await database["sales"].find({"status": "approved"}).to_list(None)
+    approved_qty = sum(o["quantity_sold"] for o in approved)
+    rollup = await database[ROLLUP_COLLECTION].find({"product_id": str(product_id)}).to_list(None)
+
+    assert product["current_stock"] >= 0, f"stock went negative: {product['current_stock']}"
+    assert tally[orders.APPROVED] == len(approved), f"{tally[orders.APPROVED]} approvals for {len(approved)} orders"
+    assert stock - product["current_stock"] == approved_qty, "stock decrement does not match approved orders"
+    assert sum(r["qty"] for r in rollup) == approved_qty, "rollup does not match approved orders"
+    return product["current_stock"], len(approved), tally
+
+
+async def main(args):
+    async with connected(mongo_max_pool_size=200, database_name=BENCH_DATABASE_NAME) as database:
+        rng = random.Random(args.seed)
+        try:
+            for i in range(args.rounds):
+                remaining, approved, tally = await run_round(database, args.orders, args.stock, args.admins, rng)
+                print(f"round {i + 1}: {approved} orders approved, stock left {remaining}, outcomes {dict(tally)}")
+            print("[OK] Stock never went negative and no order was approved twice.")
+        finally:
+            await database.client.drop_database(BENCH_DATABASE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--admins", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    asyncio.run(main(parser.parse_args()))
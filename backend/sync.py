@@ -0,0 +1,131 @@
+"""
+Incremental "changes since" sync for products and orders.
+
+Every write to `products` and `sales` stamps `updated_at`; deletes leave a
+tombstone. `changes_since` walks each collection by (updated_at, _id) from an
+opaque cursor, so a client that has synced once only downloads what changed.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+
+import catalog
+from pagination import decode_cursor, encode_cursor, invalid_cursor, keyset_filter
+
+TOMBSTONES = "tombstones"
+# Tombstones expire after this long (TTL index); older cursors must resync fully
+TOMBSTONE_RETENTION = timedelta(days=30)
+# Re-read this much recent history once a collection is drained, so writes that
+# were stamped just before a sync but committed just after it are not missed
+OVERLAP = timedelta(seconds=2)
+SYNC_SORT = ["updated_at", "_id"]
+SYNC_INDEX = [("updated_at", ASCENDING), ("_id", ASCENDING)]
+TOMBSTONE_INDEXES = [
+    IndexModel(SYNC_INDEX, name="updated_at_id"),
+    IndexModel([("updated_at", ASCENDING)], name="expiry",
+               expireAfterSeconds=int(TOMBSTONE_RETENTION.total_seconds())),
+]
+_MIN_ID = ObjectId("0" * 24)
+# Position for a page ending on a document written before stamping existed
+_EPOCH = datetime(1970, 1, 1)
+
+SYNCED = ("products", "orders", "deleted")
+
+
+def now():
+    return datetime.utcnow()
+
+
+async def record_deletion(database, collection, doc_id):
+    await database[TOMBSTONES].insert_one({"collection": collection, "doc_id": str(doc_id), "updated_at": now()})
+
+
+def _scope(name, user):
+    """Non-admins only see their own orders and product deletions."""
+    if user is None or user.get("role") == "admin":
+        return {}
+    if name == "orders":
+        return {"user_id": str(user["_id"])}
+    if name == "deleted":
+        return {"collection": "products"}
+    return {}
+
+
+async def _page(database, collection, query, position, limit):
+    if position:
+        after = keyset_filter(SYNC_SORT, position)
+        query = {"$and": [query, after]} if query else after
+    docs = await database[collection].find(query).sort([(f, 1) for f in SYNC_SORT]).limit(limit + 1).to_list(None)
+    return docs[:limit], len(docs) > limit
+
+
+async def changes_since(database, cursor=None, user=None, limit=500):
+    """
+    :param cursor: Token from a previous call, or None for a full initial sync
+    :return: {'products', 'orders', 'deleted', 'cursor', 'has_more', 'reset'}
+    """
+    started = now()
+    positions = {name: None for name in SYNCED}
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2 * len(SYNCED) or not all(isinstance(v, datetime) and v.tzinfo is None for v in values[::2]):
+            raise invalid_cursor()
+        positions = {name: values[2 * i:2 * i + 2] for i, name in enumerate(SYNCED)}
+        # Only deletions can be lost: products and orders are still there to
+        # page through however old their updated_at is, but tombstones older
+        # than the retention have expired
+        if started - positions["deleted"][0] > TOMBSTONE_RETENTION:
+            return {"reset": True, "products": [], "orders": [], "deleted": [], "cursor": None, "has_more": False}
+
+    collections = {"products": "products", "orders": "sales", "deleted": TOMBSTONES}
+    result = {"reset": False, "has_more": False}
+    next_positions = []
+    for name in SYNCED:
+        docs, more = await _page(database, collections[name], _scope(name, user), positions[name], limit)
+        if more:
+            result["has_more"] = True
+            next_positions += [docs[-1].get("updated_at", _EPOCH), docs[-1]["_id"]]
+        else:
+            next_positions += [started - OVERLAP, _MIN_ID]
+
+        if name == "deleted":
+            result[name] = [{"collection": d["collection"], "id": d["doc_id"]} for d in docs]
+        else:
+            for doc in docs:
+                doc["_id"] = str(doc["_id"])
+            result[name] = docs
+
+    result["cursor"] = encode_cursor(next_positions)
+    return result
+
+
+async def backfill(database):
+    """Stamps `updated_at` on documents written before stamping existed."""
+    stamped = now()
+    missing = {"updated_at": {"$exists": False}}
+    products = await database["products"].update_many(missing, {"$set": {"updated_at": stamped}})
+    # Orders keep their own timestamp where it is already a BSON date
+    orders = await database["sales"].update_many(missing, [{"$set": {"updated_at": {
+        "$cond": [{"$eq": [{"$type": "$timestamp"}, "date"]}, "$timestamp", stamped]},
+    }}])
+    if products.modified_count:
+        await catalog.bump(database)
+    return products.modified_count, orders.modified_count
+
+
+async def main(args):
+    from database import db
+
+    if args.command == "backfill":
+        products, orders = await backfill(db)
+        print(f"[OK] Stamped updated_at on {products} products and {orders} orders.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Stamp updated_at on pre-existing products and orders")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Process pool for CPU-bound model fitting, so NumPy/pandas work never runs on
+the event loop. Jobs are plain top-level functions so they can be pickled to
+the worker processes; `ai_engine` is only imported inside the workers.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def fit_forecasts(product_ids, dates, quantities, days_to_predict, model, history_days, end_date):
+    """Runs in a worker: StockPredictor.forecast_batch over the given daily sales."""
+    from ai_engine import StockPredictor
+    return StockPredictor().forecast_batch(
+        product_ids, dates, quantities,
+        days_to_predict=days_to_predict, model=model, history_days=history_days, end_date=end_date,
+    )
+
+
+def demand_stats(product_ids, dates, quantities, model, history_days, end_date, horizon=7):
+    """
+    Runs in a worker: mean daily demand (from the forecast model over the next
+    `horizon` days) and the standard deviation of daily demand over the history.
+
+    :return: (sorted product ids, mean per day, std per day) as NumPy arrays
+    """
+    import numpy as np
+    from ai_engine import daily_matrix, get_forecaster
+    if len(product_ids) == 0:
+        return np.array([], dtype=str), np.zeros(0), np.zeros(0)
+    unique_ids, series, first_day = daily_matrix(product_ids, dates, quantities, history_days, end_date)
+    mean = get_forecaster(model).forecast(series, horizon, first_day) / horizon
+    return unique_ids, mean, series.std(axis=1, ddof=1)
+
+
+def warm_up():
+    """Worker initializer: pays the ai_engine import and first-fit costs before any request does."""
+    from ai_engine import StockPredictor
+    StockPredictor().forecast_batch(["warm-up"] * 2, ["2024-01-01", "2024-01-02"], [1, 1], history_days=2)
+
+
+def _worker_pid():
+    time.sleep(0.05)  # Hold the worker briefly so the other probes land on other workers
+    return os.getpid()
+
+
+class ModelPool:
+    """
+    :param max_workers: Worker processes (default: half the CPUs, at least one)
+    :param warm: Run `warm_up` in each worker as it starts
+    """
+
+    def __init__(self, max_workers=None, warm=True):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.warm = warm
+        self.warm_up_seconds = None
+        self._executor = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and driver threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up if self.warm else None,
+            )
+
+    async def warm_up(self, max_rounds=5):
+        """Starts every worker process and waits until each has finished its initializer."""
+        start = time.perf_counter()
+        self.start()
+        ready = set()
+        for _ in range(max_rounds):
+            ready.update(await asyncio.gather(*(self.run(_worker_pid) for _ in range(self.max_workers))))
+            if len(ready) >= self.max_workers:
+                break
+        self.warm_up_seconds = time.perf_counter() - start
+        return self.warm_up_seconds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, func, *args):
+        self.start()
+        self.submitted += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "running": self._executor is not None,
+            "warm_up_seconds": self.warm_up_seconds,
+            "in_flight": self.submitted - self.completed - self.failed,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -213,8 +213,8 @@ function initChat() {
     closeBtn.onclick = () => chatWindow.classList.remove('active');
 
     const formatAIText = (text) => {
-        // Remove DeepSeek thinking blocks if present
-        let cleaned = text.replace(/<think>[\s\S]*?<\/think>/g, '').trim();
+        // Remove DeepSeek thinking blocks if present, including one still streaming in
+        let cleaned = text.replace(/<think>[\s\S]*?(<\/think>|$)/g, '').trim();
 
         // Handle basic bolding: **text** -> <strong>text</strong>
         cleaned = cleaned.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
@@ -264,22 +264,44 @@ function initChat() {
         sendBtn.disabled = true;
 
         try {
+            // Signed-in users get answers grounded in their shop's inventory
+            const headers = { 'Content-Type': 'application/json' };
+            const token = localStorage.getItem('token');
+            if (token) headers['Authorization'] = `Bearer ${token}`;
+
             const response = await fetch(CHAT_CONFIG.endpoint, {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
+                headers,
                 body: JSON.stringify({ message: text })
             });
 
-            const data = await response.json();
-            typing.remove();
+            if (!response.ok || !response.body) {
+                typing.remove();
+                addMessage("I'm sorry, I'm having trouble connecting right now. Please try again later.", 'ai');
+                console.error("Chat Error:", response.status, await response.text());
+                return;
+            }
 
-            if (data.choices && data.choices[0]) {
-                addMessage(data.choices[0].message.content, 'ai');
-            } else {
+            // Render the answer incrementally as tokens stream in
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let answer = '';
+            let msgDiv = null;
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                answer += decoder.decode(value, { stream: true });
+                if (!msgDiv) {
+                    typing.remove();
+                    msgDiv = addMessage(answer, 'ai');
+                } else {
+                    msgDiv.innerHTML = formatAIText(answer);
+                    messages.scrollTop = messages.scrollHeight;
+                }
+            }
+            if (!msgDiv) {
+                typing.remove();
                 addMessage("I'm sorry, I'm having trouble connecting right now. Please try again later.", 'ai');
-                console.error("Chat Error:", data);
             }
         } catch (err) {
             typing.remove();
@@ -15,6 +15,36 @@ function getHeaders() {
     };
 }
 
+// ==================== PRODUCT PAGES ====================
+// GET /products is cursor paginated: the next page's cursor comes back in X-Next-Cursor.
+async function fetchProductPage(params = {}, cursor = null) {
+    const query = new URLSearchParams({ limit: 100, ...params });
+    if (cursor) query.set('cursor', cursor);
+    const res = await fetch(`${API_URL}/products?${query}`, { headers: getHeaders() });
+    const products = res.ok ? await res.json() : [];
+    return { res, products, nextCursor: res.headers.get('X-Next-Cursor') };
+}
+
+async function fetchAllProducts(params = {}) {
+    let products = [];
+    let cursor = null;
+    let res;
+    do {
+        const page = await fetchProductPage({ limit: 1000, ...params }, cursor);
+        res = page.res;
+        if (!res.ok) break;
+        products = products.concat(page.products);
+        cursor = page.nextCursor;
+    } while (cursor);
+    return { res, products };
+}
+
+function loadMoreButton(onclick) {
+    return `<div class="text-center py-4">
+        <button onclick="${onclick}" class="px-4 py-2 text-xs font-bold border border-slate-200 rounded-lg hover:bg-slate-50">Load more</button>
+    </div>`;
+}
+
 // ==================== TOAST NOTIFICATION ====================
 function showToast(message, type = 'success') {
     const container = document.getElementById('toast-container');
@@ -249,10 +279,8 @@ async function loadUserProfile() {
         const modal = document.getElementById('user-profile-modal');
         if (modal) modal.onclick = (e) => { if (e.target === modal) modal.classList.add('hidden'); };
 
-        // Start approval polling for non-admin users
-        if (user.role !== 'admin') {
-            startApprovalPolling();
-        }
+        // Listen for pushed order updates (approvals for staff, new orders for admins)
+        startOrderEvents(user);
 
     } catch (err) {
         console.error("Error loading user profile:", err);
@@ -263,9 +291,8 @@ async function loadUserProfile() {
 async function loadDashboard() {
     try {
         loadUserProfile();
-        const res = await fetch(`${API_URL}/products`, { headers: getHeaders() });
+        const { res, products } = await fetchAllProducts({ fields: 'name,current_stock,low_stock_threshold' });
         if (res.status === 401) { window.location.href = 'login.html'; return; }
-        const products = await res.json();
 
         const totalEl = document.getElementById('total-products');
         if (totalEl) totalEl.textContent = products.length;
@@ -499,14 +526,15 @@ if (productForm) {
     });
 }
 
-async function loadProducts() {
+async function loadProducts(cursor = null) {
     try {
-        const res = await fetch(`${API_URL}/products`, { headers: getHeaders() });
+        const { res, products, nextCursor } = await fetchProductPage(
+            { fields: 'name,category,price,current_stock,low_stock_threshold' }, cursor);
         if (res.status === 401) { window.location.href = 'login.html'; return; }
-        const products = await res.json();
         const tbody = document.getElementById('product-list');
         if (!tbody) return;
-        tbody.innerHTML = products.map(p => `
+        document.getElementById('product-list-more')?.remove();
+        const rows = products.map(p => `
             <tr class="hover:bg-slate-50 dark:hover:bg-slate-800/50 transition-colors">
                 <td class="px-6 py-4 font-bold text-sm text-slate-900 dark:text-white">${p.name}</td>
                 <td class="px-6 py-4 text-sm text-slate-500">${p.category}</td>
@@ -523,6 +551,11 @@ async function loadProducts() {
                 </td>
             </tr>
         `).join('');
+        const more = nextCursor
+            ? `<tr id="product-list-more"><td colspan="6">${loadMoreButton(`loadProducts('${nextCursor}')`)}</td></tr>`
+            : '';
+        if (cursor) tbody.insertAdjacentHTML('beforeend', rows + more);
+        else tbody.innerHTML = rows + more;
     } catch (err) { console.error(err); }
 }
 
@@ -593,8 +626,7 @@ if (saleForm) {
 
 async function loadSalesForm() {
     try {
-        const res = await fetch(`${API_URL}/products`, { headers: getHeaders() });
-        const products = await res.json();
+        const { products } = await fetchAllProducts({ fields: 'name,current_stock', sort: 'name' });
         const select = document.getElementById('sale-product');
         if (select) {
             select.innerHTML = products.map(p => `<option value="${p._id}">${p.name} (Stock: ${p.current_stock})</option>`).join('');
@@ -628,21 +660,21 @@ if (stockUploadForm) {
 }
 
 // ==================== MARKETPLACE ====================
-async function loadMarketplace() {
+async function loadMarketplace(cursor = null) {
     const grid = document.getElementById('marketplace-grid');
     if (!grid) return;
 
-    grid.innerHTML = `<div class="col-span-full text-center py-16">
+    if (!cursor) grid.innerHTML = `<div class="col-span-full text-center py-16">
         <div class="animate-spin rounded-full h-12 w-12 border-b-2 border-primary mx-auto"></div>
         <p class="mt-4 text-slate-500 font-medium">Loading products...</p>
     </div>`;
 
     try {
-        const res = await fetch(`${API_URL}/products`, { headers: getHeaders() });
+        const { res, products, nextCursor } = await fetchProductPage(
+            { fields: 'name,category,price,current_stock,low_stock_threshold' }, cursor);
         if (!res.ok) throw new Error(`Failed: ${res.status}`);
-        const products = await res.json();
 
-        if (!products || products.length === 0) {
+        if (!cursor && (!products || products.length === 0)) {
             grid.innerHTML = `<div class="col-span-full text-center py-16">
                 <span class="material-symbols-outlined text-6xl text-slate-300">storefront</span>
                 <p class="mt-4 text-slate-500 font-semibold">No products available yet.</p>
@@ -651,7 +683,7 @@ async function loadMarketplace() {
             return;
         }
 
-        grid.innerHTML = products.map(p => {
+        const cards = products.map(p => {
             const pid = p._id || p.id;
             const price = typeof p.price === 'number' ? p.price : 0;
             const stock = typeof p.current_stock === 'number' ? p.current_stock : 0;
@@ -707,6 +739,12 @@ async function loadMarketplace() {
                 </div>
             </div>`;
         }).join('');
+        document.getElementById('marketplace-more')?.remove();
+        const more = nextCursor
+            ? `<div id="marketplace-more" class="col-span-full">${loadMoreButton(`loadMarketplace('${nextCursor}')`)}</div>`
+            : '';
+        if (cursor) grid.insertAdjacentHTML('beforeend', cards + more);
+        else grid.innerHTML = cards + more;
     } catch (err) {
         console.error("Error loading marketplace:", err);
         grid.innerHTML = `<div class="col-span-full text-center py-12 text-rose-500 font-semibold">${err.message}</div>`;
@@ -759,9 +797,11 @@ async function buyProduct(productId, productName) {
 }
 
 // ==================== ADMIN ORDERS ====================
-async function loadAdminOrders() {
+async function loadAdminOrders(cursor = null) {
     try {
-        const res = await fetch(`${API_URL}/admin/orders`, { headers: getHeaders() });
+        const query = new URLSearchParams({ limit: 100 });
+        if (cursor) query.set('cursor', cursor);
+        const res = await fetch(`${API_URL}/admin/orders?${query}`, { headers: getHeaders() });
         const tbody = document.getElementById('admin-order-list');
         if (!tbody) return;
 
@@ -772,15 +812,15 @@ async function loadAdminOrders() {
         }
 
         const orders = await res.json();
+        const nextCursor = res.headers.get('X-Next-Cursor');
 
-        if (!Array.isArray(orders) || orders.length === 0) {
+        if (!cursor && (!Array.isArray(orders) || orders.length === 0)) {
             tbody.innerHTML = `<tr><td colspan="6" class="text-center py-12 text-slate-400">No orders yet. (Fetched from: ${API_URL}/admin/orders)</td></tr>`;
             return;
         }
 
-        console.log("Admin Orders:", orders);
-
-        tbody.innerHTML = orders.map(order => `
+        document.getElementById('admin-order-list-more')?.remove();
+        const rows = orders.map(order => `
             <tr class="hover:bg-slate-50 dark:hover:bg-slate-800/50 transition-colors">
                 <td class="px-6 py-4">
                     <p class="font-bold text-sm text-slate-900 dark:text-white">${order.user_name || 'Unknown'}</p>
@@ -804,6 +844,11 @@ async function loadAdminOrders() {
                 </td>
             </tr>
         `).join('');
+        const more = nextCursor
+            ? `<tr id="admin-order-list-more"><td colspan="6">${loadMoreButton(`loadAdminOrders('${nextCursor}')`)}</td></tr>`
+            : '';
+        if (cursor) tbody.insertAdjacentHTML('beforeend', rows + more);
+        else tbody.innerHTML = rows + more;
     } catch (err) {
         console.error("Error loading admin orders:", err);
     }
@@ -827,15 +872,18 @@ async function approveOrder(orderId) {
 }
 
 // ==================== MY ORDERS ====================
-async function loadMyOrders() {
+async function loadMyOrders(cursor = null) {
     const tbody = document.getElementById('order-history-list');
     if (!tbody) return;
 
     try {
-        const res = await fetch(`${API_URL}/orders/me`, { headers: getHeaders() });
+        const query = new URLSearchParams({ limit: 100 });
+        if (cursor) query.set('cursor', cursor);
+        const res = await fetch(`${API_URL}/orders/me?${query}`, { headers: getHeaders() });
         const orders = await res.json();
+        const nextCursor = res.headers.get('X-Next-Cursor');
 
-        if (!orders || orders.length === 0) {
+        if (!cursor && (!orders || orders.length === 0)) {
             tbody.innerHTML = `<tr><td colspan="5" class="text-center py-16">
                 <span class="material-symbols-outlined text-5xl text-slate-300">receipt_long</span>
                 <p class="text-slate-400 mt-3 font-medium">No orders yet. Go to Marketplace to place your first order!</p>
@@ -843,10 +891,11 @@ async function loadMyOrders() {
             return;
         }
 
+        document.getElementById('order-history-list-more')?.remove();
         const approvedOrders = orders.filter(o => o.status === 'approved');
         const pendingOrders = orders.filter(o => o.status !== 'approved');
 
-        tbody.innerHTML = [
+        const rows = [
             // Approved confirmation cards
             ...approvedOrders.map(order => `
             <tr class="hover:bg-green-50/50 dark:hover:bg-green-900/10 transition-colors bg-green-50/30 dark:bg-green-900/5">
@@ -898,56 +947,88 @@ async function loadMyOrders() {
             </tr>
             `)
         ].join('');
+        const more = nextCursor
+            ? `<tr id="order-history-list-more"><td colspan="5">${loadMoreButton(`loadMyOrders('${nextCursor}')`)}</td></tr>`
+            : '';
+        if (cursor) tbody.insertAdjacentHTML('beforeend', rows + more);
+        else tbody.innerHTML = rows + more;
     } catch (err) {
         console.error("Error loading orders:", err);
     }
 }
 
-// ==================== APPROVAL POLLING ====================
-let _knownApprovedIds = null;
-let _pollingTimer = null;
+// ==================== ORDER EVENTS ====================
+// Order updates are pushed by the server over GET /events (server-sent events)
+let _orderEvents = null;
+let _orderEventsStarting = false;
 
-async function pollOrderApprovals() {
-    try {
-        const res = await fetch(`${API_URL}/orders/me`, { headers: getHeaders() });
-        if (!res.ok) return;
-        const orders = await res.json();
-        const approvedIds = orders.filter(o => o.status === 'approved').map(o => o._id);
+function showOrderApproved(order) {
+    showToast(`🎉 Your order for "${order.product_name}" has been APPROVED!`, 'success');
 
-        if (_knownApprovedIds === null) {
-            // First load — just store current approved IDs
-            _knownApprovedIds = new Set(approvedIds);
-            return;
-        }
+    // Show the top banner if on dashboard
+    const banner = document.getElementById('order-approved-banner');
+    const bannerText = document.getElementById('order-approved-text');
+    if (banner) {
+        if (bannerText) bannerText.textContent = `🎉 Your order for "${order.product_name}" has been approved!`;
+        banner.classList.remove('hidden');
+    }
+}
 
-        // Find newly approved ones
-        const newlyApproved = orders.filter(o => o.status === 'approved' && !_knownApprovedIds.has(o._id));
-        newlyApproved.forEach(order => {
-            showToast(`🎉 Your order for "${order.product_name}" has been APPROVED!`, 'success');
-            _knownApprovedIds.add(order._id);
-
-            // Show the top banner if on dashboard
-            const banner = document.getElementById('order-approved-banner');
-            const bannerText = document.getElementById('order-approved-text');
-            if (banner) {
-                if (bannerText) bannerText.textContent = `🎉 Your order for "${order.product_name}" has been approved!`;
-                banner.classList.remove('hidden');
-            }
-        });
+function isViewVisible(viewId) {
+    const view = document.getElementById(viewId);
+    return view && !view.classList.contains('hidden');
+}
+
+async function startOrderEvents(user) {
+    // already running, being started or unsupported
+    if (_orderEvents || _orderEventsStarting || !window.EventSource) return;
+    // EventSource can't send headers: trade the token for a single-use ticket
+    // so the token itself never appears in a URL
+    _orderEventsStarting = true;
+    let ticket;
+    try {
+        const res = await fetch(`${API_URL}/events/ticket`, { method: 'POST', headers: getHeaders() });
+        if (!res.ok) return;
+        ({ ticket } = await res.json());
     } catch (err) {
-        // silent fail
+        console.error("Error starting order events:", err);
+        return;
+    } finally {
+        _orderEventsStarting = false;
     }
+    const source = new EventSource(`${API_URL}/events?ticket=${encodeURIComponent(ticket)}`);
+    _orderEvents = source;
+
+    _orderEvents.addEventListener('order.approved', (e) => {
+        const order = JSON.parse(e.data);
+        if (user.role !== 'admin') showOrderApproved(order);
+        if (isViewVisible('my-orders')) loadMyOrders();
+    });
+
+    _orderEvents.addEventListener('order.created', (e) => {
+        const order = JSON.parse(e.data);
+        if (user.role === 'admin') {
+            showToast(`🛒 New order from ${order.user_name || 'staff'}: ${order.product_name} (${order.quantity_sold} qty)`, 'success');
+            if (isViewVisible('admin-orders')) loadAdminOrders();
+        }
+    });
+    // EventSource reconnects by itself after network errors, but with the
+    // already used ticket: once it gives up, start over with a fresh one
+    source.onerror = () => {
+        if (source.readyState !== EventSource.CLOSED || _orderEvents !== source) return;
+        _orderEvents = null;
+        setTimeout(() => startOrderEvents(user), 5000);
+    };
 }
 
-function startApprovalPolling() {
-    if (_pollingTimer) return; // already running
-    _pollingTimer = setInterval(pollOrderApprovals, 30000); // every 30s
-    pollOrderApprovals(); // run immediately once
+function stopOrderEvents() {
+    if (_orderEvents) _orderEvents.close();
+    _orderEvents = null;
 }
 
 // ==================== AUTH ====================
 function logout() {
-    if (_pollingTimer) clearInterval(_pollingTimer);
+    stopOrderEvents();
     localStorage.removeItem('token');
     window.location.href = 'login.html';
 }